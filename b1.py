@@ -6,10 +6,20 @@ import base64
 from pathlib import Path
 from io import BytesIO
 import pdf_extraction  # PDF data extraction module
+import blob_store  # content-addressed store for uploaded files
+import columnar_cache  # Parquet cache of uploaded workbooks
 from background_processor import background_processor  # Background processing
 
 LEFT_LOGO_PATH = "logo.png"
 
+# Upload key -> header row of its sheets (the loan books carry title rows above the header)
+COLUMNAR_HEADER_ROWS = {
+    "u_ccis": 0,
+    "u_blacklist": 0,
+    "u_loan_mar": 1,
+    "u_loan_jun": 2,
+}
+
 def _data_uri(path: str) -> str:
     p = Path(path)
     if not p.exists():
@@ -43,6 +53,18 @@ def _scroll_to_brand_if_needed(s):
             height=0,
         )
 
+def _convert_uploads_to_columnar():
+    """Convert each uploaded workbook to the Parquet cache once; later pages read from it."""
+    for key, header_row in COLUMNAR_HEADER_ROWS.items():
+        data = st.session_state.get(f"{key}_bytes")
+        if not data:
+            continue
+        try:
+            st.session_state[f"{key}_digest"] = columnar_cache.convert_workbook(data, header_rows=(header_row,))
+        except Exception:
+            # Cache is an optimisation only; readers fall back to parsing the workbook
+            st.session_state.pop(f"{key}_digest", None)
+
 def render_bank1():
     s = st.session_state
     st.set_page_config(
@@ -142,7 +164,7 @@ def render_bank1():
                 try:
                     pdf_data.append({
                         "name": pdf.name,
-                        "bytes": pdf.getvalue()
+                        "bytes": blob_store.put_upload(pdf)
                     })
                 except Exception:
                     pdf_data.append({
@@ -180,35 +202,23 @@ def render_bank1():
             # Save file info in session state
             if uploaded_ccis:
                 st.session_state["u_ccis_name"] = uploaded_ccis.name
-                try:
-                    st.session_state["u_ccis_bytes"] = uploaded_ccis.getvalue()
-                except Exception:
-                    st.session_state["u_ccis_bytes"] = None
+                st.session_state["u_ccis_bytes"] = blob_store.put_upload(uploaded_ccis)
 
             if uploaded_blacklist:
                 st.session_state["u_blacklist_name"] = uploaded_blacklist.name
-                try:
-                    st.session_state["u_blacklist_bytes"] = uploaded_blacklist.getvalue()
-                except Exception:
-                    st.session_state["u_blacklist_bytes"] = None
+                st.session_state["u_blacklist_bytes"] = blob_store.put_upload(uploaded_blacklist)
 
             if uploaded_loan_mar:
                 st.session_state["u_loan_mar_name"] = uploaded_loan_mar.name
-                try:
-                    st.session_state["u_loan_mar_bytes"] = uploaded_loan_mar.getvalue()
-                except Exception:
-                    st.session_state["u_loan_mar_bytes"] = None
+                st.session_state["u_loan_mar_bytes"] = blob_store.put_upload(uploaded_loan_mar)
 
             if uploaded_loan_jun:
                 st.session_state["u_loan_jun_name"] = uploaded_loan_jun.name
-                try:
-                    st.session_state["u_loan_jun_bytes"] = uploaded_loan_jun.getvalue()
-                except Exception:
-                    st.session_state["u_loan_jun_bytes"] = None
+                st.session_state["u_loan_jun_bytes"] = blob_store.put_upload(uploaded_loan_jun)
 
             # Store PDF files if uploaded (data already stored for background processing)
             if uploaded_pdfs:
-                st.session_state["uploaded_pdfs"] = uploaded_pdfs
+                # The uploader widget already holds the files; only names and blob handles are kept
                 st.session_state["uploaded_pdfs_names"] = [pdf.name for pdf in uploaded_pdfs]
                 # PDF data is already stored during background processing setup above
                 # Ensure data is available for processing
@@ -219,7 +229,7 @@ def render_bank1():
                         try:
                             pdf_data.append({
                                 "name": pdf.name,
-                                "bytes": pdf.getvalue()
+                                "bytes": blob_store.put_upload(pdf)
                             })
                         except Exception:
                             pdf_data.append({
@@ -236,7 +246,6 @@ def render_bank1():
                     st.session_state["pdf_background_started"] = True
                     
             else:
-                st.session_state["uploaded_pdfs"] = None
                 st.session_state["uploaded_pdfs_names"] = []
                 st.session_state["uploaded_pdfs_data"] = []
                 # Clear PDF processing flags if no PDFs uploaded
@@ -246,6 +255,9 @@ def render_bank1():
                 st.session_state.pop("processed_pdf_names", None)
                 st.session_state.pop("pdf_background_started", None)
 
+            with st.spinner("Indexing workbooks…"):
+                _convert_uploads_to_columnar()
+
             # Move to next page
             st.session_state.page = "bankprocess"   # triggers b2.py
             st.rerun()
@@ -8,6 +8,9 @@ import re
 import base64
 from pathlib import Path
 from pdf_status_utils import show_compact_pdf_status
+import blob_store
+import columnar_cache
+import workbook_probe
 
 LEFT_LOGO_PATH = "logo.png"
 
@@ -107,6 +110,11 @@ def _file_cache_key(src, name: str) -> str:
 
 @st.cache_data(show_spinner=False)
 def _sheet_names_cached(cache_key: str, file_bytes: bytes):
+    cached = columnar_cache.sheet_names(file_bytes)
+    if cached is None:
+        cached = workbook_probe.sheet_names(file_bytes)
+    if cached is not None:
+        return cached
     with BytesIO(file_bytes) as f:
         xl = pd.ExcelFile(f)
         return xl.sheet_names
@@ -128,59 +136,14 @@ def _sheet_names(filelike, name_hint: str = ""):
         return []
 
 def _bootstrap_bytes(s):
-    """If only upload handles exist in session, populate *_bytes + *_name to normalize downstream logic."""
-    # CCIS
-    f = s.get("u_ccis")
-    if f is not None and not s.get("u_ccis_bytes"):
-        try:
-            s["u_ccis_bytes"] = f.getvalue()
-            s["u_ccis_name"]  = getattr(f, "name", "")
-        except Exception:
-            try:
-                s["u_ccis_bytes"] = f.read()
-                s["u_ccis_name"]  = getattr(f, "name", "")
-                f.seek(0)
-            except Exception:
-                pass
-    # Blacklist
-    f = s.get("u_blacklist")
-    if f is not None and not s.get("u_blacklist_bytes"):
-        try:
-            s["u_blacklist_bytes"] = f.getvalue()
-            s["u_blacklist_name"]  = getattr(f, "name", "")
-        except Exception:
-            try:
-                s["u_blacklist_bytes"] = f.read()
-                s["u_blacklist_name"]  = getattr(f, "name", "")
-                f.seek(0)
-            except Exception:
-                pass
-    # Loan Book Mar
-    f = s.get("u_loan_mar")
-    if f is not None and not s.get("u_loan_mar_bytes"):
-        try:
-            s["u_loan_mar_bytes"] = f.getvalue()
-            s["u_loan_mar_name"]  = getattr(f, "name", "")
-        except Exception:
-            try:
-                s["u_loan_mar_bytes"] = f.read()
-                s["u_loan_mar_name"]  = getattr(f, "name", "")
-                f.seek(0)
-            except Exception:
-                pass
-    # Loan Book Jun
-    f = s.get("u_loan_jun")
-    if f is not None and not s.get("u_loan_jun_bytes"):
-        try:
-            s["u_loan_jun_bytes"] = f.getvalue()
-            s["u_loan_jun_name"]  = getattr(f, "name", "")
-        except Exception:
-            try:
-                s["u_loan_jun_bytes"] = f.read()
-                s["u_loan_jun_name"]  = getattr(f, "name", "")
-                f.seek(0)
-            except Exception:
-                pass
+    """If only upload handles exist in session, populate *_bytes (blob_store handles) + *_name."""
+    for key in ("u_ccis", "u_blacklist", "u_loan_mar", "u_loan_jun"):
+        f = s.get(key)
+        if f is not None and not s.get(f"{key}_bytes"):
+            blob = blob_store.put_upload(f)
+            if blob is not None:
+                s[f"{key}_bytes"] = blob
+                s[f"{key}_name"]  = getattr(f, "name", "")
 
 def _data_uri(path: str) -> str:
     p = Path(path)
@@ -7,6 +7,8 @@ import base64
 from pathlib import Path
 import streamlit.components.v1 as components
 from pdf_status_utils import show_compact_pdf_status
+import columnar_cache
+import workbook_probe
 
 LEFT_LOGO_PATH = "logo.png"
 
@@ -60,6 +62,11 @@ def _bytes_for_cat(cat, s):
     return None, ""
 
 def _columns_for_sheet(xls_bytes: bytes, sheet_name: str, header_row: int = 0):
+    cached = columnar_cache.sheet_columns(xls_bytes, sheet_name, header_row)
+    if cached is None:
+        cached = workbook_probe.sheet_columns(xls_bytes, sheet_name, header_row)
+    if cached is not None:
+        return cached
     try:
         bio = BytesIO(xls_bytes)
         xl = pd.ExcelFile(bio)
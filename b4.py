@@ -4,6 +4,8 @@ import pandas as pd
 import base64
 from pathlib import Path
 import streamlit.components.v1 as components
+
+import batch_cli
 from pdf_status_utils import show_compact_pdf_status
 
 LEFT_LOGO_PATH = "logo.png"  # shared asset
@@ -165,6 +167,15 @@ def render_bank4():
 
         st.markdown("---")
 
+    # The same mappings drive headless batch runs (batch_cli.py) over many workbooks
+    st.download_button(
+        "Download mapping (JSON)",
+        data=batch_cli.dump_mapping("banking", s.sheet_mapping_pairs, s.column_mapping_pairs),
+        file_name="banking_mapping.json",
+        mime="application/json",
+        key="download_mapping_json",
+    )
+
     # ===== Navigation =====
     col1, col2 = st.columns(2)
     with col1:
@@ -1,5 +1,6 @@
 # ============================== b6.py — Banking Processing ==============================
-import os, time, random
+import os
+import time
 import streamlit as st
 import streamlit.components.v1 as components
 import pandas as pd
@@ -7,8 +8,8 @@ import base64
 from pathlib import Path
 from io import BytesIO
 
-import blogic     # adapter for banking + runners
 import blogic6    # bot functions + PROCESS_TITLES
+import job_queue
 import pdf_extraction  # PDF data extraction module
 from background_processor import background_processor  # Background processing
 from pdf_status_utils import show_pdf_processing_status  # PDF status display
@@ -134,9 +135,6 @@ def render_bank6():
 
     # Initialize bot progress tracking
     if "bot_progress" not in s: s.bot_progress = {}
-    if "bot_processing_order" not in s: s.bot_processing_order = []
-    if "current_processing_bot_index" not in s: s.current_processing_bot_index = 0
-    if "last_bot_update_time" not in s: s.last_bot_update_time = 0
 
     # render bot rows
     ui_refs = {}
@@ -207,7 +205,7 @@ def render_bank6():
         if nav[0].button("⟵ Back", key="b6_back_before"):
             s.page="bank5"; st.rerun()
         if nav[1].button("Process ➜", key="b6_start"):
-            s.processing_started=True; st.rerun()
+            s.processing_started=True; s.pop("job_id", None); st.rerun()
         st.markdown('</div>', unsafe_allow_html=True); return
 
     if s.processing_done:
@@ -263,116 +261,75 @@ def render_bank6():
             s["prev_pdf_status"] = pdf_status
             s["prev_pdf_progress"] = progress
 
-    # Animated Bot Processing System
-    def animate_bot_progress():
-        """Animate progress bars for each bot with random increments and timing"""
-        # Set up processing order if not already done
-        if not s.bot_processing_order:
-            s.bot_processing_order = sel_codes.copy()
-            s.current_processing_bot_index = 0
-            s.last_bot_update_time = time.time()
-            s.bot_timings = {}  # Track per-bot total duration + start time
-
-        current_time = time.time()
-
-        if s.current_processing_bot_index < len(s.bot_processing_order):
-            current_bot = s.bot_processing_order[s.current_processing_bot_index]
-            bot_data = s.bot_progress[current_bot]
-
-            if bot_data["status"] == "Pending":
-                # Start this bot
-                bot_data["status"] = "Processing"
-                bot_data["progress"] = 1
-                _, bot_name = blogic6.PROCESS_TITLES[current_bot]
-                ui_refs[current_bot]["status"].markdown(f"- 🔄 **{bot_name}** — Processing")
-                ui_refs[current_bot]["prog"].progress(1)
-
-                # Assign random total duration
-                total_time = random.uniform(2.3, 5.0)
-                s.bot_timings[current_bot] = {
-                    "start": current_time,
-                    "duration": total_time
-                }
-
-            elif bot_data["status"] == "Processing":
-                elapsed = current_time - s.bot_timings[current_bot]["start"]
-                total_time = s.bot_timings[current_bot]["duration"]
-
-                # Calculate expected progress
-                target_progress = min(100, int((elapsed / total_time) * 100))
-
-                # Ensure strictly increasing progress
-                if target_progress > bot_data["progress"]:
-                    bot_data["progress"] = target_progress
-                    ui_refs[current_bot]["prog"].progress(bot_data["progress"])
-
-                # If finished
-                if bot_data["progress"] >= 100:
-                    bot_data["status"] = "Completed"
-                    _, bot_name = blogic6.PROCESS_TITLES[current_bot]
-                    ui_refs[current_bot]["status"].markdown(f"- ✅ **{bot_name}** — Completed")
-                    ui_refs[current_bot]["prog"].progress(100)
-
-                    # Add small random delay before next bot
-                    delay = random.uniform(0.5, 1.4)
-                    s.next_bot_start_time = current_time + delay
-                    s.current_processing_bot_index += 1
-
-        # Check if all bots are Completed
-        all_done = all(s.bot_progress[code]["status"] == "Completed" for code in sel_codes)
-        return all_done
-
-
-    # Check if we should start next bot
-    current_time = time.time()
-    if (hasattr(s, 'next_bot_start_time') and 
-        current_time >= s.next_bot_start_time and 
-        s.current_processing_bot_index < len(s.bot_processing_order)):
-        # Time to start next bot - clear the delay
-        delattr(s, 'next_bot_start_time')
-
-    # Animate the progress
-    all_bots_Completed = animate_bot_progress()
-    
-    # Only refresh if bots are still processing AND significant time has passed
-    if not all_bots_Completed:
-        # Only refresh every 1 second instead of 0.5 to reduce overhead
-        time.sleep(1.0)
-        st.rerun()
-    else:
-        # All bots Completed - run actual processing to get real results
-        if not s.get("real_processing_done", False):
-            with st.spinner("Finalizing results..."):
-                results, proc_status, raw_dfs = blogic.run_all_bots_with_mappings(
-                    file_bytes_map=file_bytes_map,
-                    sheet_mapping_pairs=s.sheet_mapping_pairs,
-                    column_mapping_pairs=s.column_mapping_pairs,
-                )
-                
-                # Save results
-                s.results = results
-                s.proc_status.update(proc_status)
-                s.raw_dfs = raw_dfs
-                s.real_processing_done = True
+    # The bots run in a job_queue worker process. This script only submits the job, then
+    # polls it on each rerun; the job id in the URL brings a reloaded tab back to it.
+    if not s.get("real_processing_done", False):
+        if not s.get("job_id"):
+            s.job_id = job_queue.submit("banking", file_bytes_map, s.sheet_mapping_pairs, s.column_mapping_pairs,
+                                        selected_bots=sel_codes)
+            st.query_params["job"] = s.job_id
+        job = job_queue.status(s.job_id)
+        if job is None:
+            st.error("This processing job is no longer available. Please process again.")
+            s.processing_started = False
+            s.pop("job_id", None)
+            st.query_params.pop("job", None)
+            st.markdown('</div>', unsafe_allow_html=True); return
+
+        # Bot rows follow the worker's events: 🔄 when a bot starts, ✅/❌ when it ends
+        s.bot_timings = {}  # per-bot wall time in seconds
+        for code, bot in job.bots.items():
+            if code not in ui_refs:
+                continue
+            _, orig_bot_name = blogic6.PROCESS_TITLES[code]
+            bot_name = BOT_DISPLAY_NAMES.get(code, orig_bot_name)
+            bot_data = s.bot_progress[code]
+            if bot["status"] == "Processing":
+                bot_data.update(status="Processing", progress=1)
+                # Chunked loan dump: rows read so far
+                read = f" ({job.rows:,} rows read)" if job.rows else ""
+                ui_refs[code]["status"].markdown(f"- 🔄 **{bot_name}** — Processing{read}")
+                ui_refs[code]["prog"].progress(1)
+            else:
+                s.bot_timings[code] = bot["seconds"]
+                status = "Completed" if bot["status"] == "Complete" else "Failed"
+                bot_data.update(status=status, progress=100)
+                sym = "✅" if status == "Completed" else "❌"
+                ui_refs[code]["status"].markdown(f"- {sym} **{bot_name}** — {status} ({bot['rows']:,} rows, {bot['seconds']:.1f}s)")
+                ui_refs[code]["prog"].progress(100)
+
+        if job.active:
+            # Also fails the job if its worker died, so the next poll shows why
+            job_queue.ensure_workers()
+            if job.state == job_queue.QUEUED:
+                st.caption("Queued — waiting for a free worker…")
+            time.sleep(job_queue.POLL_SECONDS)
+            st.rerun()
 
-    # Final UI updates only after real processing is Completed
-    if s.get("real_processing_done", False):
-        # update UI after run - ensure all bots show as Completed
+        if job.state == job_queue.FAILED:
+            st.error(f"Processing failed: {job.error}")
+        else:
+            # Save results
+            outcome = job_queue.result(s.job_id)
+            s.results = outcome["results"]
+            s.proc_status.update(outcome["proc_status"])
+            s.raw_dfs = outcome["raw_dfs"]
+            s.input_row_count = outcome["input_row_count"]  # for the b7 Output tab
+        s.real_processing_done = True
+
+        # Bots without their inputs never started; close their rows too
         for code in sel_codes:
-            if code in ui_refs:
-                status = s.proc_status.get(code, "Completed")  # Default to Completed since animation finished
+            if code in ui_refs and s.bot_progress[code]["status"] in ("Pending", "Processing"):
                 _, orig_bot_name = blogic6.PROCESS_TITLES[code]
                 bot_name = BOT_DISPLAY_NAMES.get(code, orig_bot_name)
-                status_ph = ui_refs[code]["status"]; prog_ph = ui_refs[code]["prog"]
-                sym = {"Pending":"⏳","Completed":"✅","Failed":"❌"}.get(status,"✅")
-                status_ph.markdown(f"- {sym} **{bot_name}** — Completed")
-                prog_ph.progress(100)
-                s.bot_progress[code]["status"] = "Completed"
-                s.bot_progress[code]["progress"] = 100
-        
+                s.bot_progress[code].update(status="Failed", progress=100)
+                reason = "job failed" if job.state == job_queue.FAILED else "input not available"
+                ui_refs[code]["status"].markdown(f"- ❌ **{bot_name}** — Failed ({reason})")
+                ui_refs[code]["prog"].progress(100)
+
         # Mark processing as done
         s.processing_done = True
-    
+
     # Show final navigation only when everything is Completed
     if s.get("real_processing_done", False):
         _final_nav()
@@ -583,15 +583,15 @@ def render_bank7():
 
             col1, col2 = st.columns(2)
             with col1:
-                charts.compare_project_counts_plotly(BytesIO(loan_file1), BytesIO(loan_file2), key="asset_count_analysis")
+                charts.compare_project_counts_plotly(loan_file1, loan_file2, key="asset_count_analysis")
             with col2:
-                charts.compare_loan_outstanding_plotly(BytesIO(loan_file1), BytesIO(loan_file2), key="asset_outstanding_analysis")
+                charts.compare_loan_outstanding_plotly(loan_file1, loan_file2, key="asset_outstanding_analysis")
 
             col3, col4 = st.columns(2)
             with col3:
-                charts.compare_project_counts_sma(BytesIO(loan_file1), BytesIO(loan_file2), key="sma_count_analysis")
+                charts.compare_project_counts_sma(loan_file1, loan_file2, key="sma_count_analysis")
             with col4:
-                charts.compare_loan_outstanding_sma(BytesIO(loan_file1), BytesIO(loan_file2), key="sma_outstanding_analysis")
+                charts.compare_loan_outstanding_sma(loan_file1, loan_file2, key="sma_outstanding_analysis")
         else:
             st.info("Upload both Loan Book 1 and Loan Book 2 in Banking Home to see comparisons.")
 
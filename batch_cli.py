@@ -0,0 +1,258 @@
+# ============================== batch_cli.py — Headless Batch Runner ==============================
+"""
+Runs the audit bots over every workbook in a directory, without the Streamlit pages, one
+workbook per worker process. The sheet / column mapping is the JSON saved from the mapping
+review page ("Download mapping"). Each workbook gets its own results file in --out, and
+summary.csv lists every bot of every workbook.
+
+    python batch_cli.py entities/ p2p_mapping.json --out results/
+    python batch_cli.py branches/ ccis_mapping.json --out results/ --blacklist pins.xlsx --workers 8
+    python batch_cli.py entities/ p2p_mapping.json --bots P2P1,P2P2 --param PO_GRN_Invoice=5000
+
+P2P / O2C / H2R workbooks hold all of their sheets in one file. For the banking suite each
+workbook is one CCIS loan dump; the blacklist and the two loan books are shared by every
+dump. Exits with status 1 when a workbook or a bot failed.
+"""
+import argparse
+import csv
+import json
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import pandas as pd
+from streamlit import logger as streamlit_logger
+
+import blogic
+import blogic6
+import bot_engine
+import frame_cache
+import logic
+import logic6
+import workbook_loader
+
+SUITES = ("p2p", "banking")
+FORMATS = ("xlsx", "csv")
+EXCEL_MAX_ROWS = 1_048_575  # data rows below the header
+
+# Shared banking inputs: blogic category -> command-line option
+SHARED_BANKING = {
+    "Blacklisted PIN CODE": "blacklist",
+    "Loan Book (31.03.2025)": "loan_book_mar",
+    "Loan Book (30.06.2025)": "loan_book_jun",
+}
+
+SUMMARY_COLUMNS = ["File", "Category", "Bot", "Code", "Status", "Issues Found", "Seconds", "Error"]
+
+TITLES = {
+    **{code: (cat, title) for code, (cat, title) in logic6.PROCESS_TITLES.items()},
+    **{code: ("Banking", title) for code, (_, title) in blogic6.PROCESS_TITLES.items()},
+}
+
+
+# ---------- Mapping files ----------
+def dump_mapping(suite: str, sheet_mapping_pairs: Dict, column_mapping_pairs: Dict) -> str:
+    """The pages' mappings as a mapping file for this runner."""
+    return json.dumps({"suite": suite, "sheet_mapping_pairs": sheet_mapping_pairs,
+                       "column_mapping_pairs": column_mapping_pairs}, indent=2, default=str)
+
+
+def load_mapping(path: str) -> Dict[str, Any]:
+    with open(path, encoding="utf-8") as f:
+        mapping = json.load(f)
+    missing = [k for k in ("sheet_mapping_pairs", "column_mapping_pairs") if k not in mapping]
+    if missing:
+        raise ValueError(f"{path}: mapping file has no {', '.join(missing)}.")
+    return mapping
+
+
+def parse_params(pairs: List[str]) -> Dict[str, float]:
+    params = {}
+    for pair in pairs:
+        name, sep, value = pair.partition("=")
+        if not sep or name not in logic6.TUNABLES:
+            raise ValueError(f"--param {pair!r}: expected NAME=VALUE with NAME one of {', '.join(logic6.TUNABLES)}.")
+        params[name] = float(value)
+    return params
+
+
+# ---------- Worker side ----------
+# Set once per worker process by _init_worker, so the shared inputs are read once per worker
+_JOB: Dict[str, Any] = {}
+
+
+def _init_worker(job: Dict[str, Any]) -> None:
+    _JOB.update(job)
+    _JOB["shared_bytes"] = {cat: Path(path).read_bytes() for cat, path in job["shared"].items()}
+    for name, value in job["params"].items():
+        setattr(logic6, name, value)
+    # The workbooks are the unit of parallelism: no nested pools inside a worker
+    bot_engine.BOT_WORKERS = 1
+    workbook_loader.INGEST_WORKERS = 1
+    # Each workbook is read once; keep only the few shared inputs (blacklist, loan books)
+    frame_cache.PREPARED.max_entries = len(job["shared"]) + 1
+    # The runners note row counts in st.session_state, which has no session here
+    streamlit_logger.set_log_level("error")
+
+
+def _sheet_name(title: str, used: set) -> str:
+    name = "".join("_" if ch in '[]:*?/\\' else ch for ch in title)[:31]
+    n = 1
+    while name in used:
+        n += 1
+        name = f"{name[:28]}_{n}"
+    used.add(name)
+    return name
+
+
+def _write_results(rows: List[Dict], results: Dict[str, pd.DataFrame], out_base: Path, fmt: str) -> None:
+    """One workbook (or one folder of CSVs) per input: a Summary, then each bot's flagged rows."""
+    summary = pd.DataFrame(rows, columns=SUMMARY_COLUMNS).drop(columns="File")
+    if fmt == "csv":
+        out_base.mkdir(parents=True, exist_ok=True)
+        summary.to_csv(out_base / "summary.csv", index=False)
+        for code, df in results.items():
+            df.to_csv(out_base / f"{code}.csv", index=False)
+        return
+    used = {"Summary"}
+    with pd.ExcelWriter(f"{out_base}.xlsx", engine="xlsxwriter") as writer:
+        summary.to_excel(writer, sheet_name="Summary", index=False)
+        for code, df in results.items():
+            if len(df) > EXCEL_MAX_ROWS:
+                # Beyond one sheet's rows: this bot's table goes beside the workbook
+                df.to_csv(f"{out_base}.{code}.csv", index=False)
+                continue
+            df.to_excel(writer, sheet_name=_sheet_name(TITLES.get(code, ("", code))[1], used), index=False)
+
+
+def _audit_file(path: str) -> List[Dict]:
+    """Run the suite over one workbook and write its results; returns its summary rows."""
+    suite, mapping = _JOB["suite"], _JOB["mapping"]
+    name = Path(path).name
+    finished: Dict[str, bot_engine.ProgressEvent] = {}
+
+    def _on_progress(ev: bot_engine.ProgressEvent):
+        if ev.kind == bot_engine.FINISH:
+            finished[ev.code] = ev
+
+    try:
+        file_bytes = Path(path).read_bytes()
+        if suite == "p2p":
+            results, proc_status, _, _ = logic.run_all_bots_with_mappings(
+                {"MASTER": file_bytes}, mapping["sheet_mapping_pairs"], mapping["column_mapping_pairs"],
+                engine=_JOB["engine"], selected_bots=_JOB["bots"], progress=_on_progress,
+            )
+        else:
+            results, proc_status, _ = blogic.run_all_bots_with_mappings(
+                {"Banking": file_bytes, **_JOB["shared_bytes"]},
+                mapping["sheet_mapping_pairs"], mapping["column_mapping_pairs"],
+                engine=_JOB["engine"], progress=_on_progress, workers=1,
+            )
+    except Exception as e:
+        return [dict(File=name, Status="Failed", Error=f"{type(e).__name__}: {e}")]
+
+    codes = [c for c in proc_status if not _JOB["bots"] or c in _JOB["bots"]]
+    results = {c: results[c] for c in codes if isinstance(results.get(c), pd.DataFrame)}
+    rows = []
+    for code in codes:
+        cat, title = TITLES.get(code, ("", code))
+        ev = finished.get(code)
+        rows.append(dict(
+            File=name, Category=cat, Bot=title, Code=code, Status=proc_status[code],
+            **{"Issues Found": logic6.issues_count_for(code, results[code]) if code in results else None},
+            Seconds=round(ev.seconds, 3) if ev else None, Error=ev.error if ev else "",
+        ))
+    try:
+        _write_results(rows, results, Path(_JOB["out"]) / f"{Path(path).stem}_results", _JOB["format"])
+    except Exception as e:
+        for row in rows:
+            row["Error"] = row["Error"] or f"results not written: {e}"
+    return rows
+
+
+# ---------- Command line ----------
+def find_workbooks(directory: str, pattern: str) -> List[str]:
+    # "~$" files are Excel's lock files of workbooks open elsewhere
+    return sorted(str(p) for p in Path(directory).glob(pattern) if p.is_file() and not p.name.startswith("~$"))
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("directory", help="folder of workbooks, one audit per file")
+    ap.add_argument("mapping", help="sheet / column mapping JSON saved from the mapping review page")
+    ap.add_argument("--out", default="batch_results", help="output folder (default: batch_results)")
+    ap.add_argument("--suite", choices=SUITES, help="bots to run; default: the suite in the mapping file")
+    ap.add_argument("--pattern", default="*.xls*", help='workbook glob, e.g. "**/*.xlsx" (default: *.xls*)')
+    ap.add_argument("--bots", help="comma-separated P2P/O2C/H2R bot codes (default: every bot with inputs)")
+    ap.add_argument("--param", action="append", default=[], metavar="NAME=VALUE",
+                    help=f"bot threshold, repeatable; one of {', '.join(logic6.TUNABLES)}")
+    ap.add_argument("--format", choices=FORMATS, default="xlsx", help="per-file results (default: xlsx)")
+    ap.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                    help="workbooks audited at once (default: the CPU count)")
+    ap.add_argument("--engine", default=None, help='Excel reader, e.g. "calamine" (default: AUDITBOTS_EXCEL_ENGINE)')
+    for cat, opt in SHARED_BANKING.items():
+        ap.add_argument(f"--{opt.replace('_', '-')}", dest=opt, metavar="PATH", help=f"banking: the {cat} workbook")
+    args = ap.parse_args(argv)
+
+    try:
+        mapping = load_mapping(args.mapping)
+        params = parse_params(args.param)
+    except (OSError, ValueError) as e:
+        ap.error(str(e))
+    suite = args.suite or mapping.get("suite")
+    if suite not in SUITES:
+        ap.error("the mapping file names no suite; pass --suite p2p or --suite banking.")
+    bots = [b.strip() for b in args.bots.split(",") if b.strip()] if args.bots else None
+    if bots and suite == "banking":
+        ap.error("--bots applies to the p2p suite only.")
+    unknown = [b for b in bots or [] if b not in logic6.PROCESS_TITLES]
+    if unknown:
+        ap.error(f"unknown bot codes: {', '.join(unknown)}")
+    shared = {cat: getattr(args, opt) for cat, opt in SHARED_BANKING.items() if getattr(args, opt)}
+    if shared and suite != "banking":
+        ap.error("--blacklist / --loan-book-* apply to the banking suite only.")
+    files = find_workbooks(args.directory, args.pattern)
+    if not files:
+        ap.error(f"no workbooks matching {args.pattern!r} in {args.directory}")
+
+    Path(args.out).mkdir(parents=True, exist_ok=True)
+    job = dict(suite=suite, mapping=mapping, shared=shared, params=params, bots=bots, engine=args.engine,
+               out=args.out, format=args.format)
+    workers = max(1, min(args.workers, len(files)))
+    print(f"{len(files)} workbook(s), {suite} suite, {workers} worker(s)", file=sys.stderr)
+
+    t0 = time.perf_counter()
+    rows_by_file: Dict[str, List[Dict]] = {}
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"),
+                             initializer=_init_worker, initargs=(job,)) as pool:
+        futures = {pool.submit(_audit_file, path): path for path in files}
+        for done, fut in enumerate(as_completed(futures), start=1):
+            path = futures[fut]
+            try:
+                rows = fut.result()
+            except Exception as e:  # the worker itself died
+                rows = [dict(File=Path(path).name, Status="Failed", Error=f"{type(e).__name__}: {e}")]
+            rows_by_file[path] = rows
+            failed = sum(r["Status"] == "Failed" for r in rows)
+            print(f"[{done}/{len(files)}] {Path(path).name}: " + (f"{failed} failed" if failed else "ok"),
+                  file=sys.stderr)
+
+    # Consolidated summary in input order, whatever order the workers finished in
+    rows = [row for path in files for row in rows_by_file[path]]
+    with open(Path(args.out) / "summary.csv", "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=SUMMARY_COLUMNS)
+        writer.writeheader()
+        writer.writerows(rows)
+    failed = [r for r in rows if r["Status"] == "Failed"]
+    issues = sum(r.get("Issues Found") or 0 for r in rows)
+    print(f"{len(files)} workbook(s) in {time.perf_counter() - t0:.1f}s: {issues:,} issue(s), "
+          f"{len(failed)} failure(s); summary in {Path(args.out) / 'summary.csv'}", file=sys.stderr)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,157 @@
+# ============================== blob_store.py — Content-Addressed Upload Store ==============================
+import hashlib
+import mmap
+import os
+import tempfile
+import time
+from collections import OrderedDict
+from typing import Iterable, Optional, Union
+
+# Uploaded files live once on disk under BLOB_DIR/<sha[:2]>/<sha256>, however many sessions
+# upload them. Session state keeps the Blob handle returned here instead of a bytes copy.
+BLOB_DIR = os.path.abspath(os.getenv("AUDITBOTS_BLOB_DIR")
+                           or os.path.join(os.path.dirname(os.path.abspath(__file__)), "blob_store"))
+# Files not stored or mapped for this many days are deleted by expire() (0 keeps them)
+BLOB_MAX_DAYS = float(os.getenv("AUDITBOTS_BLOB_MAX_DAYS") or 7)
+
+_OPEN_SIZE = 32
+_UPLOADS_SIZE = 64
+
+
+class Blob(mmap.mmap):
+    """
+    Read-only memory map of one stored file. It is bytes-like (len, slicing, buffer
+    protocol), so BytesIO(blob), hashlib and zipfile take it wherever upload bytes were
+    used; the pages come from the OS page cache rather than the session's heap.
+    Pickles as its digest, so it can be handed to worker processes.
+    """
+
+    digest: str
+    path: str
+
+    def __reduce__(self):
+        return (get, (self.digest,))
+
+
+# digest -> Blob; the same upload maps to the same object across reruns and sessions
+_OPEN: "OrderedDict[str, Blob]" = OrderedDict()
+# Streamlit UploadedFile.file_id -> digest, so a rerun does not re-hash the upload
+_UPLOADS: "OrderedDict[str, str]" = OrderedDict()
+
+
+def _path(digest: str) -> str:
+    return os.path.join(BLOB_DIR, digest[:2], digest)
+
+
+def _remember(memo: OrderedDict, key, value, size: int) -> None:
+    memo[key] = value
+    memo.move_to_end(key)
+    while len(memo) > size:
+        memo.popitem(last=False)  # evicted maps close once no session holds them
+
+
+def _touch(path: str) -> None:
+    # A file's mtime is its last use, for expire()
+    try:
+        os.utime(path)
+    except OSError:
+        pass
+
+
+def get(digest: str) -> Optional[Blob]:
+    """Map a stored file by digest; None if it is not in the store."""
+    blob = _OPEN.get(digest)
+    if blob is not None and not blob.closed:
+        _OPEN.move_to_end(digest)
+        _touch(blob.path)
+        return blob
+    path = _path(digest)
+    _touch(path)
+    try:
+        with open(path, "rb") as f:
+            blob = Blob(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        return None
+    blob.digest = digest
+    blob.path = path
+    _remember(_OPEN, digest, blob, _OPEN_SIZE)
+    return blob
+
+
+def put(data: bytes) -> Union[Blob, bytes]:
+    """Store `data` (once per content) and return its Blob. Empty data comes back as b""."""
+    if not data:
+        return b""
+    digest = hashlib.sha256(data).hexdigest()
+    path = _path(digest)
+    if not os.path.exists(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path))
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp, path)
+        except Exception:
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+            raise
+    return get(digest)
+
+
+def put_upload(f) -> Union[Blob, bytes, None]:
+    """Store a Streamlit UploadedFile, memoised on its file_id; None if it cannot be read."""
+    file_id = getattr(f, "file_id", None)
+    if file_id and file_id in _UPLOADS:
+        blob = get(_UPLOADS[file_id])
+        if blob is not None:
+            return blob
+    try:
+        data = f.getvalue()
+    except Exception:
+        try:
+            f.seek(0)
+            data = f.read()
+            f.seek(0)
+        except Exception:
+            return None
+    blob = put(data)
+    if file_id and blob:
+        _remember(_UPLOADS, file_id, blob.digest, _UPLOADS_SIZE)
+    return blob
+
+
+def expire(max_days: Optional[float] = None, keep: Iterable[str] = ()) -> None:
+    """
+    Delete stored files unused for `max_days` (default BLOB_MAX_DAYS; 0 keeps everything),
+    except the digests in `keep`. Maps already open keep working; a later get() of a
+    deleted digest returns None.
+    """
+    max_days = BLOB_MAX_DAYS if max_days is None else max_days
+    if max_days <= 0:
+        return
+    cutoff = time.time() - max_days * 86400
+    keep = set(keep)
+    try:
+        shards = os.listdir(BLOB_DIR)
+    except OSError:
+        return
+    for shard in shards:
+        shard_dir = os.path.join(BLOB_DIR, shard)
+        try:
+            names = os.listdir(shard_dir)
+        except OSError:
+            continue
+        for name in names:
+            path = os.path.join(shard_dir, name)
+            try:
+                if name not in keep and os.path.getmtime(path) < cutoff:
+                    os.remove(path)
+                    _OPEN.pop(name, None)
+            except OSError:
+                pass  # removed meanwhile
+        try:
+            os.rmdir(shard_dir)  # only succeeds once empty
+        except OSError:
+            pass
@@ -1,11 +1,20 @@
 # ============================== blogic.py — Banking Mapping & Runner ==============================
+import os
+import time
 import pandas as pd
 import numpy as np
 from io import BytesIO
-from typing import Dict, Tuple
+from typing import Dict, Tuple, Optional
 
 # Import the banking-specific logics
 import blogic6
+import bot_engine
+import bot_registry
+import columnar_cache
+import date_parsing
+import frame_cache
+import schema
+from workbook_loader import WorkbookLoader
 
 # ---------- Canonical field targets ----------
 CANONICAL_FIELDS = {
@@ -48,6 +57,37 @@ CANONICAL_FIELDS = {
     },
 }
 
+# ---------- Canonical column types (coerced once at load, see schema.py) ----------
+# INT_RATE stays raw: zero_or_null_roi_loans matches its text form ("0", "-").
+CANONICAL_TYPES = {
+    "Banking": {
+        "Loan Dump": {
+            "ASSET": schema.TEXT,
+            "URI": schema.NUMBER,
+            "CUST_CATEGORY": schema.TEXT,
+            "PROVISION": schema.NUMBER,
+            "AMT_OS": schema.NUMBER,
+            "RESTRUCTURED_FLG": schema.TEXT,
+            "RESTR_DATE": schema.DATE,
+            "FB_NFB_FLG": schema.TEXT,
+            "OUT_ORD_DT": schema.DATE,
+            "DRAW_LMT": schema.NUMBER,
+            "SECTOR": schema.TEXT,
+            "SANC_LMT": schema.NUMBER,
+            "PIN_CODE": schema.TEXT,
+        }
+    },
+    "Blacklisted PIN CODE": {
+        "Blacklisted PIN CODE": {"PIN CODE": schema.TEXT}
+    },
+    "Loan Book (31.03.2025)": {
+        "Loan Book (31.03.2025)": {"LOAN OUTSTANDING (Rs.)": schema.NUMBER}
+    },
+    "Loan Book (30.06.2025)": {
+        "Loan Book (30.06.2025)": {"LOAN OUTSTANDING (Rs.)": schema.NUMBER}
+    },
+}
+
 def _build_rename_map(required_to_actual: Dict[str, str], req_to_canon: Dict[str, str]) -> Dict[str, str]:
     rename = {}
     for req, actual in required_to_actual.items():
@@ -55,54 +95,302 @@ def _build_rename_map(required_to_actual: Dict[str, str], req_to_canon: Dict[str
             rename[actual] = req_to_canon[req]
     return rename
 
-def _read_sheet_from(bytes_blob: bytes, sheet_name: str, header_row: int = 0) -> pd.DataFrame:
-    bio = BytesIO(bytes_blob)
-    return pd.read_excel(bio, sheet_name=sheet_name, header=header_row)
+def _header_row_for(cat: str) -> int:
+    return 1 if cat == "Loan Book (31.03.2025)" else (2 if cat == "Loan Book (30.06.2025)" else 0)
+
+def _to_canonical(
+    cat: str,
+    req_sheet: str,
+    df: pd.DataFrame,
+    fields_map: Dict[str, Dict[str, str]],
+    date_formats: Optional[Dict[str, tuple]] = None,
+    source: Optional[tuple] = None,
+) -> pd.DataFrame:
+    rename = _build_rename_map(fields_map.get(req_sheet, {}), CANONICAL_FIELDS.get(cat, {}).get(req_sheet, {}))
+    if rename:
+        df = df.rename(columns=rename)
+    # Ensure canonical columns exist
+    for col in CANONICAL_FIELDS.get(cat, {}).get(req_sheet, {}).values():
+        if col not in df.columns:
+            df[col] = np.nan
+    types = CANONICAL_TYPES.get(cat, {}).get(req_sheet, {})
+    if date_formats is not None:
+        # Chunked reads: fix each date column's formats from the first chunk that has text dates
+        for col, kind in types.items():
+            if kind == schema.DATE and not date_formats.get(col) and col in df.columns:
+                date_formats[col] = date_parsing.infer_formats(df[col])
+    return schema.apply_schema(df, types, date_formats, source=source, origins={v: k for k, v in rename.items()})
 
 # ---------- DataFrame preparation ----------
+def _register_cat(
+    cat: str,
+    file_bytes_map: Dict[str, bytes],
+    sheet_mapping_pairs: Dict[str, Dict[str, str]],
+    loader: WorkbookLoader,
+) -> None:
+    if cat in sheet_mapping_pairs and file_bytes_map.get(cat):
+        loader.session(file_bytes_map[cat]).want(sheet_mapping_pairs[cat].values(), header_row=_header_row_for(cat))
+
+def _prepared_key(
+    cat: str,
+    file_bytes_map: Dict[str, bytes],
+    sheet_mapping_pairs: Dict[str, Dict[str, str]],
+    column_mapping_pairs: Dict[str, Dict[str, Dict[str, str]]],
+) -> Optional[tuple]:
+    """frame_cache key of the category's prepared frame; None if it has no input."""
+    if cat not in sheet_mapping_pairs or not file_bytes_map.get(cat):
+        return None
+    return ("blogic", cat, columnar_cache.content_key(file_bytes_map[cat]), _header_row_for(cat),
+            frame_cache.mapping_key(sheet_mapping_pairs[cat]),
+            frame_cache.mapping_key(column_mapping_pairs.get(cat, {})))
+
 def prepare_dataframe_for_cat(
     cat: str,
     file_bytes_map: Dict[str, bytes],
     sheet_mapping_pairs: Dict[str, Dict[str, str]],
     column_mapping_pairs: Dict[str, Dict[str, Dict[str, str]]],
+    loader: Optional[WorkbookLoader] = None,
+    registered: bool = False,
 ) -> pd.DataFrame:
-    if cat not in sheet_mapping_pairs:
-        return None
-    file_bytes = file_bytes_map.get(cat)
-    if not file_bytes:
+    """
+    `registered`: the category's sheets were already registered (and prefetched) on `loader`.
+    Prepared frames are reused from frame_cache.PREPARED while upload and mappings are unchanged.
+    """
+    key = _prepared_key(cat, file_bytes_map, sheet_mapping_pairs, column_mapping_pairs)
+    if key is None:
         return None
+    hit = frame_cache.PREPARED.get(key)
+    if hit is not None:
+        return hit
+    df = _prepare_dataframe_for_cat(cat, file_bytes_map, sheet_mapping_pairs, column_mapping_pairs,
+                                    loader=loader, registered=registered)
+    if df is not None:
+        frame_cache.PREPARED.put(key, df)
+    return df
+
+def _prepare_dataframe_for_cat(
+    cat: str,
+    file_bytes_map: Dict[str, bytes],
+    sheet_mapping_pairs: Dict[str, Dict[str, str]],
+    column_mapping_pairs: Dict[str, Dict[str, Dict[str, str]]],
+    loader: Optional[WorkbookLoader] = None,
+    registered: bool = False,
+) -> pd.DataFrame:
+    file_bytes = file_bytes_map[cat]
     mapping = sheet_mapping_pairs[cat]
     fields_map = column_mapping_pairs.get(cat, {})
+    header_row = _header_row_for(cat)
+    loader = loader or WorkbookLoader()
+    if not registered:
+        _register_cat(cat, file_bytes_map, sheet_mapping_pairs, loader)
+    session = loader.session(file_bytes)
 
     # For each required sheet
     for req_sheet, mapped_sheet in mapping.items():
         sheet = mapped_sheet
         if not sheet:
             continue
-        header_row = 1 if cat == "Loan Book (31.03.2025)" else (2 if cat == "Loan Book (30.06.2025)" else 0)
-        df = _read_sheet_from(file_bytes, sheet, header_row=header_row)
-        rename = _build_rename_map(fields_map.get(req_sheet, {}), CANONICAL_FIELDS.get(cat, {}).get(req_sheet, {}))
-        if rename:
-            df = df.rename(columns=rename)
-        # Ensure canonical columns exist
-        for col in CANONICAL_FIELDS.get(cat, {}).get(req_sheet, {}).values():
-            if col not in df.columns:
-                df[col] = np.nan
-        return df
+        df = session.read(sheet, header_row=header_row)
+        return _to_canonical(cat, req_sheet, df, fields_map, source=(session.key, sheet, header_row))
     return None
 
+# ---------- Chunked evaluation (very large loan dumps) ----------
+# Above CHUNKED_MIN_ROWS loan-dump rows the CCIS bots run over CHUNK_ROWS-row batches instead
+# of 11 copies of the full frame; only flagged rows and small aggregates are kept between
+# batches. Both can be overridden through the environment.
+CHUNK_ROWS = int(os.getenv("AUDITBOTS_CHUNK_ROWS") or 100_000)
+CHUNKED_MIN_ROWS = int(os.getenv("AUDITBOTS_CHUNKED_MIN_ROWS") or 1_000_000)
+
+def _loan_dump_chunk_size(
+    file_bytes_map: Dict[str, bytes],
+    sheet_mapping_pairs: Dict[str, Dict[str, str]],
+    loader: WorkbookLoader,
+    chunk_size: Optional[int],
+) -> int:
+    """Rows per chunk for the Banking loan dump, or 0 to load it whole."""
+    if chunk_size is not None:
+        return max(int(chunk_size), 0)
+    sheet = sheet_mapping_pairs.get("Banking", {}).get("Loan Dump")
+    file_bytes = file_bytes_map.get("Banking")
+    if not sheet or not file_bytes:
+        return 0
+    rows = loader.session(file_bytes).row_count(sheet, header_row=_header_row_for("Banking"))
+    return CHUNK_ROWS if rows is not None and rows > CHUNKED_MIN_ROWS else 0
+
+def _iter_loan_dump(
+    file_bytes_map: Dict[str, bytes],
+    sheet_mapping_pairs: Dict[str, Dict[str, str]],
+    column_mapping_pairs: Dict[str, Dict[str, Dict[str, str]]],
+    loader: WorkbookLoader,
+    chunk_size: int,
+):
+    """The prepared loan dump (renamed, padded, typed) in row batches."""
+    session = loader.session(file_bytes_map["Banking"])
+    fields_map = column_mapping_pairs.get("Banking", {})
+    sheet = sheet_mapping_pairs["Banking"]["Loan Dump"]
+    date_formats: Dict[str, str] = {}
+    for chunk in session.iter_chunks(sheet, header_row=_header_row_for("Banking"), chunk_size=chunk_size):
+        yield _to_canonical("Banking", "Loan Dump", chunk, fields_map, date_formats)
+
+def _concat_flagged(pieces: list) -> pd.DataFrame:
+    if len(pieces) == 1:
+        return pieces[0]
+    categorical = [c for c in pieces[0].columns if isinstance(pieces[0][c].dtype, pd.CategoricalDtype)]
+    # Empty pieces would only blur the column dtypes
+    out = pd.concat([p for p in pieces if len(p)] or pieces[:1])
+    # Chunks carry their own categories, which concat turns into object; re-categorise
+    for col in categorical:
+        out[col] = out[col].astype("category")
+    return out
+
+def _run_banking_chunked(
+    file_bytes_map: Dict[str, bytes],
+    sheet_mapping_pairs: Dict[str, Dict[str, str]],
+    column_mapping_pairs: Dict[str, Dict[str, Dict[str, str]]],
+    loader: WorkbookLoader,
+    chunk_size: int,
+    df_blacklist: Optional[pd.DataFrame],
+    progress: bot_engine.Progress = None,
+    workers: Optional[int] = None,
+    executor: Optional[str] = None,
+) -> Tuple[Dict[str, pd.DataFrame], Dict[str, str], int]:
+    """
+    Pass 1 runs the row-local bots (and the blacklist match) chunk by chunk, keeping only
+    flagged rows, and sums (FACILITYCD, SCHEME_CD) counts. Pass 2 re-streams the dump to
+    flag rows against the majority scheme. Returns results, statuses and the row count.
+    All bots start together; a "rows" event follows each chunk of either pass. The bots of
+    one chunk run concurrently (bot_engine.run).
+    """
+    # The registry's row-local bots (the blacklist match only with a blacklist)
+    waves, _ = bot_registry.plan(bot_registry.row_local(bot_registry.BANKING_BOTS),
+                                 ["BANKING_RAW"] + (["BLACKLIST_RAW"] if df_blacklist is not None else []))
+    bots = {key: bot_registry.REGISTRY[key].call({}) for wave in waves for key in wave}
+    flagged = {key: [] for key in bots}
+    seconds = {key: 0.0 for key in bots}
+    failed = set()
+    counts, facilities, total_rows = None, set(), 0
+    chunks = lambda: _iter_loan_dump(file_bytes_map, sheet_mapping_pairs, column_mapping_pairs, loader, chunk_size)
+    codes = [*bots, "misaligned_scheme_for_facilities"]
+    for code in codes:
+        bot_engine.emit(progress, bot_engine.START, code, total=len(codes))
+    t0 = time.perf_counter()
+
+    for chunk in chunks():
+        total_rows += len(chunk)
+        bot_engine.emit(progress, bot_engine.ROWS, rows=total_rows)
+        live = {key: bot for key, bot in bots.items() if key not in failed}
+        ran = bot_engine.run(live, frames={"BANKING_RAW": chunk, "BLACKLIST_RAW": df_blacklist},
+                             workers=workers, executor=executor)
+        for key in live:
+            seconds[key] += ran.seconds[key]
+            if ran.proc_status[key] == "Complete":
+                flagged[key].append(ran.results[key])
+            else:
+                failed.add(key)
+                flagged[key] = []
+        if "misaligned_scheme_for_facilities" not in failed:
+            try:
+                counts = blogic6.add_scheme_counts(counts, blogic6.scheme_counts(chunk))
+                facilities.update(chunk["FACILITYCD"].dropna().unique())
+            except Exception:
+                failed.add("misaligned_scheme_for_facilities")
+
+    results: Dict[str, pd.DataFrame] = {}
+    proc_status: Dict[str, str] = {}
+    for key in bots:
+        if key in failed:
+            proc_status[key] = "Failed"
+        else:
+            try:
+                results[key] = _concat_flagged(flagged.pop(key))
+                proc_status[key] = "Complete"
+            except Exception:
+                proc_status[key] = "Failed"
+    bot_engine.finished(bots, proc_status, progress, seconds=seconds, results=results, total=len(codes))
+
+    key = "misaligned_scheme_for_facilities"
+    try:
+        if key in failed:
+            raise ValueError("scheme counts unavailable")
+        mode_map = blogic6.majority_scheme(counts, facilities)
+        pieces, seen = [], 0
+        for c in chunks():
+            pieces.append(blogic6.misaligned_scheme_for_facilities(c, mode_map))
+            seen += len(c)
+            bot_engine.emit(progress, bot_engine.ROWS, key, rows=seen)
+        results[key] = _concat_flagged(pieces)
+        proc_status[key] = "Complete"
+    except Exception:
+        proc_status[key] = "Failed"
+    bot_engine.emit(progress, bot_engine.FINISH, key, proc_status[key], rows=bot_engine.row_count(results.get(key)),
+                    done=len(codes), total=len(codes), seconds=time.perf_counter() - t0)
+    return results, proc_status, total_rows
+
 # ---------- Runner ----------
 def run_all_bots_with_mappings(
     file_bytes_map: Dict[str, bytes],
     sheet_mapping_pairs: Dict[str, Dict[str, str]],
     column_mapping_pairs: Dict[str, Dict[str, Dict[str, str]]],
+    engine: Optional[str] = None,
+    chunk_size: Optional[int] = None,
+    progress: bot_engine.Progress = None,
+    workers: Optional[int] = None,
+    executor: Optional[str] = None,
 ) -> Tuple[Dict[str, pd.DataFrame], Dict[str, str], Dict[str, pd.DataFrame]]:
+    """
+    chunk_size: rows per batch for the CCIS loan dump. None decides from the sheet's row
+    count (chunked above CHUNKED_MIN_ROWS); 0 always loads the dump whole. In chunked mode
+    the full dump is never held, so raw_dfs has no "BANKING_RAW".
+    progress: receives a bot_engine.ProgressEvent for the ingest, each bot's start and
+    finish, and each chunk read in chunked mode.
+    workers / executor: how the bots are scheduled (see bot_engine.run); by default
+    AUDITBOTS_BOT_WORKERS threads.
+    """
     results: Dict[str, pd.DataFrame] = {}
     proc_status: Dict[str, str] = {}
     raw_dfs: Dict[str, pd.DataFrame] = {}
+    loader = WorkbookLoader(engine=engine)
+
+    cached = {cat for cat in CANONICAL_FIELDS
+              if frame_cache.cached(_prepared_key(cat, file_bytes_map, sheet_mapping_pairs, column_mapping_pairs))}
+    if chunk_size is None and "Banking" in cached:
+        chunk_size = 0  # only whole loan dumps are cached; no need to count its rows again
+    chunk_size = _loan_dump_chunk_size(file_bytes_map, sheet_mapping_pairs, loader, chunk_size)
+
+    # The four uploads are independent: parse them side by side in worker processes
+    # (a chunked loan dump is streamed later instead; cached frames are not parsed at all)
+    for cat in CANONICAL_FIELDS:
+        if cat not in cached and not (cat == "Banking" and chunk_size):
+            _register_cat(cat, file_bytes_map, sheet_mapping_pairs, loader)
+    loader.prefetch()
+    prepare = lambda cat: prepare_dataframe_for_cat(
+        cat, file_bytes_map, sheet_mapping_pairs, column_mapping_pairs, loader=loader, registered=True
+    )
 
+    if chunk_size:
+        df_blacklist = bot_engine.ingest(lambda: prepare("Blacklisted PIN CODE"), progress)
+        chunk_results, chunk_status, input_rows = _run_banking_chunked(
+            file_bytes_map, sheet_mapping_pairs, column_mapping_pairs, loader, chunk_size, df_blacklist, progress,
+            workers=workers, executor=executor,
+        )
+        results.update(chunk_results)
+        proc_status.update(chunk_status)
+        if df_blacklist is not None:
+            raw_dfs["BLACKLIST_RAW"] = df_blacklist
+        try:
+            import streamlit as st
+            st.session_state["input_row_count"] = input_rows
+        except Exception:
+            pass
+        df_banking = None
+        df_loan_mar, df_loan_jun = bot_engine.ingest(
+            lambda: (prepare("Loan Book (31.03.2025)"), prepare("Loan Book (30.06.2025)")), progress
+        )
+    else:
+        df_banking, df_blacklist, df_loan_mar, df_loan_jun = bot_engine.ingest(
+            lambda: tuple(prepare(cat) for cat in CANONICAL_FIELDS), progress
+        )
     # --- CCIS / Banking bots ---
-    df_banking = prepare_dataframe_for_cat("Banking", file_bytes_map, sheet_mapping_pairs, column_mapping_pairs)
     if df_banking is not None:
         raw_dfs["BANKING_RAW"] = df_banking
         # Set input_row_count in session state for use in b7.py Output tab
@@ -111,48 +399,23 @@ def run_all_bots_with_mappings(
             st.session_state["input_row_count"] = len(df_banking)
         except Exception:
             pass
-        bot_map = {
-            "zero_or_null_roi_loans": blogic6.zero_or_null_roi_loans,
-            "standard_accounts_with_uri_zero": blogic6.standard_accounts_with_uri_zero,
-            "provision_verification_substandard_npa": blogic6.provision_verification_substandard_npa,
-            "restructured_standard_accounts": blogic6.restructured_standard_accounts,
-            "provision_verification_doubtful3_npa": blogic6.provision_verification_doubtful3_npa,
-            "npa_fb_accounts_overdue": blogic6.npa_fb_accounts_overdue,
-            "negative_amt_outstanding": blogic6.negative_amt_outstanding,
-            "standard_accounts_overdue_details": blogic6.standard_accounts_overdue_details,
-            "standard_accounts_with_odd_interest": blogic6.standard_accounts_with_odd_interest,
-            "agri0_sector_over_limit": blogic6.agri0_sector_over_limit,
-            "misaligned_scheme_for_facilities": blogic6.misaligned_scheme_for_facilities,
-        }
-        for key, fn in bot_map.items():
-            try:
-                results[key] = fn(df_banking.copy())
-                proc_status[key] = "Complete"
-            except Exception:
-                proc_status[key] = "Failed"
-
-    # --- Bot 12: Loans & Advances to Blacklisted Areas ---
-    # This bot uses the same main input DataFrame (df_banking) as the first 11 bots,
-    # along with the Blacklist input. Its total input row count should match the others.
-    df_blacklist = prepare_dataframe_for_cat("Blacklisted PIN CODE", file_bytes_map, sheet_mapping_pairs, column_mapping_pairs)
-    if df_banking is not None and df_blacklist is not None:
-        try:
-            results["Loans & Advances to Blacklisted Areas"] = blogic6.match_pincode(df_banking.copy(), df_blacklist.copy())
-            proc_status["Loans & Advances to Blacklisted Areas"] = "Complete"
-        except Exception:
-            proc_status["Loans & Advances to Blacklisted Areas"] = "Failed"
-        raw_dfs["BLACKLIST_RAW"] = df_blacklist
+        # Bot 12 (Loans & Advances to Blacklisted Areas) reads the same loan dump as the first
+        # 11 bots, along with the Blacklist input
+        if df_blacklist is not None:
+            raw_dfs["BLACKLIST_RAW"] = df_blacklist
 
     # --- Loan Book bots (requires both Mar + Jun) ---
-    df_loan_mar = prepare_dataframe_for_cat("Loan Book (31.03.2025)", file_bytes_map, sheet_mapping_pairs, column_mapping_pairs)
-    df_loan_jun = prepare_dataframe_for_cat("Loan Book (30.06.2025)", file_bytes_map, sheet_mapping_pairs, column_mapping_pairs)
     if df_loan_mar is not None and df_loan_jun is not None:
-        try:
-            results["Blank Asset Classification"] = blogic6.merge_and_blank_asset_classification(df_loan_mar.copy(), df_loan_jun.copy())
-            proc_status["Blank Asset Classification"] = "Complete"
-        except Exception:
-            proc_status["Blank Asset Classification"] = "Failed"
         raw_dfs["LOAN_MAR_RAW"] = df_loan_mar
         raw_dfs["LOAN_JUN_RAW"] = df_loan_jun
 
+    # The bots copy what they change, so all of them read the one loaded frame. Bots whose
+    # inputs are missing (or already ran chunk by chunk) are left out by the planner.
+    job = bot_registry.Job({
+        "BANKING_RAW": df_banking, "BLACKLIST_RAW": df_blacklist if df_banking is not None else None,
+        "LOAN_MAR_RAW": df_loan_mar, "LOAN_JUN_RAW": df_loan_jun,
+    }).run(bot_registry.BANKING_BOTS, progress, workers=workers, executor=executor)
+    results.update(job.results(bot_registry.BANKING_BOTS))
+    proc_status.update(job.proc_status)
+
     return results, proc_status, raw_dfs
@@ -3,10 +3,13 @@ import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
 
+# Columns arrive pre-typed from blogic.CANONICAL_TYPES; these calls are then no-ops
+from schema import to_date, to_number, to_text
+
 # ---------------- 1. Zero or Null ROI Loans ---------------- # New
 def zero_or_null_roi_loans(df: pd.DataFrame) -> pd.DataFrame:
     df1 = df.copy()
-    df1['ASSET'] = df1['ASSET'].astype(str)
+    df1['ASSET'] = to_text(df1['ASSET'])
     df1['INT_RATE'] = df1['INT_RATE'].astype(str)
     return df1[
         (df1["ASSET"].isin(["11", "12"])) &
@@ -16,17 +19,17 @@ def zero_or_null_roi_loans(df: pd.DataFrame) -> pd.DataFrame:
 # ---------------- 2. Standard Accounts with URI Zero ---------------- # Same
 def standard_accounts_with_uri_zero(df: pd.DataFrame) -> pd.DataFrame:
     df2 = df.copy()
-    df2['ASSET'] = df2['ASSET'].astype(str)
-    df2["URI"] = pd.to_numeric(df2["URI"], errors="coerce")
+    df2['ASSET'] = to_text(df2['ASSET'])
+    df2["URI"] = to_number(df2["URI"])
     return df2[(df2["ASSET"].isin(["11", "12"])) & (df2["URI"] == 0)]
 
 # ---------------- 3. Provision Verification for Sub-Standard NPA ---------------- # New
 def provision_verification_substandard_npa(df: pd.DataFrame) -> pd.DataFrame:
     df3 = df.copy()
-    df3['ASSET'] = df3['ASSET'].astype(str)
-    df3['CUST_CATEGORY'] = df3['CUST_CATEGORY'].astype(str)
-    df3["PROVISION"] = pd.to_numeric(df3["PROVISION"], errors="coerce")
-    df3["AMT_OS"] = pd.to_numeric(df3["AMT_OS"], errors="coerce")
+    df3['ASSET'] = to_text(df3['ASSET'])
+    df3['CUST_CATEGORY'] = to_text(df3['CUST_CATEGORY'])
+    df3["PROVISION"] = to_number(df3["PROVISION"])
+    df3["AMT_OS"] = to_number(df3["AMT_OS"])
     return df3[
         (df3["CUST_CATEGORY"] == "NPA") &
         (df3["ASSET"].isin(["21", "22"])) &
@@ -36,11 +39,11 @@ def provision_verification_substandard_npa(df: pd.DataFrame) -> pd.DataFrame:
 # ---------------- 4. Restructured Standard Accounts ---------------- # Old but new insight
 def restructured_standard_accounts(df: pd.DataFrame) -> pd.DataFrame:
     df4 = df.copy()
-    df4['ASSET'] = df4['ASSET'].astype(str)
-    df4['RESTRUCTURED_FLG'] = df4['RESTRUCTURED_FLG'].astype(str)
-    df4["AMT_OS"] = pd.to_numeric(df4["AMT_OS"], errors="coerce")
-    df4["PROVISION"] = pd.to_numeric(df4["PROVISION"], errors="coerce")
-    df4["RESTR_DATE"] = pd.to_datetime(df4["RESTR_DATE"], errors="coerce")
+    df4['ASSET'] = to_text(df4['ASSET'])
+    df4['RESTRUCTURED_FLG'] = to_text(df4['RESTRUCTURED_FLG'])
+    df4["AMT_OS"] = to_number(df4["AMT_OS"])
+    df4["PROVISION"] = to_number(df4["PROVISION"])
+    df4["RESTR_DATE"] = to_date(df4["RESTR_DATE"])
     two_years_ago = datetime.today() - timedelta(days=730)
 
     return df4[
@@ -54,10 +57,10 @@ def restructured_standard_accounts(df: pd.DataFrame) -> pd.DataFrame:
 # ---------------- 5. Provision Verification for Doubtful-3 NPA ---------------- # same as previous
 def provision_verification_doubtful3_npa(df: pd.DataFrame) -> pd.DataFrame:
     df5 = df.copy()
-    df5['ASSET'] = df5['ASSET'].astype(str)
-    df5['CUST_CATEGORY'] = df5['CUST_CATEGORY'].astype(str)
-    df5["PROVISION"] = pd.to_numeric(df5["PROVISION"], errors="coerce")
-    df5["AMT_OS"] = pd.to_numeric(df5["AMT_OS"], errors="coerce")
+    df5['ASSET'] = to_text(df5['ASSET'])
+    df5['CUST_CATEGORY'] = to_text(df5['CUST_CATEGORY'])
+    df5["PROVISION"] = to_number(df5["PROVISION"])
+    df5["AMT_OS"] = to_number(df5["AMT_OS"])
     return df5[
         (df5["CUST_CATEGORY"] == "NPA") &
         (df5["ASSET"].isin(["31", "32", "33"])) &
@@ -67,8 +70,8 @@ def provision_verification_doubtful3_npa(df: pd.DataFrame) -> pd.DataFrame:
 # ---------------- 6. NPA FB Accounts with Overdue Flags ---------------- # old but new insight
 def npa_fb_accounts_overdue(df: pd.DataFrame) -> pd.DataFrame:
     df6 = df.copy()
-    df6['FB_NFB_FLG'] = df6['FB_NFB_FLG'].astype(str)
-    df6["OUT_ORD_DT"] = pd.to_datetime(df6["OUT_ORD_DT"], errors="coerce")
+    df6['FB_NFB_FLG'] = to_text(df6['FB_NFB_FLG'])
+    df6["OUT_ORD_DT"] = to_date(df6["OUT_ORD_DT"])
     three_months_ago = datetime.today() - timedelta(days=90)
     return df6[
         (df6["FB_NFB_FLG"] == "FB") &
@@ -78,14 +81,14 @@ def npa_fb_accounts_overdue(df: pd.DataFrame) -> pd.DataFrame:
 # ---------------- 7. Negative Amount Outstanding ---------------- # same as previous    (Requires Blacklisted Pin codes)
 def negative_amt_outstanding(df: pd.DataFrame) -> pd.DataFrame:
     df7 = df.copy()
-    df7["AMT_OS"] = pd.to_numeric(df7["AMT_OS"], errors="coerce")
+    df7["AMT_OS"] = to_number(df7["AMT_OS"])
     return df7[df7["AMT_OS"] < 0]
 
 # ---------------- 8. Standard Accounts Overdue Details ---------------- # same but new insight (1 step removed)
 def standard_accounts_overdue_details(df: pd.DataFrame) -> pd.DataFrame:
     df8 = df.copy()
-    df8["AMT_OS"] = pd.to_numeric(df8["AMT_OS"], errors="coerce")
-    df8["DRAW_LMT"] = pd.to_numeric(df8["DRAW_LMT"], errors="coerce")
+    df8["AMT_OS"] = to_number(df8["AMT_OS"])
+    df8["DRAW_LMT"] = to_number(df8["DRAW_LMT"])
     return df8[
         (df8["AMT_OS"] - df8["DRAW_LMT"]) > (0.1 * df8["DRAW_LMT"])
     ]
@@ -93,8 +96,8 @@ def standard_accounts_overdue_details(df: pd.DataFrame) -> pd.DataFrame:
 # ---------------- 9. Standard Accounts with Odd Interest Rates ---------------- # same but new insight (+1 check added)
 def standard_accounts_with_odd_interest(df: pd.DataFrame) -> pd.DataFrame:
     df9 = df.copy()
-    df9['ASSET'] = df9['ASSET'].astype(str)
-    df9["INT_RATE"] = pd.to_numeric(df9["INT_RATE"], errors="coerce")
+    df9['ASSET'] = to_text(df9['ASSET'])
+    df9["INT_RATE"] = to_number(df9["INT_RATE"])
     return df9[
         (df9["ASSET"].isin(["11", "12"])) &
         (~df9["INT_RATE"].isna()) &
@@ -104,10 +107,10 @@ def standard_accounts_with_odd_interest(df: pd.DataFrame) -> pd.DataFrame:
 # ---------------- 10. Agri0 Sector Over Limit ---------------- # same
 def agri0_sector_over_limit(df: pd.DataFrame) -> pd.DataFrame:
     df10 = df.copy()
-    df10['ASSET'] = df10['ASSET'].astype(str)
-    df10['SECTOR'] = df10['SECTOR'].astype(str)
-    df10["AMT_OS"] = pd.to_numeric(df10["AMT_OS"], errors="coerce")
-    df10["SANC_LMT"] = pd.to_numeric(df10["SANC_LMT"], errors="coerce")
+    df10['ASSET'] = to_text(df10['ASSET'])
+    df10['SECTOR'] = to_text(df10['SECTOR'])
+    df10["AMT_OS"] = to_number(df10["AMT_OS"])
+    df10["SANC_LMT"] = to_number(df10["SANC_LMT"])
     return df10[
         (df10["ASSET"].isin(["11", "12"])) &
         (df10["SECTOR"] == "01.Agri") &
@@ -115,12 +118,31 @@ def agri0_sector_over_limit(df: pd.DataFrame) -> pd.DataFrame:
     ]
 
 # ---------------- Logic 11 ---------------- # from previous version
-def misaligned_scheme_for_facilities(df: pd.DataFrame) -> pd.DataFrame:
+def misaligned_scheme_for_facilities(df: pd.DataFrame, mode_map: pd.Series = None) -> pd.DataFrame:
     df3 = df.copy()
-    mode_map = df3.groupby('FACILITYCD')['SCHEME_CD'].agg(lambda x: x.mode().iloc[0])
+    if mode_map is None:
+        mode_map = df3.groupby('FACILITYCD')['SCHEME_CD'].agg(lambda x: x.mode().iloc[0])
     df3['MAJ_SCHEME'] = df3['FACILITYCD'].map(mode_map)
     return df3[df3['SCHEME_CD'] != df3['MAJ_SCHEME']].drop(columns=['MAJ_SCHEME'])
 
+# Chunked mode (blogic.run_all_bots_with_mappings on very large dumps) builds mode_map in a
+# first pass: per-chunk (FACILITYCD, SCHEME_CD) counts are summed, then reduced to the mode.
+def scheme_counts(df: pd.DataFrame) -> pd.Series:
+    return df.groupby(['FACILITYCD', 'SCHEME_CD']).size()
+
+def add_scheme_counts(total: pd.Series, counts: pd.Series) -> pd.Series:
+    return counts if total is None else total.add(counts, fill_value=0)
+
+def majority_scheme(counts: pd.Series, facilities: set) -> pd.Series:
+    """Most frequent SCHEME_CD per facility, ties going to the smallest code (as Series.mode)."""
+    c = counts.rename('n').reset_index()
+    top = c[c['n'] == c.groupby('FACILITYCD')['n'].transform('max')]
+    mode_map = top.groupby('FACILITYCD')['SCHEME_CD'].min()
+    if set(facilities) - set(mode_map.index):
+        # Same outcome as the whole-frame bot: a facility with no scheme code has no mode
+        raise IndexError("facility without any SCHEME_CD")
+    return mode_map
+
 
 import pandas as pd
 
@@ -184,11 +206,11 @@ def match_pincode(df1: pd.DataFrame, df2: pd.DataFrame) -> pd.DataFrame:
     df2_copy = df2.copy()
 
     # Standardize column values
-    df1_copy["PIN_CODE"] = df1_copy["PIN_CODE"].astype(str).str.strip()
-    df2_copy["PIN CODE"] = df2_copy["PIN CODE"].astype(str).str.strip()
+    df1_copy["PIN_CODE"] = to_text(df1_copy["PIN_CODE"]).str.strip()
+    df2_copy["PIN CODE"] = to_text(df2_copy["PIN CODE"]).str.strip()
 
-    # Unique blacklist set
-    pin_set = set(df2_copy["PIN CODE"].unique())
+    # Unique blacklist set (blank PINs never match)
+    pin_set = set(df2_copy["PIN CODE"].dropna().unique())
 
     # Filter CCIS by blacklist
     return df1_copy[df1_copy["PIN_CODE"].isin(pin_set)]
@@ -0,0 +1,294 @@
+# ============================== bot_engine.py — Bot Execution & Progress ==============================
+import multiprocessing
+import os
+import pickle
+import shutil
+import tempfile
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Dict, Iterable, NamedTuple, Optional, Tuple, Union
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+# The runners (logic / blogic / processpage) hand their bots here as zero-argument callables
+# or as Calls over named input frames. Progress comes from the work itself: one event when
+# ingest starts and ends, one when each bot starts and finishes, and "rows" events from bots
+# that stream their input in chunks. The UI pages render the events as they arrive, so a run
+# ends as soon as its work does. Events are always delivered on the calling thread.
+INGEST = "ingest"
+START = "start"
+ROWS = "rows"
+FINISH = "finish"
+
+# Bots are independent read-only filters over shared frames, so they run side by side:
+# "thread" runs them on a thread pool (pandas / numpy release the GIL in their kernels),
+# "process" in worker processes that memory-map the inputs from Arrow IPC files. Calls
+# are what a process can run; other bots of a run stay on threads.
+BOT_WORKERS = int(os.getenv("AUDITBOTS_BOT_WORKERS") or (os.cpu_count() or 1))
+BOT_EXECUTOR = (os.getenv("AUDITBOTS_BOT_EXECUTOR") or "thread").lower()
+EXECUTORS = ("thread", "process")
+
+
+class ProgressEvent(NamedTuple):
+    kind: str               # INGEST / START / ROWS / FINISH
+    code: str               # bot code; "" for ingest
+    status: str             # "Processing", "Complete" or "Failed"
+    rows: int = 0           # input rows read so far (ingest / rows), flagged rows on a bot's finish
+    done: int = 0           # bots finished so far in this run
+    total: int = 0          # bots in this run
+    seconds: float = 0.0    # wall time of the step, on finish
+    error: str = ""
+
+
+Progress = Optional[Callable[[ProgressEvent], None]]
+
+
+class Ref(str):
+    """A keyword argument of a Call that names one of the run's frames."""
+
+
+def _resolve(kwargs: Dict[str, Any], frames: Dict[str, Any]) -> Dict[str, Any]:
+    return {k: frames[v] if isinstance(v, Ref) else v for k, v in kwargs.items()}
+
+
+class Call:
+    """A bot as a module-level function of named input frames (and fixed keyword arguments)."""
+
+    def __init__(self, fn: Callable[..., pd.DataFrame], *inputs: str, **kwargs: Any):
+        self.fn = fn
+        self.inputs = inputs
+        self.kwargs = kwargs
+
+    @property
+    def needs(self) -> Tuple[str, ...]:
+        """Every frame the call reads: positional inputs, then Ref keywords."""
+        return self.inputs + tuple(v for v in self.kwargs.values() if isinstance(v, Ref))
+
+    def __call__(self, frames: Dict[str, Any]) -> pd.DataFrame:
+        return self.fn(*(frames[name] for name in self.inputs), **_resolve(self.kwargs, frames))
+
+
+Bot = Union[Callable[[], pd.DataFrame], Call]
+
+
+class BotRun(NamedTuple):
+    results: Dict[str, pd.DataFrame]
+    proc_status: Dict[str, str]     # "Complete" / "Failed"
+    errors: Dict[str, str]          # message per failed bot
+    seconds: Dict[str, float]       # wall time per bot
+
+
+def emit(progress: Progress, kind: str, code: str = "", status: str = "Processing", **fields) -> None:
+    if progress is not None:
+        progress(ProgressEvent(kind, code, status, **fields))
+
+
+def row_count(obj) -> int:
+    """Rows of a result or input frame (0 for None / non-frames)."""
+    return len(obj) if isinstance(obj, (pd.DataFrame, pd.Series)) else 0
+
+
+def ingest(load: Callable[[], tuple], progress: Progress = None) -> tuple:
+    """Run `load` (which returns frames) between an ingest start and finish event."""
+    emit(progress, INGEST)
+    t0 = time.perf_counter()
+    frames = load()
+    parts = frames if isinstance(frames, (tuple, list)) else (frames,)
+    emit(progress, INGEST, status="Complete", rows=sum(row_count(f) for f in parts),
+         seconds=time.perf_counter() - t0)
+    return frames
+
+
+def _timed(fn: Callable, *args, **kwargs) -> Tuple[Any, float]:
+    t0 = time.perf_counter()
+    out = fn(*args, **kwargs)
+    return out, time.perf_counter() - t0
+
+
+# ---------- Shared Arrow inputs (process mode) ----------
+def _shm_dir() -> Optional[str]:
+    # tmpfs where there is one, so the workers map the inputs straight from memory
+    return "/dev/shm" if os.path.isdir("/dev/shm") else None
+
+
+def _share_frame(df: pd.DataFrame, path: str) -> None:
+    """
+    Write df as an Arrow IPC file at `path` (index and dtypes kept). Columns Arrow cannot
+    hold as they are (e.g. numbers mixed with text) go to a pickle beside it.
+    """
+    rest = []
+    for col in df.columns:
+        if df[col].dtype == object:
+            try:
+                pa.array(df[col], from_pandas=True)
+            except (pa.ArrowInvalid, pa.ArrowTypeError):
+                rest.append(col)
+    table = pa.Table.from_pandas(df.drop(columns=rest), preserve_index=True)
+    with pa.OSFile(path + ".arrow", "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+        writer.write_table(table)
+    with open(path + ".pkl", "wb") as f:
+        pickle.dump((list(df.columns), df[rest] if rest else None), f, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+def _load_frame(path: str) -> pd.DataFrame:
+    with pa.memory_map(path + ".arrow") as source:
+        df = pa.ipc.open_file(source).read_all().to_pandas()
+    # Arrow hands back None for empty text cells; the prepared frames hold NaN
+    for col in df.columns[df.dtypes == object]:
+        df[col] = df[col].where(df[col].notna(), np.nan)
+    with open(path + ".pkl", "rb") as f:
+        columns, rest = pickle.load(f)
+    if rest is not None:
+        for col in rest.columns:
+            df[col] = rest[col].to_numpy()
+    return df[columns]
+
+
+# Frames already mapped in this worker, for the run directory they came from
+_LOADED: Dict[str, pd.DataFrame] = {}
+
+
+def _run_shared(call: Call, paths: Dict[str, str]):
+    """Worker side of a Call in process mode."""
+    run_dir = os.path.dirname(next(iter(paths.values()))) if paths else ""
+    if any(os.path.dirname(p) != run_dir for p in _LOADED):
+        _LOADED.clear()
+    frames = {}
+    for name in call.needs:
+        if paths[name] not in _LOADED:
+            _LOADED[paths[name]] = _load_frame(paths[name])
+        frames[name] = _LOADED[paths[name]]
+    return _timed(call, frames)
+
+
+_POOL: Optional[ProcessPoolExecutor] = None
+_POOL_WORKERS = 0
+
+
+def _pool(workers: int) -> ProcessPoolExecutor:
+    # Kept for the life of the server, like workbook_loader's ingest pool; "spawn" because
+    # the Streamlit server is multi-threaded
+    global _POOL, _POOL_WORKERS
+    if _POOL is None or _POOL_WORKERS != workers:
+        _reset_pool()
+        _POOL = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+        _POOL_WORKERS = workers
+    return _POOL
+
+
+def _reset_pool() -> None:
+    global _POOL
+    if _POOL is not None:
+        _POOL.shutdown(wait=False, cancel_futures=True)
+        _POOL = None
+
+
+# ---------- Scheduler ----------
+def run(
+    bots: Dict[str, Bot],
+    progress: Progress = None,
+    frames: Optional[Dict[str, pd.DataFrame]] = None,
+    workers: Optional[int] = None,
+    executor: Optional[str] = None,
+) -> BotRun:
+    """
+    Run each bot once. `frames` are the named inputs of the Calls among `bots`. With more
+    than one worker the bots run concurrently (`executor` "thread" or "process", default
+    BOT_EXECUTOR); a bot's start event is sent when a worker takes it up. Results do not
+    depend on the executor or the worker count.
+    """
+    frames = frames or {}
+    workers = max(1, BOT_WORKERS if workers is None else int(workers))
+    executor = (executor or BOT_EXECUTOR).lower()
+    if executor not in EXECUTORS:
+        raise ValueError(f"Unknown executor {executor!r}; expected one of {EXECUTORS}.")
+    out = BotRun({}, {}, {}, {})
+    total = len(bots)
+
+    def _finish(code: str, result: Any = None, seconds: float = 0.0, error: Optional[BaseException] = None):
+        if error is None:
+            out.results[code] = result
+            out.proc_status[code] = "Complete"
+        else:
+            out.proc_status[code] = "Failed"
+            out.errors[code] = str(error)
+        out.seconds[code] = seconds
+        emit(progress, FINISH, code, out.proc_status[code], rows=row_count(result), done=len(out.proc_status),
+             total=total, seconds=seconds, error=out.errors.get(code, ""))
+
+    def _local(bot: Bot) -> Tuple[Any, float]:
+        return _timed(bot, frames) if isinstance(bot, Call) else _timed(bot)
+
+    if workers == 1 or total < 2:
+        for code, bot in bots.items():
+            emit(progress, START, code, done=len(out.proc_status), total=total)
+            t0 = time.perf_counter()
+            try:
+                _finish(code, *_local(bot))
+            except Exception as e:
+                _finish(code, seconds=time.perf_counter() - t0, error=e)
+        return out
+
+    shared_dir = None
+    pending = list(bots.items())
+    try:
+        threads = ThreadPoolExecutor(max_workers=min(workers, total), thread_name_prefix="bot")
+        pool, paths = None, {}
+        # Calls over frames only (not e.g. an EmployeeIndex) can go to a process
+        shareable = {code for code, b in bots.items()
+                     if isinstance(b, Call) and all(isinstance(frames.get(n), pd.DataFrame) for n in b.needs)}
+        if executor == "process" and shareable:
+            try:
+                shared_dir = tempfile.mkdtemp(prefix="auditbots-", dir=_shm_dir())
+                needed = {name for code in shareable for name in bots[code].needs}
+                for name in sorted(needed):
+                    paths[name] = os.path.join(shared_dir, name)
+                    _share_frame(frames[name], paths[name])
+                pool = _pool(workers)
+            except Exception:
+                pool, paths = None, {}  # inputs Arrow cannot take: run this job on threads
+
+        # At most `workers` bots in flight, so a start event means the bot is running
+        running: Dict[Future, Tuple[str, float]] = {}
+        while pending or running:
+            while pending and len(running) < workers:
+                code, bot = pending.pop(0)
+                emit(progress, START, code, done=len(out.proc_status), total=total)
+                if pool is not None and code in shareable:
+                    fut = pool.submit(_run_shared, bot, paths)
+                else:
+                    fut = threads.submit(_local, bot)
+                running[fut] = (code, time.perf_counter())
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for fut in finished:
+                code, t0 = running.pop(fut)
+                try:
+                    _finish(code, *fut.result())
+                except BrokenProcessPool:
+                    # Workers could not start or died: rebuild the pool on the next job and
+                    # run this bot (and the rest) on threads
+                    if pool is not None:
+                        _reset_pool()
+                        pool = None
+                    running[threads.submit(_local, bots[code])] = (code, time.perf_counter())
+                except Exception as e:
+                    _finish(code, seconds=time.perf_counter() - t0, error=e)
+        threads.shutdown(wait=True)
+    finally:
+        if shared_dir is not None:
+            shutil.rmtree(shared_dir, ignore_errors=True)
+    # Completion order varies between runs; report in the order the bots were given
+    return BotRun(*({code: d[code] for code in bots if code in d} for d in out))
+
+
+def finished(codes: Iterable[str], proc_status: Dict[str, str], progress: Progress = None,
+             seconds: Optional[Dict[str, float]] = None, results: Optional[Dict[str, pd.DataFrame]] = None,
+             total: Optional[int] = None) -> None:
+    """Finish events for bots that ran outside `run` (e.g. the chunked banking pass)."""
+    codes = list(codes)
+    for done, code in enumerate(codes, start=1):
+        emit(progress, FINISH, code, proc_status.get(code, "Failed"), rows=row_count((results or {}).get(code)),
+             done=done, total=total or len(codes), seconds=(seconds or {}).get(code, 0.0))
@@ -0,0 +1,268 @@
+# ============================== bot_registry.py — Bot Registry & Job Planner ==============================
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+import blogic6
+import bot_engine
+import logic6
+
+# Every bot, next-level analytic and shared intermediate is a node with declared inputs.
+# Inputs are the job's prepared frames, named like the pages' raw_dfs keys ("P2P_RAW", ...),
+# or other nodes, e.g. the P2P1 exception table feeding its two dashboard analytics. A Job
+# plans the graph for what was asked, runs it wave by wave through bot_engine (a wave's
+# nodes side by side) and keeps every value, so each intermediate is computed once per job.
+BOT, ANALYTIC, SHARED = "bot", "analytic", "shared"
+
+INPUT_LABELS = {
+    "VENDOR_RAW": "Vendor Master",
+    "P2P_RAW": "P2P Sample",
+    "EMP_P2P_RAW": "P2P Employee Master",
+    "O2C_RAW": "O2C Sample",
+    "CUST_RAW": "Customer Master",
+    "EMP_H2R_RAW": "H2R Employee Master",
+    "ATT_RAW": "Attendance Register",
+    "BANKING_RAW": "CCIS loan dump",
+    "BLACKLIST_RAW": "Blacklisted PIN CODE list",
+    "LOAN_MAR_RAW": "Loan Book (31.03.2025)",
+    "LOAN_JUN_RAW": "Loan Book (30.06.2025)",
+}
+
+
+class BotSpec:
+    """
+    One node of the job graph. `inputs` are passed positionally and `refs` as keywords
+    (keyword -> node); both name frames or other nodes. `optional` inputs are passed as None
+    when the job cannot provide them. `params` read logic6 tunables when the job runs
+    (keyword -> (tunable, cast)); `kwargs` are fixed. `row_local` bots judge each row on its
+    own, so they may run over a loan dump chunk by chunk. `fn` is module level, so a node
+    can also run in a worker process.
+    """
+
+    def __init__(self, name: str, fn: Callable, inputs: Tuple[str, ...] = (), *, kind: str = BOT,
+                 analytic_of: str = "", optional: Tuple[str, ...] = (), refs: Optional[Dict[str, str]] = None,
+                 params: Optional[Dict[str, Tuple[str, Callable]]] = None, kwargs: Optional[Dict[str, Any]] = None,
+                 row_local: bool = False):
+        self.name = name
+        self.fn = fn
+        self.inputs = inputs
+        self.kind = kind
+        self.analytic_of = analytic_of
+        self.optional = optional
+        self.refs = refs or {}
+        self.params = params or {}
+        self.kwargs = kwargs or {}
+        self.row_local = row_local
+
+    @property
+    def deps(self) -> Tuple[str, ...]:
+        return self.inputs + tuple(self.refs.values())
+
+    def call(self, values: Dict[str, Any]) -> bot_engine.Call:
+        """The node as a bot_engine Call over the job's values, with today's tunables."""
+        kwargs = dict(self.kwargs)
+        for kw, (tunable, cast) in self.params.items():
+            kwargs[kw] = cast(getattr(logic6, tunable))
+        kwargs.update({kw: bot_engine.Ref(node) for kw, node in self.refs.items()})
+        return bot_engine.Call(self.fn, *self.inputs, **kwargs)
+
+
+# ---------- Adapters (one signature per node; no hasattr / TypeError probing) ----------
+def overdue_delivery(df: pd.DataFrame, variable5: float) -> pd.DataFrame:
+    return logic6.check_overdue_delivery(df.copy(), variable5=variable5)  # it adds columns to its input
+
+
+def dispatch_without_invoice(df: pd.DataFrame) -> pd.DataFrame:
+    if "Delivery_No" not in df.columns:
+        df = df.assign(Delivery_No=np.nan)
+    return logic6.check_dispatch_without_invoice(df)
+
+
+def attendance_after_exit(emp: pd.DataFrame, att: pd.DataFrame) -> pd.DataFrame:
+    return logic6.attendance_after_exit(emp, att, month_col="Month", year_col=None)
+
+
+def _fuzzy_threshold(value) -> float:
+    return float(value or 0)
+
+
+REGISTRY: Dict[str, BotSpec] = {}
+
+
+def register(spec: BotSpec) -> BotSpec:
+    REGISTRY[spec.name] = spec
+    return spec
+
+
+# ---------- P2P / O2C / H2R ----------
+register(BotSpec("EMPLOYEE_INDEX", logic6.EmployeeIndex, ("EMP_P2P_RAW",), kind=SHARED))
+register(BotSpec("SPEND_CUBE", logic6.vendor_spend_cube, ("P2P_RAW",), kind=SHARED))
+
+register(BotSpec("P2P1", logic6.find_missing_vendor_fields, ("VENDOR_RAW",)))
+register(BotSpec("P2P2", logic6.find_po_grn_invoice_mismatches, ("P2P_RAW",),
+                 params={"variable1": ("PO_GRN_Invoice", float)}))
+register(BotSpec("P2P3", logic6.get_invalid_rows, ("P2P_RAW",)))
+register(BotSpec("P2P4", logic6.generate_result, ("P2P_RAW",),
+                 params={"threshold": ("Generate_self_approved", float), "window_days": ("SPLIT_ORDER_WINDOW_DAYS", int)}))
+register(BotSpec("P2P5", logic6.find_duplicate_vendor_clusters, ("VENDOR_RAW",),
+                 params={"name_threshold": ("FUZZY_NAME_THRESHOLD", _fuzzy_threshold)}))
+register(BotSpec("O2C1", overdue_delivery, ("O2C_RAW",), params={"variable5": ("OVERDUE_DAYS_THRESHOLD", float)}))
+register(BotSpec("O2C2", dispatch_without_invoice, ("O2C_RAW",)))
+register(BotSpec("O2C3", logic6.get_missing_customer_data, ("CUST_RAW",)))
+register(BotSpec("H2R1", logic6.find_ghost_employees, ("EMP_H2R_RAW", "ATT_RAW")))
+register(BotSpec("H2R2", attendance_after_exit, ("EMP_H2R_RAW", "ATT_RAW")))
+
+register(BotSpec("P2P1_ANOMALIES", logic6.anomalies_by_creator, ("VENDOR_RAW", "EMPLOYEE_INDEX"),
+                 kind=ANALYTIC, analytic_of="P2P1", optional=("EMPLOYEE_INDEX",), refs={"missing_table": "P2P1"}))
+register(BotSpec("P2P1_MISSING_DUP", logic6.merge_missing_with_duplicates, ("VENDOR_RAW", "P2P_RAW"),
+                 kind=ANALYTIC, analytic_of="P2P1", refs={"missing_table": "P2P1"}))
+register(BotSpec("P2P2_SUMMARY", logic6.summarize_mismatches, ("P2P2", "P2P_RAW", "EMPLOYEE_INDEX"),
+                 kind=ANALYTIC, analytic_of="P2P2"))
+register(BotSpec("P2P2_FIN_IMPACT", logic6.calculate_financial_impact_df, ("P2P2",),
+                 kind=ANALYTIC, analytic_of="P2P2"))
+register(BotSpec("P2P3_NEXT_LEVEL", logic6.next_level_analytics, ("P2P3", "EMPLOYEE_INDEX"),
+                 kind=ANALYTIC, analytic_of="P2P3", optional=("EMPLOYEE_INDEX",)))
+register(BotSpec("P2P3_FIN_IMPACT", logic6.financial_impact, ("P2P3",), kind=ANALYTIC, analytic_of="P2P3"))
+register(BotSpec("P2P4_SELF_APPROVED", logic6.generate_self_approved_over_threshold, ("P2P_RAW",),
+                 kind=ANALYTIC, analytic_of="P2P4"))
+register(BotSpec("P2P5_FY_ALERTS", logic6.vendor_year_threshold_alerts, ("P2P5",), kind=ANALYTIC,
+                 analytic_of="P2P5", refs={"cube": "SPEND_CUBE"}, params={"variable3": ("vendor_year_threshold", float)}))
+register(BotSpec("P2P5_DAILY_ALERTS", logic6.vendor_daily_threshold_alerts, ("P2P5",), kind=ANALYTIC,
+                 analytic_of="P2P5", refs={"cube": "SPEND_CUBE"}, params={"variable4": ("vendor_daily_threshold", float)}))
+
+# ---------- Banking (CCIS) ----------
+for _code in (
+    "zero_or_null_roi_loans", "standard_accounts_with_uri_zero", "provision_verification_substandard_npa",
+    "restructured_standard_accounts", "provision_verification_doubtful3_npa", "npa_fb_accounts_overdue",
+    "negative_amt_outstanding", "standard_accounts_overdue_details", "standard_accounts_with_odd_interest",
+    "agri0_sector_over_limit",
+):
+    register(BotSpec(_code, getattr(blogic6, _code), ("BANKING_RAW",), row_local=True))
+register(BotSpec("misaligned_scheme_for_facilities", blogic6.misaligned_scheme_for_facilities, ("BANKING_RAW",)))
+register(BotSpec("Loans & Advances to Blacklisted Areas", blogic6.match_pincode, ("BANKING_RAW", "BLACKLIST_RAW"),
+                 row_local=True))
+register(BotSpec("Blank Asset Classification", blogic6.merge_and_blank_asset_classification,
+                 ("LOAN_MAR_RAW", "LOAN_JUN_RAW")))
+
+P2P_O2C_H2R_BOTS = tuple(logic6.PROCESS_TITLES)
+BANKING_BOTS = tuple(code for code in blogic6.PROCESS_TITLES if code in REGISTRY)
+
+
+def analytics_for(codes: Iterable[str]) -> List[str]:
+    """Next-level analytics of the given bots, in registry order."""
+    codes = set(codes)
+    return [name for name, spec in REGISTRY.items() if spec.kind == ANALYTIC and spec.analytic_of in codes]
+
+
+def row_local(codes: Iterable[str]) -> List[str]:
+    return [code for code in codes if REGISTRY[code].row_local]
+
+
+# ---------- Planner ----------
+def plan(targets: Iterable[str], have: Iterable[str]) -> Tuple[List[List[str]], Dict[str, str]]:
+    """
+    Waves of nodes to compute for `targets` given the values in `have`: every node comes
+    after the nodes it reads. Also returns the nodes left out because a required input
+    is missing (node -> that input).
+    """
+    have = set(have)
+    level: Dict[str, int] = {}
+    skipped: Dict[str, str] = {}
+
+    def visit(name: str) -> Optional[int]:
+        """Wave of `name` (-1 when already known), None when it cannot be computed."""
+        if name in have:
+            return -1
+        if name in level:
+            return level[name]
+        if name in skipped or name not in REGISTRY:
+            return None
+        spec = REGISTRY[name]
+        wave = 0
+        for dep in spec.deps:
+            dep_wave = visit(dep)
+            if dep_wave is None:
+                if dep in spec.optional:
+                    continue
+                skipped[name] = skipped.get(dep, dep)
+                return None
+            wave = max(wave, dep_wave + 1)
+        level[name] = wave
+        return wave
+
+    for name in targets:
+        visit(name)
+    waves = [[] for _ in range(max(level.values(), default=-1) + 1)]
+    for name, wave in level.items():
+        waves[wave].append(name)
+    return waves, skipped
+
+
+class Job:
+    """
+    Values of one job's graph: its input frames, then every node computed for it. Nodes
+    run at most once; later requests (e.g. a dashboard tab) reuse what is there.
+    """
+
+    def __init__(self, inputs: Dict[str, Any]):
+        self.inputs = {k: v for k, v in inputs.items() if v is not None}
+        self.values: Dict[str, Any] = dict(self.inputs)
+        self.proc_status: Dict[str, str] = {}
+        self.errors: Dict[str, str] = {}
+        self.seconds: Dict[str, float] = {}
+        self.skipped: Dict[str, str] = {}
+
+    def matches(self, inputs: Dict[str, Any]) -> bool:
+        """Whether this job was built over exactly these frames."""
+        return all(self.inputs.get(k) is v for k, v in inputs.items() if v is not None) and \
+            all(inputs.get(k) is v for k, v in self.inputs.items() if k in INPUT_LABELS)
+
+    def run(self, targets: Iterable[str], progress: bot_engine.Progress = None,
+            workers: Optional[int] = None, executor: Optional[str] = None) -> "Job":
+        """Compute `targets` and everything they need that the job does not hold yet."""
+        waves, skipped = plan(targets, self.values)
+        for name, missing in skipped.items():
+            if name not in self.proc_status:
+                self.skipped[name] = missing
+        for wave in waves:
+            calls, failed_upstream = {}, {}
+            for name in wave:
+                spec = REGISTRY[name]
+                bad = [d for d in spec.deps if self.proc_status.get(d) == "Failed" and d not in spec.optional]
+                if bad:
+                    failed_upstream[name] = f"{bad[0]} failed: {self.errors.get(bad[0], '')}".rstrip(": ")
+                    continue
+                calls[name] = spec.call(self.values)
+            frames = dict(self.values)
+            for name in calls:
+                for dep in REGISTRY[name].optional:
+                    frames.setdefault(dep, None)
+            ran = bot_engine.run(calls, progress, frames=frames, workers=workers, executor=executor)
+            self.values.update(ran.results)
+            self.proc_status.update(ran.proc_status)
+            self.errors.update(ran.errors)
+            self.seconds.update(ran.seconds)
+            for name, error in failed_upstream.items():
+                self.proc_status[name] = "Failed"
+                self.errors[name] = error
+                bot_engine.emit(progress, bot_engine.FINISH, name, "Failed", error=error)
+        return self
+
+    def value(self, name: str) -> Any:
+        """A node's value, computed (with whatever it needs) on first use."""
+        if name not in self.values and name not in self.proc_status:
+            self.run([name])
+        if name in self.values:
+            return self.values[name]
+        if name in self.errors:
+            raise RuntimeError(self.errors[name])
+        missing = self.skipped.get(name, name)
+        raise RuntimeError(f"{INPUT_LABELS.get(missing, missing)} not available.")
+
+    def results(self, codes: Iterable[str]) -> Dict[str, Any]:
+        return {code: self.values[code] for code in codes if code in self.values}
+
+    def missing_message(self, name: str) -> str:
+        missing = self.skipped.get(name, "")
+        return f"{INPUT_LABELS.get(missing, missing)} not available."
@@ -1,13 +1,27 @@
 import pandas as pd
 import plotly.express as px
 import streamlit as st
+from io import BytesIO
+
+import blob_store
+import columnar_cache
+
+
+def _read_loan_book(src, sheet_name, header):
+    """Read a loan book from the Parquet cache when it was converted at upload, else from Excel."""
+    if isinstance(src, (bytes, blob_store.Blob)):
+        cached = columnar_cache.read_sheet(src, sheet_name, header_row=header)
+        if cached is not None:
+            return cached
+        src = BytesIO(src)
+    return pd.read_excel(src, sheet_name=sheet_name, header=header)
 
 # -------------------------------
 # 1️⃣ Distinct PROJECT NO by Asset Classification
 # -------------------------------
 def compare_project_counts_plotly(file1: str, file2: str, sheet_name=0, key=None):
-    df1 = pd.read_excel(file1, sheet_name=sheet_name, header=1)
-    df2 = pd.read_excel(file2, sheet_name=sheet_name, header=2)
+    df1 = _read_loan_book(file1, sheet_name, header=1)
+    df2 = _read_loan_book(file2, sheet_name, header=2)
 
     if "Asset Classification as on 30.06.2025" in df1.columns:
         df1.rename(columns={"Asset Classification as on 30.06.2025": "Asset Classification"}, inplace=True)
@@ -63,8 +77,8 @@ def compare_project_counts_plotly(file1: str, file2: str, sheet_name=0, key=None
 # 2️⃣ Total LOAN OUTSTANDING by Asset Classification
 # -------------------------------
 def compare_loan_outstanding_plotly(file1: str, file2: str, sheet_name=0, key=None):
-    df1 = pd.read_excel(file1, sheet_name=sheet_name, header=1)
-    df2 = pd.read_excel(file2, sheet_name=sheet_name, header=2)
+    df1 = _read_loan_book(file1, sheet_name, header=1)
+    df2 = _read_loan_book(file2, sheet_name, header=2)
 
     if "Asset Classification as on 30.06.2025" in df1.columns:
         df1.rename(columns={"Asset Classification as on 30.06.2025": "Asset Classification"}, inplace=True)
@@ -127,8 +141,8 @@ def compare_loan_outstanding_plotly(file1: str, file2: str, sheet_name=0, key=No
 # 3️⃣ Distinct PROJECT NO by SMA (excluding '0')
 # -------------------------------
 def compare_project_counts_sma(file1: str, file2: str, sheet_name=0, key=None):
-    df1 = pd.read_excel(file1, sheet_name=sheet_name, header=1)
-    df2 = pd.read_excel(file2, sheet_name=sheet_name, header=2)
+    df1 = _read_loan_book(file1, sheet_name, header=1)
+    df2 = _read_loan_book(file2, sheet_name, header=2)
 
     # Normalize column names
     if "SMA Staging as on 30.06.2025)" in df1.columns:
@@ -193,8 +207,8 @@ def compare_project_counts_sma(file1: str, file2: str, sheet_name=0, key=None):
 # 4️⃣ Total LOAN OUTSTANDING by SMA (excluding '0')
 # -------------------------------
 def compare_loan_outstanding_sma(file1: str, file2: str, sheet_name=0, key=None):
-    df1 = pd.read_excel(file1, sheet_name=sheet_name, header=1)
-    df2 = pd.read_excel(file2, sheet_name=sheet_name, header=2)
+    df1 = _read_loan_book(file1, sheet_name, header=1)
+    df2 = _read_loan_book(file2, sheet_name, header=2)
 
     # Normalize column names
     if "SMA Staging as on 30.06.2025)" in df1.columns:
@@ -0,0 +1,333 @@
+# ============================== columnar_cache.py — Parquet Cache for Uploaded Workbooks ==============================
+import hashlib
+import os
+import pickle
+import shutil
+import tempfile
+import time
+from collections import OrderedDict
+from io import BytesIO
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Union
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+# Converted workbooks live under CACHE_DIR/<sha256>/h<header_row>/ — one Parquet file per
+# sheet plus a manifest with sheet names, column names and row counts. A sheet reads back
+# exactly as read_excel parsed it: header names keep their type (2024 stays an int) and
+# columns Parquet cannot hold as one type (numbers mixed with text or dates) are pickled
+# beside the Parquet file instead of being turned into text.
+CACHE_DIR = os.path.abspath(os.getenv("AUDITBOTS_CACHE_DIR")
+                            or os.path.join(os.path.dirname(os.path.abspath(__file__)), "columnar_cache"))
+MANIFEST = "manifest.pkl"
+
+# Converted workbooks not read for CACHE_MAX_DAYS are deleted, then the least recently
+# used ones until the cache is under CACHE_MAX_MB (checked after each conversion).
+CACHE_MAX_DAYS = float(os.getenv("AUDITBOTS_CACHE_MAX_DAYS") or 7)
+CACHE_MAX_MB = float(os.getenv("AUDITBOTS_CACHE_MAX_MB") or 4096)
+
+# Session bytes objects are reused across reruns; remember their digests so page renders
+# do not re-hash a large upload. Entries hold the object so an id is never reused.
+_KEY_MEMO: "OrderedDict[int, tuple]" = OrderedDict()
+_KEY_MEMO_SIZE = 8
+
+
+def content_key(data: bytes) -> str:
+    digest = getattr(data, "digest", None)  # blob_store.Blob already knows its sha256
+    if digest:
+        return digest
+    hit = _KEY_MEMO.get(id(data))
+    if hit is not None and hit[0] is data:
+        _KEY_MEMO.move_to_end(id(data))
+        return hit[1]
+    key = hashlib.sha256(data).hexdigest()
+    _KEY_MEMO[id(data)] = (data, key)
+    while len(_KEY_MEMO) > _KEY_MEMO_SIZE:
+        _KEY_MEMO.popitem(last=False)
+    return key
+
+
+def _key_for(data_or_key: Union[bytes, str]) -> str:
+    return data_or_key if isinstance(data_or_key, str) else content_key(data_or_key)
+
+
+def _book_dir(key: str, header_row: int) -> str:
+    return os.path.join(CACHE_DIR, key, f"h{int(header_row)}")
+
+
+def _touch(key: str) -> None:
+    # A workbook's directory mtime is its last use, for expire()
+    try:
+        os.utime(os.path.join(CACHE_DIR, key))
+    except OSError:
+        pass
+
+
+def _dir_size(path: str) -> int:
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return total
+
+
+def expire(max_days: Optional[float] = None, max_mb: Optional[float] = None, keep: Iterable[str] = ()) -> None:
+    """
+    Delete converted workbooks unused for `max_days` (default CACHE_MAX_DAYS), then the least
+    recently used until the cache fits in `max_mb` (default CACHE_MAX_MB); 0 turns a limit
+    off. Workbooks in `keep` stay. A reader losing its workbook here falls back to Excel.
+    """
+    max_days = CACHE_MAX_DAYS if max_days is None else max_days
+    max_mb = CACHE_MAX_MB if max_mb is None else max_mb
+    try:
+        names = os.listdir(CACHE_DIR)
+    except OSError:
+        return
+    books = []
+    for name in names:
+        path = os.path.join(CACHE_DIR, name)
+        try:
+            books.append((os.path.getmtime(path), name, path))
+        except OSError:
+            pass  # removed meanwhile
+    books.sort()  # least recently used first
+    keep = set(keep)
+    cutoff = time.time() - max_days * 86400
+    sizes = {name: _dir_size(path) for _, name, path in books}
+    total = sum(sizes.values())
+    for mtime, name, path in books:
+        if name in keep:
+            continue
+        if (max_days > 0 and mtime < cutoff) or (max_mb > 0 and total > max_mb * 1024 * 1024):
+            shutil.rmtree(path, ignore_errors=True)
+            total -= sizes[name]
+
+
+def _split_columns(df: pd.DataFrame):
+    """
+    (Arrow table of the columns Parquet can hold, positions of the others). Parquet columns
+    are named by position, so any header (ints, dates, repeats of str()) round-trips.
+    """
+    arrays, names, mixed = [], [], []
+    for i in range(df.shape[1]):
+        try:
+            arrays.append(pa.array(df.iloc[:, i], from_pandas=True))
+            names.append(str(i))
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            mixed.append(i)  # e.g. an ID column holding both 1 and "A-7"
+    return pa.Table.from_arrays(arrays, names=names), mixed
+
+
+def _read_manifest(key: str, header_row: int) -> Optional[dict]:
+    path = os.path.join(_book_dir(key, header_row), MANIFEST)
+    try:
+        with open(path, "rb") as f:
+            return pickle.load(f)
+    except (OSError, ValueError, EOFError, pickle.UnpicklingError):
+        return None
+
+
+def is_cached(data_or_key: Union[bytes, str], header_row: int = 0) -> bool:
+    return _read_manifest(_key_for(data_or_key), header_row) is not None
+
+
+def convert_workbook(
+    data: bytes,
+    header_rows: Iterable[int] = (0,),
+    engine: Optional[str] = None,
+    key: Optional[str] = None,
+) -> str:
+    """
+    Parse every sheet of the workbook once and store it as Parquet, keyed by content hash.
+    Already-converted workbooks are skipped. Returns the content key.
+    """
+    from workbook_loader import resolve_engine
+
+    key = key or content_key(data)
+    converted = False
+    for header_row in header_rows:
+        if is_cached(key, header_row):
+            continue
+        converted = True
+        frames = pd.read_excel(BytesIO(data), sheet_name=None, header=header_row, engine=resolve_engine(engine))
+        final_dir = _book_dir(key, header_row)
+        os.makedirs(os.path.dirname(final_dir), exist_ok=True)
+        tmp_dir = tempfile.mkdtemp(dir=os.path.dirname(final_dir))
+        # columns: header names as read_excel gave them; mixed: positions of pickled columns
+        manifest = {"sheets": [], "columns": {}, "rows": {}, "mixed": {}}
+        try:
+            for idx, (sheet, df) in enumerate(frames.items()):
+                table, mixed = _split_columns(df)
+                pq.write_table(table, os.path.join(tmp_dir, f"{idx}.parquet"))
+                if mixed:
+                    with open(os.path.join(tmp_dir, f"{idx}.pkl"), "wb") as f:
+                        pickle.dump([df.iloc[:, i].to_numpy() for i in mixed], f, protocol=pickle.HIGHEST_PROTOCOL)
+                manifest["sheets"].append(sheet)
+                manifest["columns"][sheet] = list(df.columns)
+                manifest["rows"][sheet] = int(len(df))
+                manifest["mixed"][sheet] = mixed
+            with open(os.path.join(tmp_dir, MANIFEST), "wb") as f:
+                pickle.dump(manifest, f, protocol=pickle.HIGHEST_PROTOCOL)
+            try:
+                os.replace(tmp_dir, final_dir)
+            except OSError:
+                # Another session converted the same upload first
+                shutil.rmtree(tmp_dir, ignore_errors=True)
+        except Exception:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            raise
+    _touch(key)
+    if converted:
+        expire(keep=[key])
+    return key
+
+
+def sheet_names(data_or_key: Union[bytes, str], header_row: int = 0) -> Optional[List[str]]:
+    manifest = _read_manifest(_key_for(data_or_key), header_row)
+    return None if manifest is None else list(manifest["sheets"])
+
+
+def sheet_columns(data_or_key: Union[bytes, str], sheet: str, header_row: int = 0) -> Optional[List[str]]:
+    """Header names as text, the way the mapping pages list them (and workbook_loader names columns)."""
+    manifest = _read_manifest(_key_for(data_or_key), header_row)
+    if manifest is None or sheet not in manifest["columns"]:
+        return None
+    return [str(c) for c in manifest["columns"][sheet]]
+
+
+def sheet_rows(data_or_key: Union[bytes, str], sheet: str, header_row: int = 0) -> Optional[int]:
+    manifest = _read_manifest(_key_for(data_or_key), header_row)
+    if manifest is None or sheet not in manifest.get("rows", {}):
+        return None
+    return int(manifest["rows"][sheet])
+
+
+def _sheet_index(manifest: dict, sheet: Union[str, int]) -> Optional[int]:
+    sheets = manifest["sheets"]
+    if isinstance(sheet, int):
+        return sheet if 0 <= sheet < len(sheets) else None
+    return sheets.index(sheet) if sheet in sheets else None
+
+
+def _to_pandas(table: pa.Table) -> pd.DataFrame:
+    df = table.to_pandas()
+    # Keep read_excel's NaN for empty text cells (Arrow hands back None)
+    for col in df.columns[df.dtypes == object]:
+        df[col] = df[col].where(df[col].notna(), np.nan)
+    return df
+
+
+class _Sheet:
+    """One cached sheet: which of its columns to read, from Parquet or the pickle beside it."""
+
+    def __init__(self, key: str, manifest: dict, idx: int, header_row: int, columns=None):
+        name = manifest["sheets"][idx]
+        self.names = manifest["columns"][name]
+        self.rows = manifest["rows"][name]
+        self.mixed = manifest.get("mixed", {}).get(name, [])
+        self.base = os.path.join(_book_dir(key, header_row), str(idx))
+        wanted = range(len(self.names))
+        if callable(columns):
+            wanted = [i for i in wanted if columns(self.names[i])]
+        elif columns is not None:
+            keep = {str(c) for c in columns}
+            wanted = [i for i in wanted if str(self.names[i]) in keep]
+        self.wanted = list(wanted)
+        self.parquet = [str(i) for i in self.wanted if i not in self.mixed]
+
+    def _mixed_values(self) -> Dict[int, np.ndarray]:
+        if not any(i in self.mixed for i in self.wanted):
+            return {}
+        with open(self.base + ".pkl", "rb") as f:
+            values = pickle.load(f)
+        return {i: v for i, v in zip(self.mixed, values) if i in self.wanted}
+
+    def frame(self, table: Optional[pa.Table], mixed: Dict[int, np.ndarray], start: int, stop: int) -> pd.DataFrame:
+        """Rows start:stop of the wanted columns in header order, as read_excel returned them."""
+        part = _to_pandas(table) if table is not None else None
+        cols = [mixed[i][start:stop] if i in mixed else part[str(i)].to_numpy() for i in self.wanted]
+        out = pd.DataFrame(dict(enumerate(cols)), index=pd.RangeIndex(stop - start))
+        out.columns = pd.Index([self.names[i] for i in self.wanted])
+        return out
+
+    def read(self) -> pd.DataFrame:
+        table = pq.read_table(self.base + ".parquet", columns=self.parquet, memory_map=True)
+        return self.frame(table, self._mixed_values(), 0, self.rows)
+
+    def batches(self, batch_size: int) -> Iterator[pd.DataFrame]:
+        mixed = self._mixed_values()
+        pf = pq.ParquetFile(self.base + ".parquet", memory_map=True)
+        start = 0
+        if self.parquet:
+            for batch in pf.iter_batches(batch_size=batch_size, columns=self.parquet):
+                table = pa.Table.from_batches([batch])
+                yield self.frame(table, mixed, start, start + table.num_rows)
+                start += table.num_rows
+        else:
+            # Every wanted column is pickled: slice those
+            while start < self.rows:
+                stop = min(start + batch_size, self.rows)
+                yield self.frame(None, mixed, start, stop)
+                start = stop
+        if self.rows == 0:
+            yield self.read()  # an empty sheet still yields its columns
+
+
+def read_sheet(
+    data_or_key: Union[bytes, str],
+    sheet: Union[str, int],
+    header_row: int = 0,
+    columns: Optional[Union[List[str], Callable[[str], bool]]] = None,
+) -> Optional[pd.DataFrame]:
+    """
+    Load one cached sheet through a memory map, reading only `columns` when given
+    (a list of names as sheet_columns lists them, or a usecols-style callable). `sheet`
+    may be a name or a position (as with read_excel). Returns None on a cache miss.
+    """
+    key = _key_for(data_or_key)
+    manifest = _read_manifest(key, header_row)
+    idx = None if manifest is None else _sheet_index(manifest, sheet)
+    if idx is None:
+        return None
+    _touch(key)
+    return _Sheet(key, manifest, idx, header_row, columns).read()
+
+
+def iter_sheet_batches(
+    data_or_key: Union[bytes, str],
+    sheet: Union[str, int],
+    header_row: int = 0,
+    batch_size: int = 100_000,
+) -> Optional[Iterator[pd.DataFrame]]:
+    """
+    Stream one cached sheet as DataFrames of at most `batch_size` rows, so only one batch
+    is in memory at a time. An empty sheet yields a single empty frame with its columns.
+    Returns None on a cache miss.
+    """
+    key = _key_for(data_or_key)
+    manifest = _read_manifest(key, header_row)
+    idx = None if manifest is None else _sheet_index(manifest, sheet)
+    if idx is None:
+        return None
+    _touch(key)
+    return _Sheet(key, manifest, idx, header_row).batches(batch_size)
+
+
+def read_sheets(
+    data_or_key: Union[bytes, str],
+    sheets: Iterable[str],
+    header_row: int = 0,
+) -> Dict[str, pd.DataFrame]:
+    """Return the cached subset of `sheets`; missing sheets are simply absent."""
+    key = _key_for(data_or_key)
+    out = {}
+    for sheet in sheets:
+        df = read_sheet(key, sheet, header_row=header_row)
+        if df is not None:
+            out[sheet] = df
+    return out
@@ -0,0 +1,101 @@
+# ============================== Shared Test Fixtures ==============================
+"""
+Small synthetic uploads shared by the tests: one P2P / O2C / H2R master workbook with the
+sheet and column mappings the pages would produce for it.
+"""
+
+import warnings
+from io import BytesIO
+from typing import Dict, NamedTuple
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import columnar_cache
+
+
+class Upload(NamedTuple):
+    data: bytes
+    sheets: Dict[str, Dict[str, str]]
+    columns: Dict[str, Dict[str, Dict[str, str]]]
+
+    @property
+    def files(self) -> Dict[str, bytes]:
+        return {"MASTER": self.data}
+
+
+SHEETS = {
+    "P2P": {"P2P Sample": "P2P", "Vendor Master": "Vendors", "Employee Master": "Emp"},
+    "O2C": {"O2C Sample": "O2C", "Customer Master": "Cust"},
+    "H2R": {"Employee Master": "HEmp", "Attendance Register": "Att"},
+}
+
+COLUMNS = {
+    "P2P": {
+        "P2P Sample": {"Vendor Name": "Vendor", "PO No": "PO Number", "PO Date": "PO Dt", "PO Quantity": "PO Qty",
+                       "PO Amount": "PO Amt", "PO Approved By": "Approver", "GRN No": "GRN", "GRN Date": "GRN Dt",
+                       "GRN Quantity": "GRN Qty", "Invoice Date": "Inv Dt", "Invoice Quantity": "Inv Qty",
+                       "Invoice Amount": "Inv Amt", "Creator ID": "Creator"},
+        "Vendor Master": {"Vendor Name": "Name", "GST": "GSTIN", "PAN": "PAN No", "Bank Account": "Bank",
+                          "Creator ID": "Creator"},
+        "Employee Master": {"Employee ID": "EmpID", "Employee Name": "EmpName", "Department": "Dept",
+                            "Creator ID": "Creator"},
+    },
+    "O2C": {
+        "O2C Sample": {"SO Date": "SO Date", "Delivery Date": "Delivery Date", "Invoice No": "Invoice No"},
+        "Customer Master": {"GST No": "GST", "PAN No": "PAN", "Credit Limit": "Limit"},
+    },
+    "H2R": {
+        "Employee Master": {"Employee ID": "ID", "Employee Name": "Name", "Exit Date": "Exit", "Status": "Status"},
+        "Attendance Register": {"Employee ID": "ID", "Employee Name": "Name", "Month": "Month"},
+    },
+}
+
+
+def master_workbook(n: int = 120, seed: int = 0) -> bytes:
+    rng = np.random.default_rng(seed)
+    p2p = pd.DataFrame({
+        "Vendor": rng.choice(["ABC Pvt Ltd", "XYZ", "Foo & Co", " Bar "], n),
+        "PO Number": rng.integers(1, 40, n),
+        "PO Dt": pd.date_range("2024-03-01", periods=n, freq="D").strftime("%d/%m/%Y"),
+        "PO Qty": rng.integers(1, 5, n), "PO Amt": rng.integers(1000, 20000, n), "Approver": rng.choice(["A", "E1"], n),
+        "GRN": 1, "GRN Dt": "2024-01-01", "GRN Qty": rng.integers(1, 5, n),
+        "Inv Dt": pd.date_range("2024-03-03", periods=n, freq="D"), "Inv Qty": 2, "Inv Amt": rng.integers(1000, 40000, n),
+        "Creator": rng.choice(["E1", "E2", "E003"], n), "Item_Code": rng.choice(["I1", "I2"], n),
+    })
+    vendors = pd.DataFrame({
+        "Name": ["ABC Pvt Ltd", "XYZ", "Foo & Co", "Bar", "ABC"],
+        "GSTIN": ["29ABCDE1234F1Z5", None, "bad", "29ABCDE1234F1Z5", ""],
+        "PAN No": ["ABCDE1234F", "abcde1234f", None, "X", "ABCDE1234F"], "Bank": [1, 2, None, 1, 3],
+        "Creator": ["E1", "E2", "E3", "E1", "E2"], "Unused": ["u"] * 5,
+    })
+    emp = pd.DataFrame({"EmpID": ["E1", "E2", "3"], "EmpName": ["a", "b", "c"], "Dept": ["Fin", "Ops", "IT"],
+                        "Creator": ["E1", "E2", "E3"]})
+    o2c = pd.DataFrame({"SO Date": ["2024-01-01", "2024-01-05", "2024-02-01"],
+                        "Delivery Date": ["2024-01-20", "2024-01-06", None],
+                        "Invoice No": [None, "I2", None], "Delivery_No": [1, 2, 3]})
+    cust = pd.DataFrame({"GST": ["x", None], "PAN": [None, ""], "Limit": [1, None]})
+    hemp = pd.DataFrame({"ID": [1, 2, 3], "Name": ["a", "b", "c"], "Exit": ["2024-01-10", None, "2024-01-20"],
+                         "Status": ["Exited", "Active", "Exited"]})
+    att = pd.DataFrame({"ID": [1, 2, 4], "Name": ["a", "b", "d"], "Month": ["Jan-2024"] * 3,
+                        **{f"D{i}": rng.choice(["P", "A"], 3) for i in range(1, 32)}})
+    bio = BytesIO()
+    with pd.ExcelWriter(bio, engine="xlsxwriter") as w:
+        for name, df in [("P2P", p2p), ("Vendors", vendors), ("Emp", emp), ("O2C", o2c), ("Cust", cust),
+                         ("HEmp", hemp), ("Att", att)]:
+            df.to_excel(w, sheet_name=name, index=False)
+    return bio.getvalue()
+
+
+@pytest.fixture
+def cache_dir(tmp_path, monkeypatch):
+    """An empty Parquet cache for the test."""
+    monkeypatch.setattr(columnar_cache, "CACHE_DIR", str(tmp_path / "columnar_cache"))
+    return tmp_path / "columnar_cache"
+
+
+@pytest.fixture
+def p2p_upload(cache_dir) -> Upload:
+    warnings.filterwarnings("ignore", message=".*ScriptRunContext.*")
+    return Upload(master_workbook(), SHEETS, COLUMNS)
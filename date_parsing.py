@@ -0,0 +1,163 @@
+# ============================== date_parsing.py — Vectorised Date Parsing ==============================
+import datetime as _dt
+import os
+import threading
+import warnings
+from collections import OrderedDict
+from typing import Hashable, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import CategoricalDtype, is_bool_dtype, is_datetime64_any_dtype, is_numeric_dtype
+from pandas.tseries.api import guess_datetime_format
+
+# Excel stores dates as day counts from 1899-12-30. Only counts inside this window are read
+# as serials (1927-05-18 .. 2173-10-14); other numbers are not dates.
+EXCEL_EPOCH = pd.Timestamp("1899-12-30")
+SERIAL_MIN, SERIAL_MAX = 10_000, 100_000
+
+SAMPLE_SIZE = 500   # distinct text values used to pick the formats of a column
+MAX_FORMATS = 3     # a column may mix a few layouts, e.g. "2025-01-31" and "31/01/2025"
+MIXED = "mixed"     # per-value parsing, only for text no fixed format matched in the sample
+
+# Which reading of an ambiguous date like 01/02/2020 wins when the sample cannot tell:
+# day-first (1 Feb) by default, as in Indian registers and CCIS extracts. Set
+# AUDITBOTS_DATE_DAYFIRST=0 for month-first uploads.
+DAYFIRST = (os.getenv("AUDITBOTS_DATE_DAYFIRST") or "1").strip().lower() not in ("0", "false", "no")
+
+# (source, column) -> parsed datetime64 values, so a re-run over the same upload skips parsing.
+# Shared by the sessions and the bot threads of the server.
+_CACHE: "OrderedDict[tuple, np.ndarray]" = OrderedDict()
+_CACHE_SIZE = 64
+_CACHE_LOCK = threading.Lock()
+
+
+def _text_values(s: pd.Series) -> pd.Series:
+    """Distinct text values of s that are not Excel serials, stripped."""
+    txt = s[s.map(type) == str].str.strip()
+    txt = txt[txt != ""]
+    return txt[~pd.to_numeric(txt, errors="coerce").between(SERIAL_MIN, SERIAL_MAX)].drop_duplicates()
+
+
+def _hits(sample: pd.Series, fmt: str) -> pd.Series:
+    return pd.to_datetime(sample, format=fmt, errors="coerce").notna()
+
+
+def _guesses(v: str) -> Tuple[Optional[str], ...]:
+    """Format guesses for one value, preferred first (see DAYFIRST)."""
+    first, second = (guess_datetime_format(v, dayfirst=d) for d in (DAYFIRST, not DAYFIRST))
+    # Year-first dates are ISO (2020-02-01 is 1 Feb) whatever the day-first setting
+    if DAYFIRST and first and first.startswith("%Y"):
+        first, second = second, first
+    return first, second
+
+
+def infer_formats(s: pd.Series, sample_size: int = SAMPLE_SIZE) -> Tuple[str, ...]:
+    """
+    Formats for the text dates of a column, best first. Candidates are guessed from the
+    sampled values (day-first and month-first); formats are then picked greedily by how
+    many sampled values they parse. On ties the first value's guess in the DAYFIRST order
+    wins, so 01/02/2020-style columns read day-first by default. Empty when the column
+    has no text dates.
+    """
+    if isinstance(s.dtype, CategoricalDtype):
+        s = pd.Series(s.cat.categories)
+    if s.dtype != object:
+        return ()
+    sample = _text_values(s).head(sample_size)
+    if sample.empty:
+        return ()
+    candidates = []
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", UserWarning)  # "Parsing dates in %d/%m/%Y format when dayfirst=False"
+        for v in sample.head(20):
+            for fmt in _guesses(v):
+                if fmt and fmt not in candidates:
+                    candidates.append(fmt)
+    hits = {fmt: _hits(sample, fmt) for fmt in candidates}
+    chosen, left = [], pd.Series(True, index=sample.index)
+    while left.any() and len(chosen) < MAX_FORMATS and hits:
+        fmt = max(hits, key=lambda f: (hits[f] & left).sum())  # max() keeps the first on ties
+        if not (hits[fmt] & left).any():
+            break
+        chosen.append(fmt)
+        left &= ~hits.pop(fmt)
+    if left.any() and _to_datetime(sample[left], MIXED).notna().any():
+        chosen.append(MIXED)
+    return tuple(chosen)
+
+
+def _to_datetime(text: pd.Series, fmt: str) -> pd.Series:
+    # dayfirst only matters for per-value (MIXED) parsing; fixed formats are explicit
+    return pd.to_datetime(text, format=fmt, dayfirst=DAYFIRST if fmt == MIXED else False, errors="coerce")
+
+
+def _from_serial(values: pd.Series) -> pd.Series:
+    ok = values.between(SERIAL_MIN, SERIAL_MAX)
+    out = pd.Series(pd.NaT, index=values.index, dtype="datetime64[ns]")
+    out[ok] = EXCEL_EPOCH + pd.to_timedelta(values[ok], unit="D")
+    return out
+
+
+def parse_dates(s: pd.Series, formats: Optional[Sequence[str]] = None) -> pd.Series:
+    """
+    datetime64[ns] version of s; values that are not dates become NaT (as errors="coerce").
+    Text is parsed with `formats` (inferred from s when None) one vectorised pass per
+    format, Excel serials (numbers or numeric text) arithmetically, and date/datetime
+    objects directly. Categoricals are parsed once per category.
+    """
+    if is_datetime64_any_dtype(s):
+        return s
+    if isinstance(s.dtype, CategoricalDtype):
+        cats = parse_dates(pd.Series(s.cat.categories, dtype=object), formats)
+        codes = s.cat.codes.to_numpy()
+        vals = np.where(codes >= 0, cats.to_numpy()[codes], np.datetime64("NaT"))
+        return pd.Series(vals, index=s.index, name=s.name, dtype="datetime64[ns]")
+    if is_numeric_dtype(s) and not is_bool_dtype(s):
+        return _from_serial(s.astype("float64")).rename(s.name)
+
+    out = np.full(len(s), np.datetime64("NaT"), dtype="datetime64[ns]")
+    if len(s):
+        kinds = s.map(type).to_numpy()
+        # date / datetime / Timestamp cells (openpyxl hands Excel-formatted dates over this way)
+        is_dt = np.array([issubclass(t, (_dt.date, np.datetime64)) for t in kinds], dtype=bool)
+        if is_dt.any():
+            out[is_dt] = pd.to_datetime(s[is_dt], errors="coerce").to_numpy()
+        # Serials, stored as numbers or as numeric text
+        num = pd.to_numeric(s.where(~is_dt & (kinds != bool)), errors="coerce")
+        serial = num.between(SERIAL_MIN, SERIAL_MAX).to_numpy()
+        if serial.any():
+            out[serial] = _from_serial(num[serial]).to_numpy()
+        # Remaining text, one format at a time
+        todo = np.flatnonzero((kinds == str) & ~serial)
+        if len(todo):
+            text = s.iloc[todo].str.strip()
+            for fmt in (infer_formats(s) if formats is None else formats):
+                if not len(todo):
+                    break
+                parsed = _to_datetime(text, fmt)
+                done = parsed.notna().to_numpy()
+                out[todo[done]] = parsed.to_numpy()[done]
+                todo, text = todo[~done], text[~done]
+    return pd.Series(out, index=s.index, name=s.name)
+
+
+def cached_parse(s: pd.Series, source: Hashable, formats: Optional[Sequence[str]] = None) -> pd.Series:
+    """
+    parse_dates through a process-wide cache keyed by `source`, which must identify the
+    column's content, e.g. (upload sha256, sheet, header row, source column name).
+    """
+    key = (source, tuple(formats) if formats is not None else None, DAYFIRST)
+    with _CACHE_LOCK:
+        hit = _CACHE.get(key)
+        if hit is not None:
+            _CACHE.move_to_end(key)
+    if hit is not None and len(hit) == len(s):
+        return pd.Series(hit.copy(), index=s.index, name=s.name)
+    # Parsed outside the lock; two threads may parse the same column once each
+    out = parse_dates(s, formats)
+    with _CACHE_LOCK:
+        _CACHE[key] = out.to_numpy()
+        while len(_CACHE) > _CACHE_SIZE:
+            _CACHE.popitem(last=False)
+    return out
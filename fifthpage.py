@@ -7,6 +7,7 @@ from pathlib import Path
 import base64
 import streamlit.components.v1 as components
 
+import bot_registry
 import logic6
 
 LEFT_LOGO_PATH = "logo.png"
@@ -101,7 +102,7 @@ def _build_enriched_summary(proc_status: dict, results: dict, cats_present: list
         "P2P2": "Detected quantity and amount mismatches between PO, GRN, and Invoice records and computed financial impact per PO.",
         "P2P3": "Extracted POs where PO Date was later than Invoice Date, marking them as invalid.",
         "P2P4": "Flagged cases where a vendor had multiple POs for the same item on the same date with combined invoice value above the threshold.",
-        "P2P5": "Detected duplicate vendor records by PAN, GST, Name, or Bank Account and listed row pairs with exceptions.",
+        "P2P5": "Grouped vendor records sharing a PAN, GST, Name, or Bank Account into duplicate clusters and noted the match reasons.",
         "O2C1": "Flagged sales orders where delivery was delayed beyond the allowed threshold.",
         "O2C2": "Detected cases where goods were dispatched but no invoice was issued.",
         "O2C3": "Identified customers with missing GST, PAN, or Credit Limit and flagged them.",
@@ -143,6 +144,21 @@ def _build_enriched_summary(proc_status: dict, results: dict, cats_present: list
         df = df[["Bot", "Category", "Data Used", "Logic Description", "Issues Found", "Status", "_code"]]
     return df
 
+def _job() -> bot_registry.Job:
+    """The run's job graph; rebuilt over the session's frames and results only when those changed."""
+    s = st.session_state
+    raw = s.get("raw_dfs") or {}
+    inputs = {k: raw.get(k) for k in bot_registry.INPUT_LABELS}
+    if inputs["EMP_P2P_RAW"] is None:
+        inputs["EMP_P2P_RAW"] = raw.get("EMP_RAW")
+    job = s.get("job")
+    if job is None or not job.matches(inputs):
+        proc_status = s.get("proc_status") or {}
+        done = {k: v for k, v in (s.get("results") or {}).items() if proc_status.get(k) == "Complete"}
+        job = bot_registry.Job({**inputs, **done})
+        s.job = job
+    return job
+
 def _build_detailed_report_excel(
     cats_present: list[str],
     proc_status: dict,
@@ -150,7 +166,6 @@ def _build_detailed_report_excel(
     vendor_raw: pd.DataFrame | None,
     p2p_raw: pd.DataFrame | None,
     emp_raw: pd.DataFrame | None,
-    file_bytes: bytes | None,
     only_codes: set[str] | None
 ) -> bytes:
     output = BytesIO()
@@ -181,54 +196,42 @@ def _build_detailed_report_excel(
 
                     if code == "P2P1" and vendor_raw is not None and p2p_raw is not None:
                         try:
-                            logic6.anomalies_by_creator(vendor_raw).to_excel(writer, sheet_name="P2P1_Anomalies", index=False)
+                            _job().value("P2P1_ANOMALIES").to_excel(writer, sheet_name="P2P1_Anomalies", index=False)
                         except Exception:
                             pass
                         try:
-                            logic6.merge_missing_with_duplicates(vendor_raw, p2p_raw).to_excel(writer, sheet_name="P2P1_MissingDup", index=False)
+                            _job().value("P2P1_MISSING_DUP").to_excel(writer, sheet_name="P2P1_MissingDup", index=False)
                         except Exception:
                             pass
 
                     if code == "P2P2" and results.get("P2P2") is not None and p2p_raw is not None and emp_raw is not None:
                         try:
-                            item_sum, dept_sum = logic6.summarize_mismatches(results["P2P2"], p2p_raw, emp_raw)
+                            item_sum, dept_sum = _job().value("P2P2_SUMMARY")
                             item_sum.to_excel(writer, sheet_name="P2P2_ItemSummary", index=False)
                             dept_sum.to_excel(writer, sheet_name="P2P2_DeptSummary", index=False)
                         except Exception:
                             pass
                         try:
-                            logic6.calculate_financial_impact_df(results["P2P2"]).to_excel(writer, sheet_name="P2P2_FinImpact", index=False)
+                            _job().value("P2P2_FIN_IMPACT").to_excel(writer, sheet_name="P2P2_FinImpact", index=False)
                         except Exception:
                             pass
 
                     if code == "P2P3" and results.get("P2P3") is not None:
                         try:
-                            item_counts, creator_counts = logic6.next_level_analytics(results["P2P3"])
+                            item_counts, creator_counts = _job().value("P2P3_NEXT_LEVEL")
                             item_counts.to_excel(writer, sheet_name="P2P3_ItemIssues", index=False)
                             creator_counts.to_excel(writer, sheet_name="P2P3_CreatorIssues", index=False)
                         except Exception:
                             pass
                         try:
-                            logic6.financial_impact(results["P2P3"]).to_excel(writer, sheet_name="P2P3_FinImpact", index=False)
+                            _job().value("P2P3_FIN_IMPACT").to_excel(writer, sheet_name="P2P3_FinImpact", index=False)
                         except Exception:
                             pass
 
-                    if code == "P2P5" and file_bytes is not None:
+                    if code == "P2P5" and p2p_raw is not None:
                         try:
-                            detailed = df
-                            # FIX: pass variable3 instead of 'threshold'
-                            fy_sum, fy_detail = logic6.vendor_year_threshold_alerts(
-                                detailed,
-                                BytesIO(file_bytes),
-                                sheet_name="P2P_Sample (Bots 1-20)",
-                                variable3=50_000
-                            )
-                            day_sum, day_detail = logic6.vendor_daily_threshold_alerts(
-                                detailed,
-                                BytesIO(file_bytes),
-                                sheet_name="P2P_Sample (Bots 1-20)",
-                                variable4=10_000
-                            )
+                            fy_sum, fy_detail = _job().value("P2P5_FY_ALERTS")
+                            day_sum, day_detail = _job().value("P2P5_DAILY_ALERTS")
                             fy_sum.to_excel(writer, sheet_name="P2P5_FY_Summary", index=False)
                             if fy_detail is not None and not fy_detail.empty:
                                 fy_detail.to_excel(writer, sheet_name="P2P5_FY_Detail", index=False)
@@ -377,7 +380,7 @@ def render_fifth():
             with sub_tabs[0]:
                 if vendor_raw is not None:
                     try:
-                        a1 = logic6.anomalies_by_creator(vendor_raw)
+                        a1 = _job().value("P2P1_ANOMALIES")
                         st.dataframe(a1 if not a1.empty else pd.DataFrame({"Info":["No anomalies by Creator_ID."]}), use_container_width=True)
                     except Exception as e:
                         st.error(str(e))
@@ -386,7 +389,7 @@ def render_fifth():
             with sub_tabs[1]:
                 if vendor_raw is not None and p2p_raw is not None:
                     try:
-                        a2 = logic6.merge_missing_with_duplicates(vendor_raw, p2p_raw)
+                        a2 = _job().value("P2P1_MISSING_DUP")
                         st.dataframe(a2 if not a2.empty else pd.DataFrame({"Info":["No intersection between missing vendors and duplicate invoices."]}), use_container_width=True)
                     except Exception as e:
                         st.error(str(e))
@@ -398,7 +401,7 @@ def render_fifth():
             with sub_tabs[0]:
                 if results.get("P2P2") is not None and not results["P2P2"].empty and p2p_raw is not None and emp_raw is not None:
                     try:
-                        item_sum, dept_sum = logic6.summarize_mismatches(results["P2P2"], p2p_raw, emp_raw)
+                        item_sum, dept_sum = _job().value("P2P2_SUMMARY")
                         st.write("Item-wise Summary")
                         st.dataframe(item_sum if not item_sum.empty else pd.DataFrame({"Info":["No item-wise mismatches."]}), use_container_width=True)
                         st.write("Department-wise Summary")
@@ -410,7 +413,7 @@ def render_fifth():
             with sub_tabs[1]:
                 if results.get("P2P2") is not None and not results["P2P2"].empty:
                     try:
-                        fi = logic6.calculate_financial_impact_df(results["P2P2"])
+                        fi = _job().value("P2P2_FIN_IMPACT")
                         st.dataframe(fi, use_container_width=True)
                     except Exception as e:
                         st.error(str(e))
@@ -423,7 +426,7 @@ def render_fifth():
             with sub_tabs[0]:
                 if inv is not None and not inv.empty:
                     try:
-                        item_counts, creator_counts = logic6.next_level_analytics(inv)
+                        item_counts, creator_counts = _job().value("P2P3_NEXT_LEVEL")
                         st.write("Item-wise Issues")
                         st.dataframe(item_counts if not item_counts.empty else pd.DataFrame({"Info":["No item-wise issues."]}), use_container_width=True)
                         st.write("Creator-wise Issues")
@@ -435,7 +438,7 @@ def render_fifth():
             with sub_tabs[1]:
                 if inv is not None and not inv.empty:
                     try:
-                        st.dataframe(logic6.financial_impact(inv), use_container_width=True)
+                        st.dataframe(_job().value("P2P3_FIN_IMPACT"), use_container_width=True)
                     except Exception as e:
                         st.error(str(e))
                 else:
@@ -446,7 +449,7 @@ def render_fifth():
             with sub_tabs[0]:
                 if p2p_raw is not None and not p2p_raw.empty:
                     try:
-                        res = logic6.generate_self_approved_over_threshold(p2p_raw)
+                        res = _job().value("P2P4_SELF_APPROVED")
                         st.dataframe(res if not res.empty else pd.DataFrame({"Info":["No self-approved POs over threshold."]}), use_container_width=True)
                     except Exception as e:
                         st.error(str(e))
@@ -454,20 +457,14 @@ def render_fifth():
                     st.info("Raw P2P sheet not available for analysis.")
 
         if code == "P2P5":
-            sub_tabs = st.tabs(["**FY Threshold Alerts**", "**Daily Threshold Alerts**"])
+            sub_tabs = st.tabs(["**FY Threshold Alerts**", "**Daily Threshold Alerts**", "**Duplicate Pairs**"])
             with sub_tabs[0]:
                 detailed = results.get("P2P5", pd.DataFrame())
-                if detailed is None or detailed.empty or s.get('file_bytes') is None:
-                    st.info("Duplicate pairs or original workbook not available.")
+                if detailed is None or detailed.empty or p2p_raw is None:
+                    st.info("Duplicate clusters or raw P2P sheet not available.")
                 else:
                     try:
-                        # FIX: pass variable3 instead of 'threshold'
-                        fy_sum, fy_detail = logic6.vendor_year_threshold_alerts(
-                            detailed,
-                            BytesIO(s.file_bytes),
-                            sheet_name="P2P_Sample (Bots 1-20)",
-                            variable3=50_000
-                        )
+                        fy_sum, fy_detail = _job().value("P2P5_FY_ALERTS")
                         st.write("Alerts Summary")
                         st.dataframe(fy_sum if not fy_sum.empty else pd.DataFrame({"Info":["No FY alerts over threshold."]}), use_container_width=True)
                         if fy_detail is not None and not fy_detail.empty:
@@ -477,17 +474,11 @@ def render_fifth():
                         st.error(str(e))
             with sub_tabs[1]:
                 detailed = results.get("P2P5", pd.DataFrame())
-                if detailed is None or detailed.empty or s.get('file_bytes') is None:
-                    st.info("Duplicate pairs or original workbook not available.")
+                if detailed is None or detailed.empty or p2p_raw is None:
+                    st.info("Duplicate clusters or raw P2P sheet not available.")
                 else:
                     try:
-                        # FIX: pass variable4 instead of 'threshold'
-                        day_sum, day_detail = logic6.vendor_daily_threshold_alerts(
-                            detailed,
-                            BytesIO(s.file_bytes),
-                            sheet_name="P2P_Sample (Bots 1-20)",
-                            variable4=10_000
-                        )
+                        day_sum, day_detail = _job().value("P2P5_DAILY_ALERTS")
                         st.write("Alerts Summary")
                         st.dataframe(day_sum if not day_sum.empty else pd.DataFrame({"Info":["No daily alerts over threshold."]}), use_container_width=True)
                         if day_detail is not None and not day_detail.empty:
@@ -495,6 +486,24 @@ def render_fifth():
                             st.dataframe(day_detail, use_container_width=True)
                     except Exception as e:
                         st.error(str(e))
+            with sub_tabs[2]:
+                # Row pairs are expanded for one cluster at a time, only when asked for
+                detailed = results.get("P2P5", pd.DataFrame())
+                if detailed is None or detailed.empty or "Cluster_ID" not in detailed.columns or vendor_raw is None:
+                    st.info("Duplicate clusters or raw Vendor sheet not available.")
+                else:
+                    cid = st.selectbox("Cluster", detailed["Cluster_ID"].tolist(), key="p2p5_pairs_cluster")
+                    n_pairs = int(detailed.loc[detailed["Cluster_ID"] == cid, "Pair_Count"].iloc[0])
+                    st.caption(f"{n_pairs:,} matching row pairs in this cluster.")
+                    if st.button("Show row pairs", key="p2p5_pairs_show"):
+                        try:
+                            pairs = logic6.duplicate_vendor_pairs(
+                                vendor_raw, cluster_ids=[cid],
+                                name_threshold=detailed.attrs.get("name_threshold", logic6.FUZZY_NAME_THRESHOLD),
+                            )
+                            st.dataframe(pairs, use_container_width=True)
+                        except Exception as e:
+                            st.error(str(e))
 
     with tabs[1]:
         st.subheader("Output")
@@ -562,7 +571,6 @@ def render_fifth():
             vendor_raw=raw.get("VENDOR_RAW"),
             p2p_raw=raw.get("P2P_RAW"),
             emp_raw=emp_raw,
-            file_bytes=s.get("file_bytes"),
             only_codes=selected_set if selected_set else None,
         )
         st.download_button(
@@ -4,6 +4,9 @@ import base64
 from pathlib import Path
 import streamlit as st
 
+import blob_store
+import columnar_cache
+
 from secondpage import render_process
 from thirdpage import render_next
 from fourthpage import render_fourth
@@ -105,17 +108,36 @@ def _cache_file_if_needed(key: str) -> None:
     s = st.session_state
     f = s.get(key)
     if f is not None:
-        try:
-            s[f"{key}_bytes"] = f.getvalue()
-            s[f"{key}_name"]  = getattr(f, "name", "")
-        except Exception:
-            pass
+        # Session keeps a blob_store handle, not a copy of the upload
+        blob = blob_store.put_upload(f)
+        if blob is None:
+            return
+        s[f"{key}_bytes"] = blob
+        s[f"{key}_name"]  = getattr(f, "name", "")
+        _convert_to_columnar(key)
+
+def _convert_to_columnar(key: str) -> None:
+    """Parse a new upload into the Parquet cache once, so later pages skip Excel parsing."""
+    s = st.session_state
+    f = s.get(key)
+    file_id = getattr(f, "file_id", None) or s.get(f"{key}_name")
+    if s.get(f"{key}_columnar_id") == file_id:
+        return
+    try:
+        with st.spinner("Indexing workbook…"):
+            s[f"{key}_digest"] = columnar_cache.convert_workbook(s[f"{key}_bytes"])
+        s[f"{key}_columnar_id"] = file_id
+    except Exception:
+        # Cache is an optimisation only; readers fall back to parsing the workbook
+        s.pop(f"{key}_digest", None)
 
 def _clear_cache_if_removed(key: str) -> None:
     s = st.session_state
     if s.get(key, None) is None:
         s.pop(f"{key}_bytes", None)
         s.pop(f"{key}_name",  None)
+        s.pop(f"{key}_digest", None)
+        s.pop(f"{key}_columnar_id", None)
 
 def _bootstrap_bytes() -> None:
     for key in ("u_master", "u_p2p", "u_o2c", "u_h2r"):
@@ -5,6 +5,8 @@ import base64
 from pathlib import Path
 import streamlit.components.v1 as components
 
+import batch_cli
+
 LEFT_LOGO_PATH = "logo.png"  # shared asset
 
 FIELD_REQUIREMENTS = {
@@ -157,6 +159,15 @@ def render_fourth():
 
         st.markdown("---")
 
+    # The same mappings drive headless batch runs (batch_cli.py) over many workbooks
+    st.download_button(
+        "Download mapping (JSON)",
+        data=batch_cli.dump_mapping("p2p", s.sheet_mapping_pairs, s.column_mapping_pairs),
+        file_name="p2p_mapping.json",
+        mime="application/json",
+        key="download_mapping_json",
+    )
+
     # Navigation
     col1, col2 = st.columns(2)
     with col1:
@@ -0,0 +1,89 @@
+# ============================== frame_cache.py — Prepared Frame Cache ==============================
+import json
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Hashable, Optional
+
+import pandas as pd
+
+# Prepared (renamed, typed) input frames, shared by every session of the server process.
+# Keys carry the upload digests and the mappings, so a threshold change, a rerun or a
+# second auditor opening the same file skips ingest. Bounded by entries and total size.
+MAX_ENTRIES = int(os.getenv("AUDITBOTS_FRAME_CACHE_ENTRIES") or 32)
+MAX_BYTES = int(os.getenv("AUDITBOTS_FRAME_CACHE_MB") or 1024) * 1024 * 1024
+
+
+def mapping_key(mapping: Any) -> str:
+    """Stable text form of a (nested) sheet/column mapping for use in cache keys."""
+    return json.dumps(mapping, sort_keys=True, default=str)
+
+
+def _nbytes(value: Any) -> int:
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(index=True, deep=False).sum())
+    if isinstance(value, (tuple, list)):
+        return sum(_nbytes(v) for v in value)
+    return 0
+
+
+def _copy(value: Any) -> Any:
+    # Bots and pages rename/cast in place; every caller gets its own frames
+    if isinstance(value, pd.DataFrame):
+        return value.copy()
+    if isinstance(value, tuple):
+        return tuple(_copy(v) for v in value)
+    if isinstance(value, list):
+        return [_copy(v) for v in value]
+    return value
+
+
+class FrameCache:
+    """Thread-safe LRU of DataFrames (or tuples of them); hands out copies."""
+
+    def __init__(self, max_entries: int = MAX_ENTRIES, max_bytes: int = MAX_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._items: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def __contains__(self, key: Hashable) -> bool:
+        with self._lock:
+            return key in self._items
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            hit = self._items.get(key)
+            if hit is None:
+                return default
+            self._items.move_to_end(key)
+            value = hit[0]
+        return _copy(value)
+
+    def put(self, key: Hashable, value: Any) -> None:
+        size = _nbytes(value)
+        if size > self.max_bytes:
+            return
+        value = _copy(value)
+        with self._lock:
+            old = self._items.pop(key, None)
+            if old is not None:
+                self._bytes -= old[1]
+            self._items[key] = (value, size)
+            self._bytes += size
+            while self._items and (len(self._items) > self.max_entries or self._bytes > self.max_bytes):
+                _, (_, evicted) = self._items.popitem(last=False)
+                self._bytes -= evicted
+
+    def clear(self) -> None:
+        with self._lock:
+            self._items.clear()
+            self._bytes = 0
+
+
+PREPARED = FrameCache()
+
+
+def cached(key: Optional[Hashable]) -> bool:
+    return key is not None and key in PREPARED
@@ -0,0 +1,365 @@
+# ============================== job_queue.py — Local Job Queue ==============================
+"""
+Processing jobs outside the Streamlit script thread. processpage / b6 submit() a job (upload
+digests, mappings, selected bots, thresholds) and poll status(job_id); worker processes
+claim queued jobs from a SQLite file, record each bot's status as it changes and pickle the
+outcome under logic6.RESULTS_DIR. A job outlives the rerun, the browser tab and the session
+that submitted it, and several auditors' jobs run side by side.
+
+Workers are started on demand by submit(), detached from the server, and exit after
+AUDITBOTS_JOB_WORKER_IDLE seconds without work. They can also be run by hand:
+
+    python job_queue.py worker
+"""
+import json
+import os
+import pickle
+import sqlite3
+import subprocess
+import sys
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, NamedTuple, Optional
+
+import blob_store
+import bot_engine
+import logic6
+
+DB_PATH = os.getenv("AUDITBOTS_JOB_DB") or os.path.join(logic6.RESULTS_DIR, "jobs.sqlite3")
+JOB_WORKERS = int(os.getenv("AUDITBOTS_JOB_WORKERS") or 2)
+WORKER_IDLE_SECONDS = float(os.getenv("AUDITBOTS_JOB_WORKER_IDLE") or 600)
+POLL_SECONDS = 1.0
+# Finished jobs (rows and result pickles) are deleted this many days after they end; 0 keeps them
+RETENTION_DAYS = float(os.getenv("AUDITBOTS_JOB_RETENTION_DAYS") or 7)
+LOG_MAX_BYTES = 10 * 1024 * 1024  # job_worker.log is rotated (one old copy) past this size
+
+KINDS = ("p2p", "banking")
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id        TEXT PRIMARY KEY,
+    kind      TEXT NOT NULL,
+    state     TEXT NOT NULL,
+    spec      TEXT NOT NULL,               -- JSON: files (category -> digest), mappings, bots, params
+    bots      TEXT NOT NULL DEFAULT '{}',  -- JSON: code -> {status, rows, seconds, error}
+    rows      INTEGER NOT NULL DEFAULT 0,  -- input rows read so far
+    error     TEXT NOT NULL DEFAULT '',
+    worker    INTEGER,
+    submitted REAL NOT NULL,
+    started   REAL,
+    finished  REAL
+);
+CREATE INDEX IF NOT EXISTS jobs_state ON jobs (state, submitted);
+CREATE TABLE IF NOT EXISTS workers (
+    pid     INTEGER PRIMARY KEY,
+    started REAL NOT NULL
+);
+"""
+
+
+class JobStatus(NamedTuple):
+    id: str
+    kind: str
+    state: str                      # queued / running / done / failed
+    spec: Dict[str, Any]
+    bots: Dict[str, Dict[str, Any]]  # bots (and analytics) that started: status, rows, seconds, error
+    rows: int
+    error: str
+    submitted: float
+    started: Optional[float]
+    finished: Optional[float]
+
+    @property
+    def active(self) -> bool:
+        return self.state in (QUEUED, RUNNING)
+
+
+def _connect() -> sqlite3.Connection:
+    os.makedirs(os.path.dirname(DB_PATH) or ".", exist_ok=True)
+    # Autocommit; the one read-then-write (claiming a job) takes the lock explicitly
+    conn = sqlite3.connect(DB_PATH, timeout=30, isolation_level=None)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.executescript(_SCHEMA)
+    return conn
+
+
+@contextmanager
+def _db():
+    conn = _connect()
+    try:
+        yield conn
+    finally:
+        conn.close()
+
+
+def _result_path(job_id: str) -> str:
+    return os.path.join(logic6.RESULTS_DIR, f"job_{job_id}.pkl")
+
+
+def _log_path() -> str:
+    return os.path.join(logic6.RESULTS_DIR, "job_worker.log")
+
+
+def _digest(data) -> Optional[str]:
+    if data is None or len(data) == 0:
+        return None
+    blob = data if isinstance(data, blob_store.Blob) else blob_store.put(bytes(data))
+    return blob.digest
+
+
+# ---------- Page side ----------
+def submit(
+    kind: str,
+    file_bytes_map: Dict[str, Any],
+    sheet_mapping_pairs: Dict[str, Dict[str, str]],
+    column_mapping_pairs: Dict[str, Dict[str, Dict[str, str]]],
+    selected_bots: Optional[Iterable[str]] = None,
+    params: Optional[Dict[str, float]] = None,
+) -> str:
+    """
+    Queue a job and make sure workers are running. `file_bytes_map` holds the runner's
+    uploads (blob_store handles or bytes); `selected_bots` None runs every bot of the kind;
+    `params` default to logic6's current tunables.
+    Returns the job id.
+    """
+    if kind not in KINDS:
+        raise ValueError(f"Unknown job kind {kind!r}; expected one of {KINDS}.")
+    spec = {
+        "files": {cat: d for cat, data in file_bytes_map.items() if (d := _digest(data))},
+        "sheet_mapping_pairs": sheet_mapping_pairs,
+        "column_mapping_pairs": column_mapping_pairs,
+        "selected_bots": list(selected_bots) if selected_bots is not None else None,
+        # The parameter editor's thresholds as they are now: a worker imported logic6 once,
+        # before any later edit of it
+        "params": params if params is not None else {n: getattr(logic6, n) for n in logic6.TUNABLES},
+    }
+    job_id = uuid.uuid4().hex
+    with _db() as conn:
+        conn.execute("INSERT INTO jobs (id, kind, state, spec, submitted) VALUES (?, ?, ?, ?, ?)",
+                     (job_id, kind, QUEUED, json.dumps(spec, default=str), time.time()))
+    ensure_workers()
+    return job_id
+
+
+def status(job_id: Optional[str]) -> Optional[JobStatus]:
+    """The job's state and per-bot progress; None for an unknown id."""
+    if not job_id:
+        return None
+    with _db() as conn:
+        row = conn.execute("SELECT id, kind, state, spec, bots, rows, error, submitted, started, finished "
+                           "FROM jobs WHERE id = ?", (job_id,)).fetchone()
+    if row is None:
+        return None
+    return JobStatus(row[0], row[1], row[2], json.loads(row[3]), json.loads(row[4]), *row[5:])
+
+
+def result(job_id: str) -> Dict[str, Any]:
+    """The outcome of a finished job (see _run_p2p / _run_banking)."""
+    with open(_result_path(job_id), "rb") as f:
+        return pickle.load(f)
+
+
+def _alive(pid: Optional[int]) -> bool:
+    if pid is None:
+        return False
+    try:
+        # A worker this process started stays a zombie, which kill() still finds, until reaped
+        if os.waitpid(pid, os.WNOHANG)[0] == pid:
+            return False
+    except ChildProcessError:
+        pass
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _fail_orphans(conn: sqlite3.Connection) -> None:
+    """Fail the running jobs whose worker died mid-run (e.g. killed for memory)."""
+    for job_id, worker in conn.execute("SELECT id, worker FROM jobs WHERE state = ?", (RUNNING,)).fetchall():
+        if not _alive(worker):
+            conn.execute("UPDATE jobs SET state = ?, error = ?, finished = ? WHERE id = ? AND state = ? AND worker IS ?",
+                         (FAILED, "The worker running this job exited.", time.time(), job_id, RUNNING, worker))
+
+
+def ensure_workers() -> None:
+    """
+    Fail the jobs of dead workers, then start workers until JOB_WORKERS are alive (while
+    there is queued work). The pages call this on every poll of an unfinished job.
+    """
+    with _db() as conn:
+        _fail_orphans(conn)
+        pids = [pid for (pid,) in conn.execute("SELECT pid FROM workers")]
+        dead = [pid for pid in pids if not _alive(pid)]
+        conn.executemany("DELETE FROM workers WHERE pid = ?", [(pid,) for pid in dead])
+        queued = conn.execute("SELECT COUNT(*) FROM jobs WHERE state = ?", (QUEUED,)).fetchone()[0]
+        for _ in range(min(queued, JOB_WORKERS - (len(pids) - len(dead)))):
+            if os.path.exists(_log_path()) and os.path.getsize(_log_path()) > LOG_MAX_BYTES:
+                os.replace(_log_path(), _log_path() + ".1")
+            with open(_log_path(), "ab") as log:
+                # Own session: the worker outlives a restart of the server that started it
+                proc = subprocess.Popen([sys.executable, os.path.abspath(__file__), "worker"],
+                                        stdin=subprocess.DEVNULL, stdout=log, stderr=log, start_new_session=True)
+            # Counted from now on, so the next submit does not start another one
+            conn.execute("INSERT OR REPLACE INTO workers (pid, started) VALUES (?, ?)", (proc.pid, time.time()))
+
+
+# ---------- Worker side ----------
+def _claim(conn: sqlite3.Connection, pid: int) -> Optional[tuple]:
+    """Take the oldest queued job; also fail the jobs of workers that died mid-run."""
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        _fail_orphans(conn)
+        row = conn.execute("SELECT id, kind, spec FROM jobs WHERE state = ? ORDER BY submitted LIMIT 1",
+                           (QUEUED,)).fetchone()
+        if row is not None:
+            conn.execute("UPDATE jobs SET state = ?, worker = ?, started = ? WHERE id = ?",
+                         (RUNNING, pid, time.time(), row[0]))
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    return row
+
+
+def _purge(conn: sqlite3.Connection) -> None:
+    """
+    Delete jobs that finished more than RETENTION_DAYS ago and result files as old, then
+    the uploads (blob_store.expire) no remaining job reads.
+    """
+    if RETENTION_DAYS > 0:
+        _purge_results(conn, time.time() - RETENTION_DAYS * 86400)
+    keep = set()
+    for (spec,) in conn.execute("SELECT spec FROM jobs"):
+        keep.update(json.loads(spec).get("files", {}).values())
+    blob_store.expire(keep=keep)
+
+
+def _purge_results(conn: sqlite3.Connection, cutoff: float) -> None:
+    old = [job_id for (job_id,) in conn.execute("SELECT id FROM jobs WHERE state IN (?, ?) AND finished < ?",
+                                                (DONE, FAILED, cutoff))]
+    conn.executemany("DELETE FROM jobs WHERE id = ?", [(job_id,) for job_id in old])
+    # By age rather than by row, so results whose row is gone (e.g. a deleted database) go too
+    for name in os.listdir(logic6.RESULTS_DIR):
+        path = os.path.join(logic6.RESULTS_DIR, name)
+        if name.startswith("job_") and name.endswith((".pkl", ".pkl.tmp")):
+            try:
+                if os.path.getmtime(path) < cutoff:
+                    os.remove(path)
+            except OSError:
+                pass  # taken by another worker's purge
+
+
+def _run_p2p(spec: Dict[str, Any], file_bytes_map: Dict[str, Any], progress: bot_engine.Progress) -> Dict[str, Any]:
+    """processpage's run: the selected bots and their analytics as one registry job."""
+    import bot_registry
+    import logic
+
+    codes = list(bot_registry.P2P_O2C_H2R_BOTS) if spec["selected_bots"] is None else spec["selected_bots"]
+    frames = bot_engine.ingest(
+        lambda: logic.prepare_dataframes(file_bytes_map, spec["sheet_mapping_pairs"], spec["column_mapping_pairs"],
+                                         selected_bots=spec["selected_bots"]),
+        progress,
+    )
+    raw_dfs = dict(zip(("VENDOR_RAW", "P2P_RAW", "EMP_P2P_RAW", "O2C_RAW", "CUST_RAW", "EMP_H2R_RAW", "ATT_RAW"),
+                       frames))
+    raw_dfs["EMP_RAW"] = raw_dfs["EMP_P2P_RAW"]  # backward-compatible alias
+    job = bot_registry.Job({k: v for k, v in raw_dfs.items() if k in bot_registry.INPUT_LABELS})
+    job.run(codes + bot_registry.analytics_for(codes), progress)
+    for code in codes:
+        if code in job.skipped:
+            bot_engine.emit(progress, bot_engine.FINISH, code, "Failed", error=job.missing_message(code))
+    return {"raw_dfs": raw_dfs, "job": job, "results": job.results(codes),
+            "proc_status": {c: job.proc_status.get(c, "Failed") for c in codes},
+            "seconds": {c: job.seconds[c] for c in codes if c in job.seconds}}
+
+
+def _run_banking(spec: Dict[str, Any], file_bytes_map: Dict[str, Any], progress: bot_engine.Progress) -> Dict[str, Any]:
+    """b6's run: every banking bot with its inputs."""
+    import blogic
+
+    rows = {"read": 0}
+
+    def _count(ev: bot_engine.ProgressEvent):
+        if ev.kind == bot_engine.ROWS and not ev.code:
+            rows["read"] = ev.rows
+        progress(ev)
+
+    results, proc_status, raw_dfs = blogic.run_all_bots_with_mappings(
+        file_bytes_map, spec["sheet_mapping_pairs"], spec["column_mapping_pairs"], progress=_count,
+    )
+    banking = raw_dfs.get("BANKING_RAW")
+    return {"results": results, "proc_status": proc_status, "raw_dfs": raw_dfs,
+            "input_row_count": len(banking) if banking is not None else rows["read"]}
+
+
+def _execute(conn: sqlite3.Connection, job_id: str, kind: str, spec: Dict[str, Any]) -> None:
+    bots: Dict[str, Dict[str, Any]] = {}
+
+    def _progress(ev: bot_engine.ProgressEvent):
+        if ev.kind == bot_engine.START:
+            bots[ev.code] = {"status": "Processing", "rows": 0, "seconds": 0.0, "error": ""}
+        elif ev.kind == bot_engine.FINISH and ev.code:
+            bots[ev.code] = {"status": ev.status, "rows": ev.rows, "seconds": ev.seconds, "error": ev.error}
+        elif ev.kind in (bot_engine.ROWS, bot_engine.INGEST) and ev.rows:
+            conn.execute("UPDATE jobs SET rows = ? WHERE id = ?", (ev.rows, job_id))
+            return
+        else:
+            return
+        conn.execute("UPDATE jobs SET bots = ? WHERE id = ?", (json.dumps(bots), job_id))
+
+    try:
+        for name, value in spec["params"].items():
+            if name in logic6.TUNABLES:
+                setattr(logic6, name, value)
+        file_bytes_map = {}
+        for cat, digest in spec["files"].items():
+            blob = blob_store.get(digest)
+            if blob is None:
+                raise RuntimeError(f"The {cat} upload is no longer in the upload store.")
+            file_bytes_map[cat] = blob
+        outcome = (_run_p2p if kind == "p2p" else _run_banking)(spec, file_bytes_map, _progress)
+        tmp = _result_path(job_id) + ".tmp"
+        with open(tmp, "wb") as f:
+            pickle.dump(outcome, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, _result_path(job_id))
+        conn.execute("UPDATE jobs SET state = ?, finished = ? WHERE id = ?", (DONE, time.time(), job_id))
+    except Exception as e:
+        conn.execute("UPDATE jobs SET state = ?, error = ?, finished = ? WHERE id = ?",
+                     (FAILED, f"{type(e).__name__}: {e}", time.time(), job_id))
+
+
+def worker_main() -> None:
+    """Run queued jobs one after another until none arrives for WORKER_IDLE_SECONDS."""
+    # The runners note row counts in st.session_state, which has no session here
+    from streamlit import logger as streamlit_logger
+    streamlit_logger.set_log_level("error")
+
+    pid = os.getpid()
+    conn = _connect()
+    conn.execute("INSERT OR REPLACE INTO workers (pid, started) VALUES (?, ?)", (pid, time.time()))
+    try:
+        idle_since = time.monotonic()
+        while time.monotonic() - idle_since < WORKER_IDLE_SECONDS:
+            job = _claim(conn, pid)
+            if job is None:
+                time.sleep(POLL_SECONDS)
+                continue
+            job_id, kind, spec = job
+            _purge(conn)
+            _execute(conn, job_id, kind, json.loads(spec))
+            idle_since = time.monotonic()
+    finally:
+        conn.execute("DELETE FROM workers WHERE pid = ?", (pid,))
+        conn.close()
+
+
+if __name__ == "__main__":
+    if sys.argv[1:] != ["worker"]:
+        sys.exit("usage: python job_queue.py worker")
+    worker_main()
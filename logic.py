@@ -1,11 +1,17 @@
 # logic.py
+import re
 import pandas as pd
 import numpy as np
-from io import BytesIO
-from typing import Dict, Tuple, Any
+from typing import Dict, Tuple, Any, Optional, Iterable, List
 
-# We import your existing logic6 (unchanged)
+import bot_engine
+import bot_registry
+import columnar_cache
+import frame_cache
+# Bot implementations and tunables; logic6.BOT_INPUT_COLUMNS also drives column projection here
 import logic6
+import schema
+from workbook_loader import ColumnFilter, WorkbookLoader
 
 # ---------- Canonical field targets that logic6 expects ----------
 # Map *Required Field* → *Canonical Column Name in logic6*
@@ -70,6 +76,37 @@ CANONICAL_FIELDS = {
     },
 }
 
+# ---------- Canonical column types (coerced once at load, see schema.py) ----------
+CANONICAL_TYPES = {
+    "P2P": {
+        "P2P Sample": {
+            "PO_Date": schema.DATE,
+            "GRN_Date": schema.DATE,
+            "Invoice_Date": schema.DATE,
+            "PO_Qty": schema.NUMBER,
+            "PO_Amt": schema.NUMBER,
+            "GRN_Qty": schema.NUMBER,
+            "Invoice_Qty": schema.NUMBER,
+            "Invoice_Amount": schema.NUMBER,
+        },
+    },
+    "O2C": {
+        "O2C Sample": {
+            "SO_Date": schema.DATE,
+            "Delivery_Date": schema.DATE,
+        },
+    },
+    "H2R": {
+        "Employee Master": {
+            "Exit_Date": schema.DATE,
+        },
+    },
+}
+
+def _sheet_list(mapped) -> List[str]:
+    """A mapped sheet name, or a list of them (H2R Attendance Register months), as a list."""
+    return list(mapped) if isinstance(mapped, (list, tuple)) else [mapped]
+
 def _build_rename_map(required_to_actual: Dict[str, str], req_to_canon: Dict[str, str]) -> Dict[str, str]:
     """
     Convert {Required Field -> Actual Column} to {Actual Column -> Canonical Column}.
@@ -80,19 +117,90 @@ def _build_rename_map(required_to_actual: Dict[str, str], req_to_canon: Dict[str
             rename[actual] = req_to_canon[req]
     return rename
 
-def _read_sheet_from(bytes_blob: bytes, sheet_name: str) -> pd.DataFrame:
-    bio = BytesIO(bytes_blob)
-    return pd.read_excel(bio, sheet_name=sheet_name)
+def _input_column_filters(
+    column_mapping_pairs: Dict[str, Dict[str, Dict[str, str]]],
+    selected_bots: Optional[Iterable[str]],
+) -> Optional[Dict[Tuple[str, str], ColumnFilter]]:
+    """
+    Minimal columns to load per (category, required sheet) for the selected bots, from
+    logic6.BOT_INPUT_COLUMNS: the mapped actual column of each canonical input plus the
+    canonical name itself (for columns that already carry it, e.g. Item_Code).
+    Sheets no selected bot reads are absent. None means load everything.
+    """
+    if not selected_bots:
+        return None
+    wanted: Dict[Tuple[str, str], set] = {}
+    for code in selected_bots:
+        if code not in logic6.BOT_INPUT_COLUMNS:
+            return None  # undeclared bot: play safe
+        for cat, sheets in logic6.BOT_INPUT_COLUMNS[code].items():
+            for req_sheet, cols in sheets.items():
+                wanted.setdefault((cat, req_sheet), set()).update(cols)
+
+    filters = {}
+    for (cat, req_sheet), canon_cols in wanted.items():
+        req_to_canon = CANONICAL_FIELDS.get(cat, {}).get(req_sheet, {})
+        names = set(canon_cols)
+        for req, actual in column_mapping_pairs.get(cat, {}).get(req_sheet, {}).items():
+            if actual and req_to_canon.get(req) in canon_cols:
+                names.add(actual)
+        filters[(cat, req_sheet)] = ColumnFilter(names, day_columns=(req_sheet == "Attendance Register"))
+    return filters
+
+def _prepared_key(
+    file_bytes_map: Dict[str, bytes],
+    sheet_mapping_pairs: Dict[str, Dict[str, str]],
+    column_mapping_pairs: Dict[str, Dict[str, Dict[str, str]]],
+    selected_bots: Optional[Iterable[str]],
+) -> tuple:
+    contents = tuple(
+        (cat, columnar_cache.content_key(b))
+        for cat in ("P2P", "O2C", "H2R")
+        for b in [file_bytes_map.get(cat) or file_bytes_map.get("MASTER")]
+        if b
+    )
+    bots = None if selected_bots is None else tuple(sorted(set(selected_bots)))
+    return ("logic", contents, frame_cache.mapping_key(sheet_mapping_pairs),
+            frame_cache.mapping_key(column_mapping_pairs), bots)
+
 
 def prepare_dataframes(
     file_bytes_map: Dict[str, bytes],
     sheet_mapping_pairs: Dict[str, Dict[str, str]],
     column_mapping_pairs: Dict[str, Dict[str, Dict[str, str]]],
+    engine: Optional[str] = None,
+    selected_bots: Optional[Iterable[str]] = None,
 ) -> Tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame, pd.DataFrame, pd.DataFrame, pd.DataFrame]:
     """
     Returns: (df_vendor, df_p2p, df_emp_p2p, df_o2c, df_cust, df_att)
     Missing ones can be None.
+
+    Each uploaded workbook is opened once; all of its mapped sheets are parsed in one
+    pass, and separate P2P/O2C/H2R workbooks are parsed concurrently in worker processes
+    (see workbook_loader). `engine` selects the Excel reader, e.g. "calamine".
+    With `selected_bots` only the sheets and columns those bots read are loaded
+    (see logic6.BOT_INPUT_COLUMNS); sheets none of them needs come back as None.
+
+    Prepared frames are kept in frame_cache.PREPARED, keyed by upload content and the
+    mappings, so a rerun after a threshold change skips ingest; callers get copies.
     """
+    key = _prepared_key(file_bytes_map, sheet_mapping_pairs, column_mapping_pairs, selected_bots)
+    hit = frame_cache.PREPARED.get(key)
+    if hit is not None:
+        return hit
+    frames = _prepare_dataframes(file_bytes_map, sheet_mapping_pairs, column_mapping_pairs,
+                                 engine=engine, selected_bots=selected_bots)
+    frame_cache.PREPARED.put(key, frames)
+    return frames
+
+
+def _prepare_dataframes(
+    file_bytes_map: Dict[str, bytes],
+    sheet_mapping_pairs: Dict[str, Dict[str, str]],
+    column_mapping_pairs: Dict[str, Dict[str, Dict[str, str]]],
+    engine: Optional[str] = None,
+    selected_bots: Optional[Iterable[str]] = None,
+) -> tuple:
     # Helper: choose bytes per category (prefer category, else master)
     def _cat_bytes(cat: str):
         if cat == "P2P":
@@ -103,6 +211,42 @@ def prepare_dataframes(
             return file_bytes_map.get("H2R") or file_bytes_map.get("MASTER")
         return None
 
+    col_filters = _input_column_filters(column_mapping_pairs, selected_bots)
+
+    def _needed(cat: str, req_sheet: str) -> bool:
+        if req_sheet not in sheet_mapping_pairs.get(cat, {}):
+            return False
+        return col_filters is None or (cat, req_sheet) in col_filters
+
+    def _typed(df: pd.DataFrame, cat: str, req_sheet: str, rename: Dict[str, str]) -> pd.DataFrame:
+        # Parsed date columns are cached per (upload, sheet, source column) across runs
+        sheet = sheet_mapping_pairs[cat][req_sheet]
+        source = (loader.session(_cat_bytes(cat)).key, sheet if isinstance(sheet, str) else tuple(sheet), 0)
+        return schema.apply_schema(df, CANONICAL_TYPES.get(cat, {}).get(req_sheet, {}),
+                                   source=source, origins={v: k for k, v in rename.items()})
+
+    def _fill_missing(df: pd.DataFrame, cat: str, req_sheet: str, cols) -> None:
+        # Projected-away columns stay absent rather than showing up empty in the outputs
+        keep = None if col_filters is None else col_filters[(cat, req_sheet)]
+        for c in cols:
+            if c not in df.columns and (keep is None or keep(c)):
+                df[c] = np.nan
+
+    # Register every needed sheet up front so a shared master workbook is parsed once
+    loader = WorkbookLoader(engine=engine)
+    for cat in ("P2P", "O2C", "H2R"):
+        cat_bytes = _cat_bytes(cat)
+        if cat in sheet_mapping_pairs and cat_bytes:
+            for req_sheet, sheet in sheet_mapping_pairs[cat].items():
+                if _needed(cat, req_sheet):
+                    cols = None if col_filters is None else col_filters[(cat, req_sheet)]
+                    loader.session(cat_bytes).want(_sheet_list(sheet), columns=cols)
+    # Distinct workbooks are parsed side by side in worker processes
+    loader.prefetch()
+
+    def _read_sheet_from(bytes_blob: bytes, sheet_name: str) -> pd.DataFrame:
+        return loader.session(bytes_blob).read(sheet_name)
+
     # Prepare containers
     df_vendor = df_p2p = df_emp_p2p = df_o2c = df_cust = df_att = None
 
@@ -114,34 +258,33 @@ def prepare_dataframes(
             fields_map = column_mapping_pairs.get("P2P", {})
 
             # P2P Sample
-            if "P2P Sample" in mapping:
+            if _needed("P2P", "P2P Sample"):
                 sheet = mapping["P2P Sample"]
                 df = _read_sheet_from(p2p_bytes, sheet)
                 rename = _build_rename_map(fields_map.get("P2P Sample", {}), CANONICAL_FIELDS["P2P"]["P2P Sample"])
                 if rename: df = df.rename(columns=rename)
                 # Fill any missing canonical columns used by logic6
-                for c in ["PO_No","PO_Qty","PO_Amt","GRN_Qty","Invoice_Qty","Invoice_Amount",
-                          "Vendor_Name","PO_Date","Invoice_Date","PO_Approved_By","PO_Created_By","Item_Code"]:
-                    if c not in df.columns: df[c] = np.nan
-                df_p2p = df
+                _fill_missing(df, "P2P", "P2P Sample",
+                              ["PO_No","PO_Qty","PO_Amt","GRN_Qty","Invoice_Qty","Invoice_Amount",
+                               "Vendor_Name","PO_Date","Invoice_Date","PO_Approved_By","PO_Created_By","Item_Code"])
+                df_p2p = _typed(df, "P2P", "P2P Sample", rename)
 
             # Vendor Master
-            if "Vendor Master" in mapping:
+            if _needed("P2P", "Vendor Master"):
                 sheet = mapping["Vendor Master"]
                 df = _read_sheet_from(p2p_bytes, sheet)
                 rename = _build_rename_map(fields_map.get("Vendor Master", {}), CANONICAL_FIELDS["P2P"]["Vendor Master"])
                 if rename: df = df.rename(columns=rename)
-                for c in ["PAN_No","GST_No","Bank_Account","Vendor_Name","Creator_ID"]:
-                    if c not in df.columns: df[c] = np.nan
-                df_vendor = df
+                _fill_missing(df, "P2P", "Vendor Master", ["PAN_No","GST_No","Bank_Account","Vendor_Name","Creator_ID"])
+                df_vendor = _typed(df, "P2P", "Vendor Master", rename)
 
             # Employee Master (for department lookups in logic6.summarize_mismatches)
-            if "Employee Master" in mapping:
+            if _needed("P2P", "Employee Master"):
                 sheet = mapping["Employee Master"]
                 df = _read_sheet_from(p2p_bytes, sheet)
                 rename = _build_rename_map(fields_map.get("Employee Master", {}), CANONICAL_FIELDS["P2P"]["Employee Master"])
                 if rename: df = df.rename(columns=rename)
-                df_emp_p2p = df
+                df_emp_p2p = _typed(df, "P2P", "Employee Master", rename)
 
     # ---------- O2C ----------
     if "O2C" in sheet_mapping_pairs:
@@ -150,21 +293,20 @@ def prepare_dataframes(
             mapping = sheet_mapping_pairs["O2C"]
             fields_map = column_mapping_pairs.get("O2C", {})
 
-            if "O2C Sample" in mapping:
+            if _needed("O2C", "O2C Sample"):
                 sheet = mapping["O2C Sample"]
                 df = _read_sheet_from(o2c_bytes, sheet)
                 rename = _build_rename_map(fields_map.get("O2C Sample", {}), CANONICAL_FIELDS["O2C"]["O2C Sample"])
                 if rename: df = df.rename(columns=rename)
-                if "Delivery_No" not in df.columns:
-                    df["Delivery_No"] = np.nan
-                df_o2c = df
+                _fill_missing(df, "O2C", "O2C Sample", ["Delivery_No"])
+                df_o2c = _typed(df, "O2C", "O2C Sample", rename)
 
-            if "Customer Master" in mapping:
+            if _needed("O2C", "Customer Master"):
                 sheet = mapping["Customer Master"]
                 df = _read_sheet_from(o2c_bytes, sheet)
                 rename = _build_rename_map(fields_map.get("Customer Master", {}), CANONICAL_FIELDS["O2C"]["Customer Master"])
                 if rename: df = df.rename(columns=rename)
-                df_cust = df
+                df_cust = _typed(df, "O2C", "Customer Master", rename)
 
     # ---------- H2R ----------
     if "H2R" in sheet_mapping_pairs:
@@ -173,32 +315,38 @@ def prepare_dataframes(
             mapping = sheet_mapping_pairs["H2R"]
             fields_map = column_mapping_pairs.get("H2R", {})
 
-            if "Employee Master" in mapping:
+            if _needed("H2R", "Employee Master"):
                 df = _read_sheet_from(h2r_bytes, mapping["Employee Master"])
                 rename = _build_rename_map(fields_map.get("Employee Master", {}), CANONICAL_FIELDS["H2R"]["Employee Master"])
                 if rename: df = df.rename(columns=rename)
                 if "Employee_ID" in df.columns:
                     df["Employee_ID"] = df["Employee_ID"].astype(str).str.strip()
-                df_emp_h2r = df
+                df_emp_h2r = _typed(df, "H2R", "Employee Master", rename)
             else:
                 df_emp_h2r = None
 
-            if "Attendance Register" in mapping:
-                df = _read_sheet_from(h2r_bytes, mapping["Attendance Register"])
+            if _needed("H2R", "Attendance Register"):
+                # One sheet, or a list of monthly sheets with the same layout (a year's registers)
+                sheets = _sheet_list(mapping["Attendance Register"])
                 rename = _build_rename_map(fields_map.get("Attendance Register", {}), CANONICAL_FIELDS["H2R"]["Attendance Register"])
-                if rename: df = df.rename(columns=rename)
-                # Derive Present_Days if day columns exist
-                day_cols = [c for c in df.columns if str(c).startswith("D") and str(c)[1:].isdigit()]
+                parts = []
+                for sheet in sheets:
+                    part = _read_sheet_from(h2r_bytes, sheet)
+                    if rename: part = part.rename(columns=rename)
+                    if len(sheets) > 1 and ("Month" not in part.columns or part["Month"].isna().all()):
+                        part["Month"] = sheet
+                    parts.append(part)
+                df = pd.concat(parts, ignore_index=True) if len(parts) > 1 else parts[0]
+                # Derive Present_Days if day columns exist: employee-month presence summed per row
+                day_cols = [c for c in df.columns if re.fullmatch(logic6.ATTENDANCE_DAY_COLUMN, str(c))]
                 if day_cols:
-                    s = df[day_cols].astype(str).apply(lambda col: col.str.strip().str.upper())
-                    present = (~s.eq("A")).sum(axis=1)
-                    df["Present_Days"] = present
+                    df["Present_Days"] = logic6.AttendanceRegister(df).row_present_days()
                 else:
                     if "Present_Days" not in df.columns:
                         df["Present_Days"] = 0
                 if "Employee_ID" in df.columns:
                     df["Employee_ID"] = df["Employee_ID"].astype(str).str.strip()
-                df_att = df
+                df_att = _typed(df, "H2R", "Attendance Register", rename)
             else:
                 df_att = None
 
@@ -213,102 +361,37 @@ def run_all_bots_with_mappings(
     file_bytes_map: Dict[str, bytes],
     sheet_mapping_pairs: Dict[str, Dict[str, str]],
     column_mapping_pairs: Dict[str, Dict[str, Dict[str, str]]],
+    engine: Optional[str] = None,
+    selected_bots: Optional[Iterable[str]] = None,
+    progress: bot_engine.Progress = None,
 ) -> Tuple[Dict[str, pd.DataFrame], Dict[str, str], Dict[str, str], Dict[str, pd.DataFrame]]:
     """
-    Executes all bots using mapped columns. Returns:
+    Executes all bots using mapped columns; `progress` receives bot_engine.ProgressEvent
+    for the ingest and for each bot's start and finish. Returns:
     - results: dict code -> DataFrame
     - proc_status: dict code -> status
     - cat_status: dict category -> status
     - raw_dfs: dict of raw dfs used (for next-level analytics compatibility)
     """
     # Prepare dataframes
-    df_vendor, df_p2p, df_emp_p2p, df_o2c, df_cust, df_emp_h2r, df_att = prepare_dataframes(
-        file_bytes_map, sheet_mapping_pairs, column_mapping_pairs
+    df_vendor, df_p2p, df_emp_p2p, df_o2c, df_cust, df_emp_h2r, df_att = bot_engine.ingest(
+        lambda: prepare_dataframes(file_bytes_map, sheet_mapping_pairs, column_mapping_pairs,
+                                   engine=engine, selected_bots=selected_bots),
+        progress,
     )
 
-    results: Dict[str, pd.DataFrame] = {}
     proc_status = {
         'P2P1':'Pending','P2P2':'Pending','P2P3':'Pending','P2P4':'Pending','P2P5':'Pending',
         'O2C1':'Pending','O2C2':'Pending','O2C3':'Pending',
         'H2R1':'Pending','H2R2':'Pending',
     }
-
-    # ---------- P2P ----------
-    if df_vendor is not None:
-        try:
-            results['P2P1'] = logic6.find_missing_vendor_fields(df_vendor)
-            proc_status['P2P1'] = 'Complete'
-        except Exception:
-            proc_status['P2P1'] = 'Failed'
-
-        try:
-            # Duplicate Vendors — run on DF (no workbook dependency)
-            results['P2P5'] = _find_matching_rows_from_df(df_vendor)
-            proc_status['P2P5'] = 'Complete'
-        except Exception:
-            proc_status['P2P5'] = 'Failed'
-
-    if df_p2p is not None:
-        try:
-            results['P2P2'] = logic6.find_po_grn_invoice_mismatches(df_p2p)
-            proc_status['P2P2'] = 'Complete'
-        except Exception:
-            proc_status['P2P2'] = 'Failed'
-        try:
-            results['P2P3'] = logic6.get_invalid_rows(df_p2p)
-            proc_status['P2P3'] = 'Complete'
-        except Exception:
-            proc_status['P2P3'] = 'Failed'
-        try:
-            results['P2P4'] = logic6.generate_result(df_p2p)
-            proc_status['P2P4'] = 'Complete'
-        except Exception:
-            proc_status['P2P4'] = 'Failed'
-
-    # ---------- O2C ----------
-    if df_o2c is not None:
-        try:
-            results['O2C1'] = logic6.check_overdue_delivery(df_o2c.copy())
-            proc_status['O2C1'] = 'Complete'
-        except Exception:
-            proc_status['O2C1'] = 'Failed'
-        try:
-            # ensure columns exist
-            if "Delivery_No" not in df_o2c.columns:
-                df_o2c = df_o2c.copy(); df_o2c["Delivery_No"] = np.nan
-            results['O2C2'] = logic6.check_dispatch_without_invoice(df_o2c.copy())
-            proc_status['O2C2'] = 'Complete'
-        except Exception:
-            proc_status['O2C2'] = 'Failed'
-
-    if df_cust is not None:
-        try:
-            results['O2C3'] = logic6.get_missing_customer_data(df_cust.copy())
-            proc_status['O2C3'] = 'Complete'
-        except Exception:
-            proc_status['O2C3'] = 'Failed'
-
-    # ---------- H2R ----------
-    if (df_emp_h2r is not None) and (df_att is not None):
-        try:
-            results['H2R1'] = logic6.find_ghost_employees(df_emp_h2r, df_att)
-            proc_status['H2R1'] = 'Complete'
-        except Exception:
-            proc_status['H2R1'] = 'Failed'
-        try:
-            # Build a temp in-memory workbook for the function that expects file bytes
-            bio = BytesIO()
-            with pd.ExcelWriter(bio, engine="xlsxwriter") as writer:
-                df_emp_h2r.to_excel(writer, sheet_name="Employee_Master", index=False)
-                df_att.to_excel(writer, sheet_name="Attendance_Register", index=False)
-            bio.seek(0)
-            results['H2R2'] = logic6.find_attendance_after_exit(
-                bio, employee_sheet="Employee_Master", attendance_sheet="Attendance_Register",
-                month_col="Month", year_col=None
-            )
-            proc_status['H2R2'] = 'Complete'
-        except Exception:
-            proc_status['H2R2'] = 'Failed'
+    # Bots whose inputs were not mapped are left out by the planner and stay Pending
+    job = bot_registry.Job({
+        "VENDOR_RAW": df_vendor, "P2P_RAW": df_p2p, "EMP_P2P_RAW": df_emp_p2p, "O2C_RAW": df_o2c,
+        "CUST_RAW": df_cust, "EMP_H2R_RAW": df_emp_h2r, "ATT_RAW": df_att,
+    }).run(bot_registry.P2P_O2C_H2R_BOTS, progress)
+    results = job.results(bot_registry.P2P_O2C_H2R_BOTS)
+    proc_status.update(job.proc_status)
 
     # ---------- Category rollups ----------
     cat_status = {
@@ -329,41 +412,14 @@ def run_all_bots_with_mappings(
     return results, proc_status, cat_status, raw_dfs
 
 
-def _find_matching_rows_from_df(df: pd.DataFrame) -> pd.DataFrame:
+def _find_matching_rows_from_df(df: pd.DataFrame, name_threshold: Optional[float] = None) -> pd.DataFrame:
     """
     Duplicate Vendors (logic6.find_matching_rows) but working directly on a DF that
     already uses canonical columns (Vendor_Name, PAN_No, GST_No, Bank_Account).
+    One row per duplicate cluster; logic6.duplicate_vendor_pairs expands a cluster into
+    row pairs on request. Similar (not only identical) names also match when
+    name_threshold, by default logic6.FUZZY_NAME_THRESHOLD, is above 0.
     """
-    from itertools import combinations
-
-    d = df.copy().replace(r'^\s*$', pd.NA, regex=True).reset_index(drop=True)
-    d.insert(0, "RowNo", d.index + 1)
-
-    keys = {
-        "PAN_No": "PAN Match",
-        "GST_No": "GST Match",
-        "Vendor_Name": "Vendor Name Match",
-        "Bank_Account": "Bank Account Match",
-    }
-
-    pairs = {}
-    for col, label in keys.items():
-        if col in d.columns:
-            tmp = d.dropna(subset=[col])
-            groups = tmp.groupby(col, dropna=True)["RowNo"].apply(list)
-            for rows in groups:
-                if len(rows) >= 2:
-                    for a, b in combinations(sorted(rows), 2):
-                        pairs.setdefault((a, b), set()).add(label)
-
-    rows_info = d.set_index("RowNo")
-    records = []
-    for (a, b), labels in sorted(pairs.items()):
-        rec = {"Row_A": a, "Row_B": b, "Exception_Noted": ", ".join(sorted(labels))}
-        # flatten
-        ra = rows_info.loc[a].to_dict()
-        rb = rows_info.loc[b].to_dict()
-        for k, v in ra.items(): rec[f"A_{k}"] = v
-        for k, v in rb.items(): rec[f"B_{k}"] = v
-        records.append(rec)
-    return pd.DataFrame(records)
+    if name_threshold is None:
+        name_threshold = float(getattr(logic6, "FUZZY_NAME_THRESHOLD", 0) or 0)
+    return logic6.find_duplicate_vendor_clusters(df, name_threshold=name_threshold)
@@ -1,9 +1,16 @@
 import pandas as pd
 import numpy as np
+import pyarrow as pa
 import os, json, re
 from io import BytesIO
 from itertools import combinations
 
+import spend_cube
+
+# P2P/O2C frames arrive pre-typed from logic.CANONICAL_TYPES; these calls are then no-ops.
+# Columns read here from Excel go through date_parsing (format inference, Excel serials).
+from schema import to_date, to_number
+
 RESULTS_DIR = "results_cache"
 os.makedirs(RESULTS_DIR, exist_ok=True)
 
@@ -13,6 +20,15 @@ Generate_self_approved = 10000
 vendor_year_threshold = 50000
 vendor_daily_threshold = 50000
 check_overdue_delivery = 7       # variable5
+# P2P5 similar-name matching: 0 = exact names only, else the minimum name similarity (0-1)
+FUZZY_NAME_THRESHOLD = 0
+# P2P4 split orders: 0 = POs sharing one PO date, else POs within any window of this many days
+SPLIT_ORDER_WINDOW_DAYS = 0
+
+# Thresholds an auditor sets on the processing page's parameter editor (OVERDUE_DAYS_THRESHOLD
+# is defined with the overdue bots below); batch_cli --param and job_queue jobs carry these
+TUNABLES = ("PO_GRN_Invoice", "Generate_self_approved", "vendor_year_threshold", "vendor_daily_threshold",
+            "OVERDUE_DAYS_THRESHOLD", "FUZZY_NAME_THRESHOLD", "SPLIT_ORDER_WINDOW_DAYS")
 
 
 PROCESS_TITLES = {
@@ -40,6 +56,34 @@ BOT_NAMES = [
     "Ghost employee detection","Inactive Employees In Payroll",
 ]
 
+# Canonical columns each bot reads (including its dashboard analytics), per category and
+# required sheet. logic.prepare_dataframes loads only these when given the selected bots.
+_EMP_ID_DEPT = ["Employee_ID", "Employee Id", "EmployeeID", "EmployeeId",
+                "Department", "Dept", "Department Name", "Department_Name"]
+BOT_INPUT_COLUMNS = {
+    "P2P1": {"P2P": {"Vendor Master": ["Vendor_Name", "PAN_No", "GST_No", "Bank_Account", "Creator_ID"],
+                     "P2P Sample": ["Vendor_Name", "Invoice_Date", "Invoice_Amount"],
+                     "Employee Master": _EMP_ID_DEPT}},
+    "P2P2": {"P2P": {"P2P Sample": ["PO_No", "PO_Qty", "PO_Amt", "GRN_Qty", "Invoice_Qty", "Invoice_Amount",
+                                    "Item_Code", "Creator_ID"],
+                     "Employee Master": _EMP_ID_DEPT}},
+    "P2P3": {"P2P": {"P2P Sample": ["PO_No", "PO_Date", "Invoice_Date", "Invoice_Amount",
+                                    "Item_Code", "PO_Created_By"],
+                     "Employee Master": _EMP_ID_DEPT}},
+    "P2P4": {"P2P": {"P2P Sample": ["PO_No", "PO_Date", "Vendor_Name", "Item_Code", "Invoice_Amount",
+                                    "PO_Approved_By", "PO_Created_By"]}},
+    "P2P5": {"P2P": {"Vendor Master": ["Vendor_Name", "PAN_No", "GST_No", "Bank_Account"],
+                     "P2P Sample": ["Vendor_Name", "Invoice_Date", "Invoice_Amount"]}},
+    "O2C1": {"O2C": {"O2C Sample": ["SO_Date", "Delivery_Date"]}},
+    "O2C2": {"O2C": {"O2C Sample": ["Delivery_No", "Invoice_No"]}},
+    "O2C3": {"O2C": {"Customer Master": ["GST_No", "PAN_No", "Credit_Limit"]}},
+    # Attendance day columns (D1..D31) are always kept; Present_Days is derived from them
+    "H2R1": {"H2R": {"Employee Master": ["Employee_ID"],
+                     "Attendance Register": ["Employee_ID", "Present_Days"]}},
+    "H2R2": {"H2R": {"Employee Master": ["Employee_ID", "Employee_Name", "Exit_Date"],
+                     "Attendance Register": ["Employee_ID", "Employee_Name", "Month"]}},
+}
+
 def proc_symbol(status):
     return "✅" if status == "Complete" else ("❌" if status == "Failed" else "⏳")
 
@@ -75,54 +119,72 @@ def build_summary_df(proc_status, dfs):
     return pd.DataFrame(rows)
 
 # ---------------- P2P logic ----------------
+# ---------- KYC validation kernel (P2P1, O2C3) ----------
+PAN_PATTERN = r'[A-Z]{5}[0-9]{4}[A-Z]'
+GST_PATTERN = r'(0[1-9]|1[0-9]|2[0-9]|3[0-7])[A-Z]{5}[0-9]{4}[A-Z][0-9]Z[0-9A-Z]'
+
+def _arrow_text(s):
+    """
+    s as Arrow-backed strings (NaN/None -> <NA>), so strip/upper/fullmatch run in C++
+    rather than once per Python str. Non-text values go through str() as before.
+    """
+    try:
+        arr = pa.array(s, type=pa.string(), from_pandas=True)
+    except pa.ArrowException:
+        return s.astype(str).astype("string[pyarrow]").where(s.notna())
+    return pd.Series(pd.arrays.ArrowStringArray(arr), index=s.index, name=s.name)
+
+def blanks_to_nan(df: pd.DataFrame) -> pd.DataFrame:
+    """df.replace(r'^\\s*$', np.nan, regex=True), with the blank test per text column run in Arrow."""
+    out = df.copy()
+    for i in range(df.shape[1]):
+        s = df.iloc[:, i]
+        if s.dtype != object and not pd.api.types.is_string_dtype(s):
+            if isinstance(s.dtype, pd.CategoricalDtype):
+                out.isetitem(i, s.replace(r'^\s*$', np.nan, regex=True))
+            continue
+        blank = (_arrow_text(s).str.strip() == "").fillna(False).to_numpy(dtype=bool)
+        if blank.any():
+            s = s.where(~blank, np.nan)
+            out.isetitem(i, s.infer_objects() if blank.all() else s)
+    return out
+
+def kyc_exceptions(df, rules, strip=True):
+    """
+    Column-at-a-time KYC check. `rules` maps a column to a regex its (upper-cased) value
+    must fully match, or None for a presence check only. Returns a frame on df's index with
+    one column per rule holding "Missing", "Invalid" or "". Blank/NaN values, and columns
+    df does not have, count as missing; `strip` ignores surrounding whitespace.
+    """
+    out = {}
+    for col, pattern in rules.items():
+        label = np.full(len(df), "Missing" if col not in df.columns else "", dtype=object)
+        if col in df.columns:
+            text = _arrow_text(df[col])
+            if strip:
+                text = text.str.strip()
+            missing = text.isna().to_numpy() | (text == "").to_numpy(dtype=bool, na_value=False)
+            label[missing] = "Missing"
+            if pattern is not None:
+                ok = text.str.upper().str.fullmatch(pattern).to_numpy(dtype=bool, na_value=False)
+                label[~missing & ~ok] = "Invalid"
+        out[col] = label
+    return pd.DataFrame(out, index=df.index, columns=list(rules))
+
 def find_missing_vendor_fields(df):
-    pan_re = re.compile(r'^[A-Z]{5}[0-9]{4}[A-Z]$')
-    gst_re = re.compile(r'^(0[1-9]|1[0-9]|2[0-9]|3[0-7])[A-Z]{5}[0-9]{4}[A-Z][0-9]Z[0-9A-Z]$')
-
-    def val(x):
-        if pd.isna(x):
-            return ""
-        s = str(x).strip()
-        return s
-
-    out = []
-    for i in range(len(df)):
-        row_src = df.iloc[i]
-        pan = val(row_src["PAN_No"]) if "PAN_No" in df.columns else ""
-        gst = val(row_src["GST_No"]) if "GST_No" in df.columns else ""
-        bank = val(row_src["Bank_Account"]) if "Bank_Account" in df.columns else ""
-
-        pan_exc = ""
-        gst_exc = ""
-        bank_exc = ""
-
-        pan_u = pan.upper()
-        gst_u = gst.upper()
-
-        if pan == "":
-            pan_exc = "Missing"
-        elif not pan_re.match(pan_u):
-            pan_exc = "Invalid"
-
-        if gst == "":
-            gst_exc = "Missing"
-        elif not gst_re.match(gst_u):
-            gst_exc = "Invalid"
-
-        if bank == "":
-            bank_exc = "Missing"
-
-        if pan_exc or gst_exc or bank_exc:
-            row = row_src.to_dict()
-            row["PAN_Exception_Noted"] = pan_exc
-            row["GST_Exception_Noted"] = gst_exc
-            row["Bank_Exception_Noted"] = bank_exc
-            out.append(row)
+    exc = kyc_exceptions(df, {"PAN_No": PAN_PATTERN, "GST_No": GST_PATTERN, "Bank_Account": None})
+    flagged = (exc.to_numpy() != "").any(axis=1)
+    if not flagged.any():
+        return pd.DataFrame()
+    out = df[flagged].copy()
+    out["PAN_Exception_Noted"] = exc["PAN_No"].to_numpy()[flagged]
+    out["GST_Exception_Noted"] = exc["GST_No"].to_numpy()[flagged]
+    out["Bank_Exception_Noted"] = exc["Bank_Account"].to_numpy()[flagged]
     # first_cols = ["GST_Exception_Noted", "PAN_Exception_Noted", "Bank_Exception_Noted"]
     # remaining = [c for c in out.columns if c not in first_cols]
     # out = out[first_cols + remaining]
 
-    return pd.DataFrame(out)
+    return out.reset_index(drop=True)
 
 def find_po_grn_invoice_mismatches(po_df: pd.DataFrame, variable1: float = 1000) -> pd.DataFrame:
     df = po_df.copy()
@@ -190,53 +252,155 @@ def find_po_grn_invoice_mismatches(po_df: pd.DataFrame, variable1: float = 1000)
     return out[cols].reset_index(drop=True)
 
 
-def anomalies_by_creator(df):
-    missing_table = find_missing_vendor_fields(df)
+def anomalies_by_creator(df, employees: "EmployeeIndex | None" = None, missing_table=None):
+    """
+    P2P1 exceptions per Creator_ID; with the job's EmployeeIndex, also the creator's Department.
+    `missing_table` is the job's P2P1 result when it already exists.
+    """
+    if missing_table is None:
+        missing_table = find_missing_vendor_fields(df)
     if "Creator_ID" not in missing_table.columns:
         return pd.DataFrame()
-    return (
+    out = (
         missing_table.groupby('Creator_ID')
         .size()
         .reset_index(name='Count')
         .sort_values(by='Count', ascending=False)
         .reset_index(drop=True)
     )
+    if employees is not None:
+        out.insert(1, "Department", employees.department_of(out["Creator_ID"]))
+    return out
+
+# ---------- Duplicate grouping (hash groups instead of pairwise comparison) ----------
+def duplicate_groups(df, keys):
+    """
+    Group id per row (by position) for rows that share every `keys` value with at least one
+    other row, -1 for the rest. Rows with a missing key value are never duplicates, as NaN
+    never equals NaN.
+    """
+    codes = df.groupby(keys, dropna=True, sort=False).ngroup()
+    codes = codes.fillna(-1).to_numpy(dtype=np.int64)
+    sizes = np.bincount(codes[codes >= 0], minlength=1)
+    codes[(codes >= 0) & (sizes[np.maximum(codes, 0)] < 2)] = -1
+    return codes
 
-def merge_missing_with_duplicates(vendor_df, invoice_df):
-    missing_table = find_missing_vendor_fields(vendor_df)
+def duplicate_pairs(groups):
+    """
+    Positions (i, j), i < j, of every pair of rows sharing a group id from duplicate_groups,
+    ordered by i then j. Pairs are generated per group size from index arrays, not by
+    comparing rows.
+    """
+    rows = np.flatnonzero(groups >= 0)
+    order = rows[np.argsort(groups[rows], kind="stable")]
+    g = groups[order]
+    starts = np.flatnonzero(np.r_[True, g[1:] != g[:-1]]) if len(g) else np.array([], dtype=np.int64)
+    sizes = np.diff(np.r_[starts, len(order)])
+    left, right = [np.array([], dtype=np.int64)], [np.array([], dtype=np.int64)]
+    for size in np.unique(sizes):
+        a, b = np.triu_indices(size, 1)
+        first = starts[sizes == size][:, None]
+        left.append(order[first + a].ravel())
+        right.append(order[first + b].ravel())
+    i, j = np.concatenate(left), np.concatenate(right)
+    sort = np.lexsort((j, i))
+    return i[sort], j[sort]
+
+def merge_missing_with_duplicates(vendor_df, invoice_df, as_clusters=False, missing_table=None):
+    """
+    Vendors with KYC exceptions joined to their duplicate invoices (same Vendor_Name,
+    Invoice_Date and Invoice_Amount). By default one row per duplicate pair, with the two
+    invoices' columns suffixed _1 / _2. With as_clusters=True one row per duplicate invoice
+    instead, tagged with Duplicate_Group and Group_Size, so large groups are not expanded
+    pairwise. `missing_table` is the job's P2P1 result when it already exists.
+    """
+    if missing_table is None:
+        missing_table = find_missing_vendor_fields(vendor_df)
     req = ['Vendor_Name','Invoice_Date','Invoice_Amount']
-    for c in req:
-        if c not in invoice_df.columns:
-            invoice_df[c] = np.nan
-    dup_mask = invoice_df[req].duplicated(keep=False)
-    dup_invoices = invoice_df[dup_mask].copy().reset_index(drop=True)
-    dup_pairs, seen = [], set()
-    for i in range(len(dup_invoices)):
-        for j in range(i+1, len(dup_invoices)):
-            if (dup_invoices.loc[i, 'Vendor_Name'] == dup_invoices.loc[j, 'Vendor_Name'] and
-                dup_invoices.loc[i, 'Invoice_Date'] == dup_invoices.loc[j, 'Invoice_Date'] and
-                dup_invoices.loc[i, 'Invoice_Amount'] == dup_invoices.loc[j, 'Invoice_Amount']):
-                key = tuple(sorted([i, j]))
-                if key not in seen:
-                    seen.add(key)
-                    left = dup_invoices.loc[i].to_dict()
-                    right = dup_invoices.loc[j].to_dict()
-                    pair = {}
-                    for k, v in left.items():
-                        pair[f"{k}_1"] = v
-                    for k, v in right.items():
-                        pair[f"{k}_2"] = v
-                    dup_pairs.append(pair)
-    dup_pairs_df = pd.DataFrame(dup_pairs)
-    if not dup_pairs_df.empty:
-        if 'Vendor_Name_1' in dup_pairs_df.columns:
-            dup_pairs_df['Vendor_Name'] = dup_pairs_df['Vendor_Name_1']
-        merged = pd.merge(missing_table, dup_pairs_df, on='Vendor_Name', how='inner')
+    absent = [c for c in req if c not in invoice_df.columns]
+    if absent:
+        invoice_df = invoice_df.assign(**{c: np.nan for c in absent})  # the job's frame is shared
+    groups = duplicate_groups(invoice_df, req)
+    if as_clusters:
+        dup_df = invoice_df[groups >= 0].reset_index(drop=True)
+        g = groups[groups >= 0]
+        dup_df['Duplicate_Group'] = pd.factorize(g)[0] + 1
+        dup_df['Group_Size'] = np.bincount(g)[g]
+        dup_df = dup_df.sort_values('Duplicate_Group', kind='stable').reset_index(drop=True)
+    else:
+        i, j = duplicate_pairs(groups)
+        left = invoice_df.take(i).reset_index(drop=True).add_suffix("_1")
+        right = invoice_df.take(j).reset_index(drop=True).add_suffix("_2")
+        dup_df = pd.concat([left, right], axis=1)
+        if 'Vendor_Name_1' in dup_df.columns:
+            dup_df['Vendor_Name'] = dup_df['Vendor_Name_1']
+    if not dup_df.empty and "Vendor_Name" in missing_table.columns:
+        merged = pd.merge(missing_table, dup_df, on='Vendor_Name', how='inner')
     else:
         merged = pd.DataFrame()
     return merged.reset_index(drop=True)
 
-def summarize_mismatches(mismatch_df: pd.DataFrame, po_df: pd.DataFrame, employee_master: pd.DataFrame):
+# ---------- Employee ID -> Department index (P2P Employee Master) ----------
+UNMAPPED_DEPARTMENT = "Unknown / Not Mapped"
+
+def _id_norm(s: pd.Series) -> pd.Series:
+    """Exact form of an employee / creator ID: text, trimmed."""
+    return _arrow_text(s).str.strip()
+
+def _id_digits(s: pd.Series) -> pd.Series:
+    """Digits-only form without leading zeros ('EMP-0042' -> '42', 'E000' -> '0'); <NA> without digits."""
+    digits = _arrow_text(s).str.replace(r"\D+", "", regex=True)
+    d = digits.str.lstrip("0")
+    return d.mask(d == "", "0").mask(digits == "")
+
+class EmployeeIndex:
+    """
+    Department of an employee / creator ID, built once per job from the P2P Employee Master.
+    IDs resolve on the trimmed text first, then on the digits-only form ('E-007' finds '7').
+    A repeated ID keeps its first non-blank department.
+    """
+
+    def __init__(self, employee_master: pd.DataFrame | None):
+        self.frame = employee_master
+        emp = employee_master if employee_master is not None else pd.DataFrame()
+        id_col = next((c for c in ["Employee_ID", "Employee Id", "EmployeeID", "EmployeeId"] if c in emp.columns), None)
+        dept_col = next((c for c in ["Department", "Dept", "Department Name", "Department_Name"] if c in emp.columns), None)
+        if id_col is None or dept_col is None or emp.empty:
+            self.by_id = self.by_digits = pd.Series(dtype=object)
+            return
+        dept = _arrow_text(emp[dept_col]).str.strip()
+        dept = dept.mask(dept == "").astype(object)
+        known = dept.notna().to_numpy()
+        ids, digits = _id_norm(emp[id_col])[known], _id_digits(emp[id_col])[known]
+        dept = dept[known].to_numpy()
+        self.by_id = self._first(ids, dept)
+        self.by_digits = self._first(digits, dept)
+
+    @staticmethod
+    def _first(keys: pd.Series, values: np.ndarray) -> pd.Series:
+        lookup = pd.Series(values, index=keys.astype(object).to_numpy())
+        lookup = lookup[lookup.index.notna()]
+        return lookup[~lookup.index.duplicated(keep="first")]
+
+    def __len__(self) -> int:
+        return len(self.by_id)
+
+    def departments(self, ids: pd.Series) -> pd.Series:
+        """Department per ID (aligned with ids); NaN where neither form resolves."""
+        out = pd.Series(_id_norm(ids).astype(object).map(self.by_id).to_numpy(), index=ids.index, dtype=object)
+        miss = out.isna().to_numpy()
+        if miss.any() and len(self.by_digits):
+            out[miss] = _id_digits(ids[miss]).astype(object).map(self.by_digits).to_numpy()
+        return out
+
+    def department_of(self, ids: pd.Series, default: str = UNMAPPED_DEPARTMENT) -> pd.Series:
+        return self.departments(ids).fillna(default)
+
+def summarize_mismatches(mismatch_df: pd.DataFrame, po_df: pd.DataFrame, employee_master):
+    """
+    P2P2 item and department summaries. `employee_master` is the job's EmployeeIndex or,
+    as before, the P2P Employee Master frame (indexed on the fly).
+    """
     if mismatch_df is None or mismatch_df.empty:
         return (
             pd.DataFrame(columns=["Item_Code", "Issue_Count"]),
@@ -253,7 +417,7 @@ def summarize_mismatches(mismatch_df: pd.DataFrame, po_df: pd.DataFrame, employe
     else:
         item_summary = pd.DataFrame(columns=["Item_Code", "Issue_Count"])
     if "Creator_ID" in mismatch_df.columns and not mismatch_df["Creator_ID"].isna().all():
-        creators = mismatch_df[["Creator_ID"]].copy()
+        creators = mismatch_df["Creator_ID"]
     else:
         key = "PO_No" if "PO_No" in mismatch_df.columns else ("PO_Number" if "PO_Number" in mismatch_df.columns else None)
         if not key or po_df is None or key not in po_df.columns:
@@ -261,50 +425,17 @@ def summarize_mismatches(mismatch_df: pd.DataFrame, po_df: pd.DataFrame, employe
         creators = (
             mismatch_df[[key]].drop_duplicates()
             .merge(po_df[[key, "Creator_ID"]], on=key, how="left")
-            [["Creator_ID"]]
+            ["Creator_ID"]
         )
     if creators.empty:
         return item_summary, pd.DataFrame(columns=["Department", "Issue_Count"])
-    def norm_str(s: pd.Series) -> pd.Series:
-        return s.astype(str).str.strip()
-    def norm_digits(s: pd.Series) -> pd.Series:
-        d = s.astype(str).str.replace(r"\D+", "", regex=True)
-        return d.str.lstrip("0").replace({"": np.nan})
-    creators = creators.copy()
-    creators["Creator_ID_norm"] = norm_str(creators["Creator_ID"])
-    creators["Creator_ID_digits"] = norm_digits(creators["Creator_ID"])
-    if employee_master is None or employee_master.empty:
+    source = employee_master.frame if isinstance(employee_master, EmployeeIndex) else employee_master
+    if source is None or source.empty:
         return item_summary, pd.DataFrame(columns=["Department", "Issue_Count"])
-    emp = employee_master.copy()
-    emp_id_col = next((c for c in ["Employee_ID", "Employee Id", "EmployeeID", "EmployeeId"] if c in emp.columns), None)
-    if emp_id_col is None:
-        emp_id_col = "Employee_ID"
-        emp[emp_id_col] = np.nan
-    dept_col = next((c for c in ["Department", "Dept", "Department Name", "Department_Name"] if c in emp.columns), None)
-    if dept_col is None:
-        dept_col = "Department"
-        emp[dept_col] = np.nan
-    emp["Employee_ID_norm"] = norm_str(emp[emp_id_col])
-    emp["Employee_ID_digits"] = norm_digits(emp[emp_id_col])
-    emp["Department_norm"] = norm_str(emp[dept_col])
-    mapped = creators.merge(
-        emp[["Employee_ID_norm", "Department_norm"]],
-        left_on="Creator_ID_norm",
-        right_on="Employee_ID_norm",
-        how="left",
-    )
-    still_unmapped = mapped["Department_norm"].isna() | (mapped["Department_norm"] == "")
-    if still_unmapped.any():
-        fallback = creators.loc[still_unmapped, ["Creator_ID_digits"]].merge(
-            emp[["Employee_ID_digits", "Department_norm"]],
-            left_on="Creator_ID_digits",
-            right_on="Employee_ID_digits",
-            how="left",
-        )
-        mapped.loc[still_unmapped, "Department_norm"] = fallback["Department_norm"].values
-    mapped["Department"] = mapped["Department_norm"].replace({"": np.nan}).fillna("Unknown / Not Mapped")
+    employees = employee_master if isinstance(employee_master, EmployeeIndex) else EmployeeIndex(employee_master)
     dept_summary = (
-        mapped.groupby("Department", dropna=False)
+        employees.department_of(creators).rename("Department").to_frame()
+              .groupby("Department", dropna=False)
               .size()
               .reset_index(name="Issue_Count")
               .sort_values("Issue_Count", ascending=False)
@@ -330,15 +461,16 @@ def get_invalid_rows(src, sheet_name="P2P_Sample (Bots 1-20)"):
     for c in ["PO_Date", "Invoice_Date"]:
         if c not in df.columns:
             df[c] = pd.NaT
-    df['PO_Date'] = pd.to_datetime(df['PO_Date'], errors='coerce')
-    df['Invoice_Date'] = pd.to_datetime(df['Invoice_Date'], errors='coerce')
+    df['PO_Date'] = to_date(df['PO_Date'])
+    df['Invoice_Date'] = to_date(df['Invoice_Date'])
     invalid_rows = df[df['PO_Date'] > df['Invoice_Date']].copy()
     first_cols = ["PO_Date", "Invoice_Date", "PO_No"]
     remaining = [c for c in invalid_rows.columns if c not in first_cols + ["_approved_clean", "_created_clean"]]
     invalid_rows = invalid_rows[first_cols + remaining].reset_index(drop=True)
     return invalid_rows
 
-def next_level_analytics(invalid_rows: pd.DataFrame):
+def next_level_analytics(invalid_rows: pd.DataFrame, employees: EmployeeIndex | None = None):
+    """P2P3 issues per item and per PO creator; with the job's EmployeeIndex, also the creator's Department."""
     df = invalid_rows.copy()
     if "Item_Code" not in df.columns:
         df["Item_Code"] = np.nan
@@ -358,40 +490,104 @@ def next_level_analytics(invalid_rows: pd.DataFrame):
           .sort_values(by="Issues Found", ascending=False)
           .reset_index(drop=True)
     )
+    if employees is not None:
+        creator_counts.insert(1, "Department", employees.department_of(creator_counts["PO_Created_By"]))
     return item_counts, creator_counts
 
 def financial_impact(invalid_rows: pd.DataFrame):
     df = invalid_rows.copy()
     if "Invoice_Amount" not in df.columns:
         df["Invoice_Amount"] = 0
-    total = pd.to_numeric(df['Invoice_Amount'], errors='coerce').fillna(0).sum()
+    total = to_number(df['Invoice_Amount']).fillna(0).sum()
     return pd.DataFrame({"Total_Financial_Impact": [total]})
 
 # ---------------- Split Orders (P2P4) ----------------
-def generate_result(df: pd.DataFrame, threshold: float = 10_000) -> pd.DataFrame:
-    d = df.copy()
-    d = d.replace(r'^\s*$', np.nan, regex=True)
-    d['PO_Date'] = pd.to_datetime(d['PO_Date'], errors='coerce')
-    d['Invoice_Amount'] = pd.to_numeric(d['Invoice_Amount'], errors='coerce')
+def _split_order_windows(d: pd.DataFrame, threshold: float, window_days: int) -> pd.DataFrame:
+    """
+    Rolling mode of generate_result: lines of one vendor and item whose PO dates fall within
+    `window_days` calendar days of a window start, with more than one distinct PO and a total
+    over `threshold`. Overlapping qualifying windows form one group. O(n log n): one sort,
+    then searchsorted window ends and prefix sums.
+    """
+    vendor = pd.factorize(d['Vendor_Name'], sort=True)[0]
+    item = pd.factorize(d['Item_Code'], sort=True)[0]
+    po = pd.factorize(d['PO_No'], sort=True)[0]
+    when = d['PO_Date'].to_numpy(dtype="datetime64[ns]")
+    order = np.lexsort((po, when, item, vendor))
+    d = d.iloc[order].reset_index(drop=True)
+    vendor, item, po, when = vendor[order], item[order], po[order], when[order]
+    n = len(d)
+
+    day = when.astype("datetime64[D]").astype(np.int64)
+    seg = np.concatenate(([0], np.cumsum((vendor[1:] != vendor[:-1]) | (item[1:] != item[:-1])))) if n else vendor
+    span = int(day.max() - day.min()) + window_days + 1 if n else 1
+    key = seg.astype(np.int64) * span + (day - (day.min() if n else 0))
+    # Window anchored at each line: lines of its vendor/item dated before day + window_days
+    end = np.searchsorted(key, key + window_days, side="left")
+    amount = d['Invoice_Amount'].fillna(0).to_numpy(dtype=np.float64)
+    csum = np.concatenate(([0.0], np.cumsum(amount)))
+    total = csum[end] - csum[np.arange(n)]
+    # More than one PO in [i, end) iff the run of po[i] ends before the window does
+    change = np.flatnonzero(po[1:] != po[:-1]) + 1
+    run_end = np.append(change, n)[np.searchsorted(change, np.arange(n), side="right")]
+    anchor = np.flatnonzero((run_end < end) & (total > threshold))
+    if not len(anchor):
+        return d.head(0).assign(Group=pd.Series(dtype=object), Group_Total_Invoice=pd.Series(dtype=float),
+                                Window_Start=pd.Series(dtype="datetime64[ns]"), Window_End=pd.Series(dtype="datetime64[ns]"))
+
+    # Merge overlapping windows: a window starts a new group when it begins at or past the
+    # furthest end reached so far
+    reach = np.maximum.accumulate(end[anchor])
+    new = np.concatenate(([True], anchor[1:] >= reach[:-1]))
+    starts = anchor[new]
+    stops = np.maximum.reduceat(end[anchor], np.flatnonzero(new))
+    # Groups are disjoint line ranges [start, stop)
+    depth = np.zeros(n + 1, dtype=np.int64)
+    depth[starts] += 1
+    depth[stops] -= 1
+    lines = np.flatnonzero(np.cumsum(depth[:-1]) > 0)
+    group = np.searchsorted(starts, lines, side="right") - 1
+
+    out = d.iloc[lines].reset_index(drop=True)
+    out.insert(0, 'Group', 'Group_' + pd.Series(group + 1).astype(str))
+    out['Group_Total_Invoice'] = (csum[stops] - csum[starts])[group]
+    out['Window_Start'] = when[starts][group]
+    out['Window_End'] = when[stops - 1][group]
+    return out
+
+def generate_result(df: pd.DataFrame, threshold: float = 10_000, window_days: int = 0) -> pd.DataFrame:
+    """
+    P2P4 split orders: POs of one vendor and item raised together and adding up to more than
+    `threshold`. window_days=0 groups POs sharing the exact PO_Date; N > 0 finds groups within
+    any N-day window.
+    """
+    d = blanks_to_nan(df)
+    d['PO_Date'] = to_date(d['PO_Date'])
+    d['Invoice_Amount'] = to_number(d['Invoice_Amount'])
     req = ['PO_No', 'PO_Date', 'Vendor_Name', 'Item_Code']
     d = d.dropna(subset=req)
-    g = (
-        d.groupby(['Vendor_Name', 'Item_Code', 'PO_Date'], dropna=False)
-         .agg(Distinct_PO_Count=('PO_No', lambda s: s.dropna().nunique()),
-              Group_Total_Invoice=('Invoice_Amount', 'sum'))
-         .reset_index()
-    )
-    g = g[(g['Distinct_PO_Count'] > 1) & (g['Group_Total_Invoice'] > threshold)]
-    out = (
-        d.merge(g[['Vendor_Name','Item_Code','PO_Date','Group_Total_Invoice']],
-                on=['Vendor_Name', 'Item_Code', 'PO_Date'], how='inner')
-         .sort_values(['Vendor_Name', 'Item_Code', 'PO_Date', 'PO_No'])
-         .reset_index(drop=True)
-    )
-    keys = pd.Series(list(zip(out['Vendor_Name'], out['Item_Code'], out['PO_Date'])))
-    group_numbers = pd.factorize(keys, sort=True)[0] + 1
-    out.insert(0, 'Group', pd.Series(group_numbers, index=out.index).map(lambda x: f'Group_{x}'))
     first_cols = ['Group', 'Vendor_Name', 'Item_Code', 'PO_Date', 'PO_No', 'Invoice_Amount', 'Group_Total_Invoice']
+    if window_days and window_days > 0:
+        out = _split_order_windows(d, threshold, int(window_days))
+        first_cols += ['Window_Start', 'Window_End']
+    else:
+        g = (
+            d.groupby(['Vendor_Name', 'Item_Code', 'PO_Date'], dropna=False)
+             .agg(Distinct_PO_Count=('PO_No', 'nunique'),
+                  Group_Total_Invoice=('Invoice_Amount', 'sum'))
+             .reset_index()
+        )
+        g = g[(g['Distinct_PO_Count'] > 1) & (g['Group_Total_Invoice'] > threshold)]
+        out = (
+            d.merge(g[['Vendor_Name','Item_Code','PO_Date','Group_Total_Invoice']],
+                    on=['Vendor_Name', 'Item_Code', 'PO_Date'], how='inner')
+             .sort_values(['Vendor_Name', 'Item_Code', 'PO_Date', 'PO_No'])
+             .reset_index(drop=True)
+        )
+        # Sorted by the group keys: a group number steps up wherever a key changes
+        keys = out[['Vendor_Name', 'Item_Code', 'PO_Date']]
+        group_numbers = keys.ne(keys.shift()).any(axis=1).cumsum()
+        out.insert(0, 'Group', 'Group_' + group_numbers.astype(str))
     remaining = [c for c in out.columns if c not in first_cols]
     out = out[first_cols + remaining]
     return out
@@ -405,7 +601,7 @@ def generate_self_approved_over_threshold(df: pd.DataFrame, variable2: float = 1
             d[col] = d[col].str.replace(r'\s+', ' ', regex=True).str.strip()
         else:
             d[col] = np.nan
-    d["Invoice_Amount"] = pd.to_numeric(d.get("Invoice_Amount", np.nan), errors="coerce")
+    d["Invoice_Amount"] = to_number(d["Invoice_Amount"]) if "Invoice_Amount" in d.columns else np.nan
     d = d.dropna(subset=["PO_Approved_By", "PO_Created_By"])
     d["_approved_clean"] = d["PO_Approved_By"].astype(str).str.lower().str.strip()
     d["_created_clean"]  = d["PO_Created_By"].astype(str).str.lower().str.strip()
@@ -423,153 +619,422 @@ def generate_self_approved_over_threshold(df: pd.DataFrame, variable2: float = 1
     return out
 
 # ---------------- Duplicate Vendors (P2P5) ----------------
+# ---------- Duplicate vendors (P2P5): clusters over PAN / GST / Name / Bank ----------
+# Match reasons as bitflags, e.g. Match_Flags 9 = PAN Match + Bank Account Match
+DUPLICATE_VENDOR_KEYS = {
+    "PAN_No": (1, "PAN Match"),
+    "GST_No": (2, "GST Match"),
+    "Vendor_Name": (4, "Vendor Name Match"),
+    "Bank_Account": (8, "Bank Account Match"),
+}
+CLUSTER_SEP = " | "   # joins the distinct key values of a cluster's rows
+# Fuzzy mode (name_threshold > 0): names that differ but are similar once normalised
+SIMILAR_NAME = "Similar_Vendor_Name"
+SIMILAR_NAME_MATCH = (16, "Similar Vendor Name Match")
+
+def _match_bit(key) -> int:
+    return DUPLICATE_VENDOR_KEYS.get(key, SIMILAR_NAME_MATCH)[0]
+
+def match_reasons(flags: int) -> str:
+    labels = [label for bit, label in [*DUPLICATE_VENDOR_KEYS.values(), SIMILAR_NAME_MATCH] if flags & bit]
+    return ", ".join(sorted(labels))
+
+def _blank_to_na(obj):
+    return obj.replace(r'^\s*$', pd.NA, regex=True)
+
+def _vendor_key_frame(df):
+    """The key columns present in df, by position, with blank text as missing."""
+    keys = {}
+    for col in DUPLICATE_VENDOR_KEYS:
+        if col in df.columns:
+            s = df[col].reset_index(drop=True)
+            blank = (_arrow_text(s).str.strip() == "").to_numpy(dtype=bool, na_value=False)
+            keys[col] = s.mask(blank) if blank.any() else s
+    return pd.DataFrame(keys, index=pd.RangeIndex(len(df)))
+
+def _vendor_key_groups(keys):
+    """Per key column: duplicate_groups codes by position."""
+    return {col: duplicate_groups(keys[[col]], [col]) for col in keys.columns}
+
+def _components(n, u, v):
+    """
+    Component label (smallest member) per node 0..n-1 of the graph with edges (u, v):
+    labels are lowered across edges, with pointer jumping, until stable (union-find).
+    """
+    labels = np.arange(n)
+    if not len(u):
+        return labels
+    while True:
+        low = np.minimum(labels[u], labels[v])
+        new = labels.copy()
+        np.minimum.at(new, u, low)
+        np.minimum.at(new, v, low)
+        while True:
+            jumped = new[new]
+            if np.array_equal(jumped, new):
+                break
+            new = jumped
+        if np.array_equal(new, labels):
+            return labels
+        labels = new
+
+def _connected_components(n, codes_list):
+    """
+    Component label per row, where rows sharing a group in any of `codes_list` are
+    connected. Each group contributes a star of edges to its first row.
+    """
+    us, vs = [np.array([], dtype=np.int64)], [np.array([], dtype=np.int64)]
+    for codes in codes_list:
+        rows = np.flatnonzero(codes >= 0)
+        if len(rows):
+            first = np.full(codes.max() + 1, n, dtype=np.int64)
+            np.minimum.at(first, codes[rows], rows)
+            us.append(first[codes[rows]])
+            vs.append(rows)
+    return _components(n, np.concatenate(us), np.concatenate(vs))
+
+# ---------- Similar vendor names: normalisation + MinHash-LSH blocking ----------
+# Names are compared as sets of character 3-grams (Jaccard similarity). MinHash signatures
+# are split into LSH bands; only names sharing a band bucket are scored, so the work grows
+# with the number of names rather than with its square.
+NAME_NOISE_WORDS = ("private", "pvt", "limited", "ltd", "llp", "llc", "inc", "incorporated",
+                    "corporation", "corp", "company", "co", "plc", "and", "the")
+NAME_SHINGLE = 3
+MINHASH_SIZE = 64
+LSH_MAX_BUCKET = 100   # larger buckets are generic names ("traders"); they are not expanded
+_PRIME = np.uint64(2**31 - 1)
+
+def normalize_vendor_name(s: pd.Series) -> pd.Series:
+    """'M/s A.B.C. Private Limited' -> 'abc': lower case, no M/s, punctuation or legal suffixes."""
+    t = _arrow_text(s).str.lower().str.strip()
+    t = t.str.replace(r"^m\s*/\s*s\b\.?", " ", regex=True)
+    t = t.str.replace(r"[.'’]", "", regex=True)
+    t = t.str.replace(r"[[:punct:]]+", " ", regex=True)
+    t = t.str.replace(r"\b(" + "|".join(NAME_NOISE_WORDS) + r")\b", " ", regex=True)
+    t = t.str.replace(r"\s+", " ", regex=True).str.strip()
+    return t.mask(t == "")
+
+def _name_shingles(names):
+    """Hashed character NAME_SHINGLE-grams of each name, concatenated, with per-name offsets."""
+    grams = []
+    counts = np.empty(len(names), dtype=np.int64)
+    for i, name in enumerate(names):
+        padded = f" {name} "
+        g = {padded[k:k + NAME_SHINGLE] for k in range(max(len(padded) - NAME_SHINGLE + 1, 1))}
+        grams.extend(g)
+        counts[i] = len(g)
+    h = pd.util.hash_array(np.array(grams, dtype=object)) & np.uint64(0xFFFFFFFF)
+    return h, np.r_[0, np.cumsum(counts)[:-1]].astype(np.int64), counts
+
+def minhash_signatures(names, size: int = MINHASH_SIZE, seed: int = 0, shingles=None) -> np.ndarray:
+    """(len(names), size) MinHash signatures of the names' character NAME_SHINGLE-grams."""
+    h, starts, _ = shingles if shingles is not None else _name_shingles(names)
+    rng = np.random.default_rng(seed)
+    a = rng.integers(1, int(_PRIME), size, dtype=np.uint64)
+    b = rng.integers(0, int(_PRIME), size, dtype=np.uint64)
+    sig = np.empty((len(names), size), dtype=np.uint64)
+    for k in range(size):
+        sig[:, k] = np.minimum.reduceat((a[k] * h + b[k]) % _PRIME, starts) if len(h) else 0
+    return sig
+
+def lsh_bands(threshold: float, size: int = MINHASH_SIZE):
+    """
+    (bands, rows per band) whose LSH S-curve rises well below `threshold`, so pairs at the
+    threshold almost always become candidates (recall); exact scoring restores precision.
+    """
+    target = max(threshold - 0.15, 0.05)
+    options = [(size // r, r) for r in range(1, size + 1)]
+    return min(options, key=lambda br: abs((1 / br[0]) ** (1 / br[1]) - target))
+
+def similar_name_pairs(names, threshold: float, size: int = MINHASH_SIZE):
+    """
+    Index pairs (i, j), i < j, of `names` whose character 3-gram Jaccard similarity is at
+    least `threshold`. Only pairs sharing a MinHash-LSH bucket are scored (exactly); raise
+    the threshold for precision, lower it for recall. Typos in short names typically score
+    0.6-0.8, reordered or abbreviated names lower.
+    """
+    n = len(names)
+    if n < 2:
+        return np.array([], dtype=np.int64), np.array([], dtype=np.int64)
+    shingles = _name_shingles(names)
+    sig = minhash_signatures(names, size, shingles=shingles)
+    bands, rows = lsh_bands(threshold, size)
+    cand = [np.array([], dtype=np.int64)]
+    for band in range(bands):
+        block = sig[:, band * rows:(band + 1) * rows]
+        key = block[:, 0].copy()
+        for c in range(1, rows):
+            key = key * np.uint64(1_000_003) ^ block[:, c]
+        codes = pd.factorize(key)[0]
+        sizes = np.bincount(codes)
+        codes[(sizes[codes] < 2) | (sizes[codes] > LSH_MAX_BUCKET)] = -1
+        i, j = duplicate_pairs(codes)
+        cand.append(i * n + j)
+    pid = np.unique(np.concatenate(cand))
+    i, j = pid // n, pid % n
+    # Cheap vectorised pre-filter on the signature estimate (about +-0.06 at 64 hashes),
+    # then exact Jaccard on what is left
+    close = np.zeros(len(pid), dtype=bool)
+    for lo in range(0, len(pid), 100_000):
+        sl = slice(lo, lo + 100_000)
+        close[sl] = (sig[i[sl]] == sig[j[sl]]).mean(axis=1) >= threshold - 0.15
+    i, j = i[close], j[close]
+    h, starts, counts = shingles
+    sets = {k: frozenset(h[starts[k]:starts[k] + counts[k]].tolist()) for k in np.union1d(i, j).tolist()}
+    sim = np.array([len(sets[a] & sets[b]) / len(sets[a] | sets[b]) for a, b in zip(i.tolist(), j.tolist())])
+    keep = sim >= threshold if len(sim) else np.zeros(0, dtype=bool)
+    return i[keep], j[keep]
+
+def similar_name_groups(names: pd.Series, threshold: float) -> np.ndarray:
+    """
+    duplicate_groups-style codes by position: rows whose normalised names are equal or
+    similar (transitively) share a code, provided the group holds at least two different
+    names as written. Other rows get -1.
+    """
+    norm = normalize_vendor_name(names.reset_index(drop=True))
+    name_id, uniques = pd.factorize(norm)
+    i, j = similar_name_pairs(list(uniques), threshold)
+    label = _components(len(uniques), i, j)
+    codes = np.where(name_id >= 0, label[np.maximum(name_id, 0)], -1)
+    raw = pd.factorize(_arrow_text(names.reset_index(drop=True)).str.strip())[0]
+    spread = pd.DataFrame({"g": codes, "raw": raw})[(codes >= 0) & (raw >= 0)].drop_duplicates()
+    multi = spread["g"].value_counts()
+    ok = np.isin(codes, multi.index[multi >= 2].to_numpy())
+    codes = np.where(ok, codes, -1)
+    codes[ok] = pd.factorize(codes[ok])[0]
+    return codes
+
+def _pair_counts(codes, n, labels=None):
+    """
+    Exact number of distinct row pairs sharing at least one key, by inclusion-exclusion
+    over key combinations (group sizes only, no pairs built). With `labels`, also the
+    count per component label.
+    """
+    total = 0
+    per_label = np.zeros(n, dtype=np.int64) if labels is not None else None
+    for k in range(1, len(codes) + 1):
+        sign = 1 if k % 2 else -1
+        for subset in combinations(list(codes), k):
+            rows = np.flatnonzero(np.logical_and.reduce([codes[c] >= 0 for c in subset]))
+            if len(rows) < 2:
+                continue
+            g = codes[subset[0]][rows]
+            for c in subset[1:]:
+                g = pd.factorize(g * (codes[c].max() + 1) + codes[c][rows])[0]
+            g = pd.factorize(g)[0]
+            sizes = np.bincount(g)
+            pairs = sizes * (sizes - 1) // 2
+            total += sign * int(pairs.sum())
+            if per_label is not None:
+                hit = pairs > 0
+                np.add.at(per_label, labels[rows[np.unique(g, return_index=True)[1]][hit]], sign * pairs[hit])
+    return total, per_label
+
+def _vendor_codes(keys, name_threshold=0):
+    codes = _vendor_key_groups(keys)
+    if name_threshold and "Vendor_Name" in keys.columns:
+        codes[SIMILAR_NAME] = similar_name_groups(keys["Vendor_Name"], name_threshold)
+    return codes
+
+def estimate_duplicate_vendor_pairs(df, name_threshold=0) -> int:
+    """How many rows the pairwise P2P5 layout (duplicate_vendor_pairs) would have; cheap to run first."""
+    return _pair_counts(_vendor_codes(_vendor_key_frame(df), name_threshold), len(df))[0]
+
+def _vendor_clusters(df, name_threshold=0):
+    """(key frame, key codes, component labels, cluster id per row by position with 0 = not a duplicate)."""
+    keys = _vendor_key_frame(df)
+    codes = _vendor_codes(keys, name_threshold)
+    labels = _connected_components(len(df), codes.values())
+    member = np.logical_or.reduce([c >= 0 for c in codes.values()]) if codes else np.zeros(len(df), dtype=bool)
+    cluster = np.zeros(len(df), dtype=np.int64)
+    cluster[member] = np.unique(labels[member], return_inverse=True)[1] + 1
+    return keys, codes, labels, cluster
+
+def _join_runs(ids, values, sep):
+    """sep-joined values per run of equal (sorted) ids."""
+    if not len(ids):
+        return []
+    values = values.tolist()
+    bounds = np.r_[np.flatnonzero(np.r_[True, ids[1:] != ids[:-1]]), len(ids)].tolist()
+    return [sep.join(values[a:b]) for a, b in zip(bounds[:-1], bounds[1:])]
+
+CLUSTER_COLUMNS = ["Cluster_ID", "Cluster_Size", "Pair_Count", "Match_Flags", "Exception_Noted", "Row_Nos",
+                   "Vendor_Name", "PAN_No", "GST_No", "Bank_Account"]
+
+def find_duplicate_vendor_clusters(df: pd.DataFrame, name_threshold: float = 0) -> pd.DataFrame:
+    """
+    P2P5 on a frame with canonical columns: vendor rows linked by an equal PAN, GST, name or
+    bank account (directly or through other rows) form one cluster. One row per cluster:
+    size, number of matching row pairs inside it, Match_Flags (bits of DUPLICATE_VENDOR_KEYS)
+    with their labels, 1-based row numbers, and the distinct key values joined by CLUSTER_SEP.
+    Row pairs are only built on request, see duplicate_vendor_pairs.
+    With name_threshold > 0, names whose normalised forms are at least that similar also
+    link rows (SIMILAR_NAME_MATCH); the threshold is kept in the result's attrs.
+    """
+    keys, codes, labels, cluster = _vendor_clusters(df, name_threshold)
+    member = np.flatnonzero(cluster > 0)
+    if not len(member):
+        out = pd.DataFrame(columns=CLUSTER_COLUMNS)
+        out.attrs["name_threshold"] = name_threshold
+        return out
+    member = member[np.argsort(cluster[member], kind="stable")]
+    ids = cluster[member]
+    first = member[np.r_[True, ids[1:] != ids[:-1]]]
+
+    out = pd.DataFrame({"Cluster_ID": cluster[first]})
+    out["Cluster_Size"] = np.bincount(ids)[1:]
+    out["Pair_Count"] = _pair_counts(codes, len(df), labels)[1][labels[first]]
+    match_flags = np.zeros(len(out), dtype=np.int64)
+    for col, c in codes.items():
+        match_flags[np.unique(cluster[c >= 0]) - 1] |= _match_bit(col)
+    out["Match_Flags"] = match_flags
+    reasons = {f: match_reasons(f) for f in np.unique(match_flags)}
+    out["Exception_Noted"] = [reasons[f] for f in match_flags]
+    out["Row_Nos"] = _join_runs(ids, (member + 1).astype(str), ", ")
+    for col in ["Vendor_Name", "PAN_No", "GST_No", "Bank_Account"]:
+        if col in keys.columns:
+            vals = pd.DataFrame({"id": ids, col: keys[col].to_numpy()[member]}).dropna()
+            vals = vals.assign(**{col: vals[col].astype(str)}).drop_duplicates()
+            joined = pd.Series(_join_runs(vals["id"].to_numpy(), vals[col], CLUSTER_SEP),
+                               index=vals["id"].unique(), dtype=object)
+            out[col] = joined.reindex(out["Cluster_ID"]).to_numpy()
+    out.attrs["name_threshold"] = name_threshold
+    return out
+
+def _pairs_for(df, positions, codes):
+    """Matching pairs among `positions` (whole clusters), legacy P2P5 pair layout."""
+    n = len(df)
+    pids, bits = [np.array([], dtype=np.int64)], [np.array([], dtype=np.int64)]
+    for col, c in codes.items():
+        i, j = duplicate_pairs(c[positions])
+        pids.append(positions[i] * n + positions[j])
+        bits.append(np.full(len(i), _match_bit(col), dtype=np.int64))
+    pid, bit = np.concatenate(pids), np.concatenate(bits)
+    order = np.argsort(pid, kind="stable")
+    pid, bit = pid[order], bit[order]
+    starts = np.flatnonzero(np.r_[True, pid[1:] != pid[:-1]]) if len(pid) else np.array([], dtype=np.int64)
+    pid, flag = pid[starts], np.bitwise_or.reduceat(bit, starts) if len(starts) else bit
+    a, b = pid // n, pid % n
+    # Identical names are not reported as "similar" too
+    same_name = (flag & _match_bit("Vendor_Name")) > 0
+    flag[same_name] &= ~_match_bit(SIMILAR_NAME)
+
+    rows = df.reset_index(drop=True)
+    reasons = {f: match_reasons(f) for f in np.unique(flag)}
+    head = pd.DataFrame({"Row_A": a + 1, "Row_B": b + 1, "Exception_Noted": [reasons[f] for f in flag]})
+    left = _blank_to_na(rows.take(a)).reset_index(drop=True).add_prefix("A_")
+    right = _blank_to_na(rows.take(b)).reset_index(drop=True).add_prefix("B_")
+    return pd.concat([head, left, right], axis=1)
+
+def iter_duplicate_vendor_pairs(df: pd.DataFrame, cluster_ids=None, name_threshold: float = 0):
+    """Yield (Cluster_ID, pair frame) one cluster at a time, so only one cluster's pairs are in memory."""
+    _, codes, _, cluster = _vendor_clusters(df, name_threshold)
+    order = np.argsort(cluster, kind="stable")
+    ids, starts = np.unique(cluster[order], return_index=True)
+    ends = np.r_[starts[1:], len(order)]
+    wanted = None if cluster_ids is None else set(int(c) for c in cluster_ids)
+    for cid, lo, hi in zip(ids, starts, ends):
+        if cid == 0 or (wanted is not None and cid not in wanted):
+            continue
+        yield int(cid), _pairs_for(df, order[lo:hi], codes)
+
+def duplicate_vendor_pairs(df: pd.DataFrame, cluster_ids=None, name_threshold: float = 0) -> pd.DataFrame:
+    """
+    The pairwise P2P5 layout (Row_A, Row_B, Exception_Noted, A_*, B_*), for all clusters or
+    only `cluster_ids` (use the name_threshold the clusters were found with). Check
+    estimate_duplicate_vendor_pairs / Pair_Count first: a value shared by many rows expands
+    quadratically.
+    """
+    _, codes, _, cluster = _vendor_clusters(df, name_threshold)
+    keep = cluster > 0
+    if cluster_ids is not None:
+        keep &= np.isin(cluster, list(cluster_ids))
+    return _pairs_for(df, np.flatnonzero(keep), codes)
+
 def find_matching_rows(file_path: str, sheet_name: str = ""):
     df = pd.read_excel(file_path, sheet_name=sheet_name, dtype=str)
-    df = df.replace(r'^\s*$', pd.NA, regex=True)
-    df = df.reset_index(drop=True)
-    df.insert(0, "RowNo", df.index + 1)
-
-    keys = {
-        "PAN_No": "PAN Match",
-        "GST_No": "GST Match",
-        "Vendor_Name": "Vendor Name Match",
-        "Bank_Account": "Bank Account Match",
-    }
-
-    pairs = {}
-    for col, label in keys.items():
-        if col in df.columns:
-            tmp = df.dropna(subset=[col])
-            groups = tmp.groupby(col, dropna=True)["RowNo"].apply(list)
-            for rows in groups:
-                if len(rows) >= 2:
-                    for a, b in combinations(sorted(rows), 2):
-                        pairs.setdefault((a, b), set()).add(label)
-
-    rows_info = df.set_index("RowNo")
-    records = []
-    for (a, b), labels in sorted(pairs.items()):
-        records.append({
-            "Row_A": a,
-            "Row_B": b,
-            "Exception_Noted": ", ".join(sorted(labels))
-        })
-    matches_df = pd.DataFrame(records)
-
-    detailed_rows = []
-    for rec in records:
-        a, b = rec["Row_A"], rec["Row_B"]
-        note = rec["Exception_Noted"]
-        row_a = rows_info.loc[a].to_dict()
-        row_b = rows_info.loc[b].to_dict()
-        flat = {f"A_{k}": v for k, v in row_a.items()}
-        flat.update({f"B_{k}": v for k, v in row_b.items()})
-        flat.update({"Row_A": a, "Row_B": b, "Exception_Noted": note})
-        detailed_rows.append(flat)
-    detailed_df = pd.DataFrame(detailed_rows)
-
-    return detailed_df
+    return find_duplicate_vendor_clusters(df)
+
+def _duplicate_vendor_names(matches_df: pd.DataFrame) -> pd.Series:
+    """Distinct vendor names in a P2P5 result: cluster rows (CLUSTER_SEP-joined) or A_/B_ pairs."""
+    cols = [c for c in matches_df.columns if c.endswith("Vendor_Name")]
+    if not cols:
+        return pd.Series(dtype=str)
+    names = pd.concat([matches_df[c].dropna().astype(str) for c in cols], ignore_index=True)
+    if "Cluster_ID" in matches_df.columns:
+        names = names.str.split(CLUSTER_SEP, regex=False).explode()
+    return names.str.strip().replace({"": np.nan, "nan": np.nan}).dropna().drop_duplicates()
+
+# ---------- Vendor threshold alerts (P2P5 follow-up) ----------
+def vendor_spend_cube(source, sheet_name: str = "P2P_Sample (Bots 1-20)") -> spend_cube.SpendCube:
+    """
+    Spend cube of the P2P sample. `source` is the prepared P2P frame (canonical, typed
+    columns) or, as before, a workbook path / file-like whose `sheet_name` is read as text.
+    """
+    if isinstance(source, pd.DataFrame):
+        base = source
+    else:
+        base = pd.read_excel(source, sheet_name=sheet_name, dtype=str).replace(r'^\s*$', np.nan, regex=True)
+    if "Vendor_Name" not in base.columns:
+        raise ValueError("Vendor_Name column not found in the source sheet.")
+    return spend_cube.build(base)
+
+def fiscal_year_key(dates: pd.Series) -> pd.Series:
+    """Indian fiscal year label per date, April-March: 2025-05-01 -> '2025-2026'."""
+    start = dates.dt.year - (dates.dt.month < 4)
+    return start.astype(str) + "-" + (start + 1).astype(str)
+
+def day_key(dates: pd.Series) -> pd.Series:
+    """Unpadded 'Y-M-D' label per date: 2025-01-05 -> '2025-1-5'."""
+    return dates.dt.year.astype(str) + "-" + dates.dt.month.astype(str) + "-" + dates.dt.day.astype(str)
+
+def _threshold_alerts(matches_df, source, sheet_name, cube, period, note, threshold):
+    """Duplicate-vendor (vendor, period) totals over `threshold` from the cube, and the invoices behind them."""
+    if cube is None:
+        cube = vendor_spend_cube(source, sheet_name)
+    summary, rows = cube.alerts(period, threshold, vendors=_duplicate_vendor_names(matches_df))
+    label = "FY" if period == "FY" else "Day"
+    alert_summary_df = summary.rename(columns={period: label})[["Vendor_Name", label, "Total_Invoice_Amount"]]
+    alert_summary_df[note] = "Alert"
+    if alert_summary_df.empty:
+        return alert_summary_df, pd.DataFrame()
+    alert_detail_df = cube.frame.iloc[rows].reset_index(drop=True)
+    alert_detail_df["Vendor_Name"] = alert_detail_df["Vendor_Name"].astype(str).str.strip()
+    alert_detail_df["Invoice_Date"] = to_date(alert_detail_df["Invoice_Date"])
+    alert_detail_df["Invoice_Amount"] = to_number(alert_detail_df["Invoice_Amount"])
+    alert_detail_df[label] = (fiscal_year_key if period == "FY" else day_key)(alert_detail_df["Invoice_Date"])
+    return alert_summary_df, alert_detail_df
 
 def vendor_year_threshold_alerts(
     matches_detailed_df: pd.DataFrame,
-    file_path,
+    file_path=None,
     sheet_name: str = "P2P_Sample (Bots 1-20)",
     variable3: float = 50_000,
+    cube: spend_cube.SpendCube | None = None,
 ):
-    def fiscal_year(dt):
-        y = dt.year
-        return f"{y}-{y+1}" if dt.month >= 4 else f"{y-1}-{y}"
-
-    vendor_cols = [c for c in matches_detailed_df.columns if c.endswith("Vendor_Name")]
-    vendors = pd.Series(dtype=str)
-    for c in vendor_cols:
-        v = matches_detailed_df[c].astype(str).str.strip()
-        v = v.replace({"": np.nan, "nan": np.nan}).dropna()
-        vendors = pd.concat([vendors, v], ignore_index=True)
-    vendors = vendors.dropna().drop_duplicates()
-
-    base = pd.read_excel(file_path, sheet_name=sheet_name, dtype=str)
-    base = base.replace(r'^\s*$', np.nan, regex=True)
-    if "Vendor_Name" not in base.columns:
-        raise ValueError("Vendor_Name column not found in the source sheet.")
-    base["Vendor_Name"] = base["Vendor_Name"].astype(str).str.strip()
-    base = base[base["Vendor_Name"].isin(set(vendors))]
-    if base.empty:
-        return pd.DataFrame(columns=["Vendor_Name","FY","Total_Invoice_Amount","Exception_Noted"]), pd.DataFrame()
-
-    base["Invoice_Date"] = pd.to_datetime(base.get("Invoice_Date", pd.NaT), errors="coerce")
-    base["Invoice_Amount"] = pd.to_numeric(base.get("Invoice_Amount", np.nan), errors="coerce")
-    base = base.dropna(subset=["Invoice_Date","Invoice_Amount"])
-    base["FY"] = base["Invoice_Date"].apply(fiscal_year)
-
-    grp = (
-        base.groupby(["Vendor_Name","FY"], dropna=False, as_index=False)["Invoice_Amount"]
-        .sum()
-        .rename(columns={"Invoice_Amount":"Total_Invoice_Amount"})
-    )
-    grp["Exception_Noted(per Year)"] = np.where(grp["Total_Invoice_Amount"] > variable3, "Alert", "OK")
-
-    alert_summary_df = grp[grp["Exception_Noted(per Year)"] == "Alert"].reset_index(drop=True)
-    if alert_summary_df.empty:
-        return alert_summary_df, pd.DataFrame()
-
-    alert_keys = set(map(tuple, alert_summary_df[["Vendor_Name","FY"]].itertuples(index=False, name=None)))
-    alert_detail_df = base[base[["Vendor_Name","FY"]].apply(tuple, axis=1).isin(alert_keys)].reset_index(drop=True)
-
-    return alert_summary_df, alert_detail_df
+    """`file_path`: the prepared P2P frame or a workbook; unused when the job's spend `cube` is given."""
+    return _threshold_alerts(matches_detailed_df, file_path, sheet_name, cube,
+                             "FY", "Exception_Noted(per Year)", variable3)
 
 def vendor_daily_threshold_alerts(
     matches_result_df: pd.DataFrame,
-    file_path,
+    file_path=None,
     sheet_name: str = "P2P_Sample (Bots 1-20)",
     variable4: float = 10_000,
+    cube: spend_cube.SpendCube | None = None,
 ):
-    vendor_cols = [c for c in matches_result_df.columns if c.endswith("Vendor_Name")] or \
-                  (["Vendor_Name"] if "Vendor_Name" in matches_result_df.columns else [])
-    if not vendor_cols:
-        return pd.DataFrame(columns=["Vendor_Name","Day","Total_Invoice_Amount","Exception_Noted(per Day)"]), pd.DataFrame()
-    vendors = pd.concat(
-        [matches_result_df[c].astype(str).str.strip() for c in vendor_cols],
-        ignore_index=True
-    ).replace({"": np.nan, "nan": np.nan}).dropna().drop_duplicates()
-
-    base = pd.read_excel(file_path, sheet_name=sheet_name, dtype=str).replace(r'^\s*$', np.nan, regex=True)
-    if "Vendor_Name" not in base.columns:
-        raise ValueError("Vendor_Name column not found in the source sheet.")
-    base["Vendor_Name"] = base["Vendor_Name"].astype(str).str.strip()
-    base = base[base["Vendor_Name"].isin(set(vendors))].copy()
-    if base.empty:
-        return pd.DataFrame(columns=["Vendor_Name","Day","Total_Invoice_Amount","Exception_Noted(per Day)"]), pd.DataFrame()
-
-    base["Invoice_Date"] = pd.to_datetime(base.get("Invoice_Date", pd.NaT), errors="coerce")
-    amt = base.get("Invoice_Amount", np.nan)
-    amt = pd.to_numeric(amt.astype(str).str.replace(",", "", regex=False), errors="coerce")
-    base["Invoice_Amount"] = amt
-    base = base.dropna(subset=["Invoice_Date", "Invoice_Amount"])
-    base["Day"] = base["Invoice_Date"].apply(lambda d: f"{d.year}-{d.month}-{d.day}")
-
-    grp = (
-        base.groupby(["Vendor_Name", "Day"], as_index=False, dropna=False)["Invoice_Amount"]
-            .sum()
-            .rename(columns={"Invoice_Amount": "Total_Invoice_Amount"})
-    )
-    grp["Exception_Noted(per Day)"] = np.where(grp["Total_Invoice_Amount"] > variable4, "Alert", "OK")
-
-    alert_summary_df = grp[grp["Exception_Noted(per Day)"] == "Alert"].reset_index(drop=True)
-    if alert_summary_df.empty:
-        return alert_summary_df, pd.DataFrame()
-
-    keyset = set(map(tuple, alert_summary_df[["Vendor_Name", "Day"]].itertuples(index=False, name=None)))
-    alert_detail_df = base[base[["Vendor_Name", "Day"]].apply(tuple, axis=1).isin(keyset)].reset_index(drop=True)
-    alert_detail_df["Exception_Noted(per Day)"] = "Alert"
-
+    """`file_path`: the prepared P2P frame or a workbook; unused when the job's spend `cube` is given."""
+    alert_summary_df, alert_detail_df = _threshold_alerts(matches_result_df, file_path, sheet_name, cube,
+                                                          "day", "Exception_Noted(per Day)", variable4)
+    if not alert_detail_df.empty:
+        alert_detail_df["Exception_Noted(per Day)"] = "Alert"
     return alert_summary_df, alert_detail_df
 
 
 # ---------------- O2C logic (unchanged) ----------------
 def check_overdue_delivery(df, variable5=5):
-    df["SO_Date"] = pd.to_datetime(df["SO_Date"], errors="coerce")
-    df["Delivery_Date"] = pd.to_datetime(df["Delivery_Date"], errors="coerce")
+    df["SO_Date"] = to_date(df["SO_Date"])
+    df["Delivery_Date"] = to_date(df["Delivery_Date"])
     df["DateDiff"] = (df["Delivery_Date"] - df["SO_Date"]).dt.days
     overdue = df[df["DateDiff"] > variable5].copy()
     overdue["Exception_Noted (5_Days)"] = "Overdue Delivery"
@@ -589,12 +1054,12 @@ def check_dispatch_without_invoice(df):
 def get_missing_customer_data(df, check_cols=['GST_No', 'PAN_No', 'Credit_Limit']):
     result_df = df.copy()
     result_df[check_cols] = result_df[check_cols].replace('', np.nan)
-    def find_missing(row):
-        missing = [col for col in check_cols if pd.isna(row[col])]
-        if missing:
-            return " + ".join(missing) + " Missing"
-        return ""
-    result_df['Exception_Noted'] = result_df.apply(find_missing, axis=1)
+    missing = kyc_exceptions(result_df, {col: None for col in check_cols}, strip=False).eq("Missing")
+    # "GST_No + Credit_Limit Missing" etc., built one column at a time
+    names = pd.Series("", index=result_df.index, dtype=object)
+    for col in check_cols:
+        names = names.where(~missing[col], names.where(names.eq(""), names + " + ") + col)
+    result_df['Exception_Noted'] = (names + " Missing").where(names.ne(""), "")
     result_df = result_df[result_df['Exception_Noted'] != ""]
     first_cols = ['Exception_Noted', 'PAN_No', 'GST_No', 'Credit_Limit']
     remaining = [c for c in result_df.columns if c not in first_cols]
@@ -624,6 +1089,9 @@ def find_ghost_employees(master_file, attendance_file):
     if "Present_Days" in attendance_df.columns:
         attendance_df["Present_Days"] = pd.to_numeric(attendance_df["Present_Days"], errors="coerce").fillna(0)
 
+    if "Present_Days" not in attendance_df.columns and any(re.fullmatch(ATTENDANCE_DAY_COLUMN, str(c)) for c in attendance_df.columns):
+        attendance_df["Present_Days"] = AttendanceRegister(attendance_df).row_present_days()
+
     valid_ids = set(master_df.get("Employee_ID", pd.Series(dtype=str)))
 
     ghost_df = attendance_df[
@@ -637,6 +1105,159 @@ def find_ghost_employees(master_file, attendance_file):
     ghost_df = ghost_df[first_cols + remaining] if first_cols else ghost_df
     return ghost_df.reset_index(drop=True)
 
+ATTENDANCE_DAY_COLUMN = r"D(?:[1-9]|[12]\d|3[01])"
+
+def _parse_month(mval, yval=None):
+    """First day of a register month label ('Jan-2024', 'January', '2024-01-15', ...); NaT if unreadable."""
+    mval = str(mval).strip()
+    if yval is not None:
+        return pd.to_datetime(f"1 {mval} {str(yval).strip()}", errors="coerce")
+    ts = pd.to_datetime(mval, errors="coerce")
+    if pd.isna(ts):
+        return pd.to_datetime("1 " + mval, errors="coerce")
+    return pd.Timestamp(ts.year, ts.month, 1)
+
+def attendance_months(att: pd.DataFrame, month_col: str = "Month", year_col: str | None = None) -> np.ndarray:
+    """
+    Register month of every row (datetime64[M], NaT if unreadable). Blank Month cells carry
+    the month above them, so a register that names its month once still reads as one month.
+    """
+    if month_col not in att.columns:
+        return np.full(len(att), np.datetime64("NaT"), dtype="datetime64[M]")
+    cols = [month_col] + ([year_col] if year_col and year_col in att.columns else [])
+    labels = att[cols].astype(object).where(att[cols].notna(), np.nan).ffill().bfill()
+    # Few distinct labels per register: parse each once
+    uniq = labels.drop_duplicates()
+    parsed = [_parse_month(*row) for row in uniq.itertuples(index=False)]
+    lookup = pd.Series(pd.to_datetime(pd.Series(parsed, dtype=object)).to_numpy(), index=pd.MultiIndex.from_frame(uniq))
+    return lookup.reindex(pd.MultiIndex.from_frame(labels)).to_numpy().astype("datetime64[M]")
+
+def _id_text(s: pd.Series) -> pd.Series:
+    """IDs/names as text the way a workbook cell reads back: 101.0 -> '101'; blanks stay NaN."""
+    if pd.api.types.is_float_dtype(s) and (s.dropna() % 1 == 0).all():
+        s = s.astype("Int64")
+    return s.astype(str).where(s.notna().to_numpy(), np.nan)
+
+def _present_flags(cells: np.ndarray) -> np.ndarray:
+    """uint8 of the same shape: 1 unless the cell reads 'A'. Distinct statuses are normalised once, not per cell."""
+    codes, uniques = pd.factorize(cells.ravel(order="C"))
+    present = ~pd.Series(uniques, dtype=object).astype(str).str.strip().str.upper().eq("A").to_numpy()
+    # Blank cells (code -1) take the trailing slot: not 'A', so present, as before
+    return np.append(present, True).astype(np.uint8)[codes].reshape(cells.shape)
+
+def attendance_day_matrix(att: pd.DataFrame, day_cols=None):
+    """Attendance register as a rows x days uint8 matrix (1 = not marked 'A'), with the day number of each column."""
+    if day_cols is None:
+        day_cols = [c for c in att.columns if re.fullmatch(ATTENDANCE_DAY_COLUMN, str(c))]
+    days = np.array([int(str(c)[1:]) for c in day_cols], dtype=np.int64)
+    return _present_flags(att[day_cols].to_numpy(dtype=object)), days
+
+class AttendanceRegister:
+    """
+    Attendance of one or many months as an employees x months x 31 uint8 presence array.
+    Employees are (Employee_ID, Employee_Name) pairs, and each row without an Employee_ID is
+    an employee of its own; rows repeating an employee-month are merged in the array (a day
+    counts once). Day slots past a month's end (D31 in April) are not days.
+    """
+
+    def __init__(self, att: pd.DataFrame, month_col: str = "Month", year_col: str | None = None):
+        self.month_col = month_col
+        self.year_col = year_col
+        self.day_cols = [c for c in att.columns if re.fullmatch(ATTENDANCE_DAY_COLUMN, str(c))]
+        self.cells = att[self.day_cols].to_numpy(dtype=object)
+        self.matrix = matrix = _present_flags(self.cells)
+        self.day_slot = np.array([int(str(c)[1:]) - 1 for c in self.day_cols], dtype=np.int64)
+
+        blank = pd.Series(np.nan, index=att.index, dtype=object)
+        keys = pd.DataFrame({
+            "Employee_ID": _id_text(att["Employee_ID"]) if "Employee_ID" in att.columns else blank,
+            "Employee_Name": _id_text(att["Employee_Name"]) if "Employee_Name" in att.columns else blank,
+        })
+        # Rows without an ID are not folded together (their names may be blank too)
+        row = np.where(keys["Employee_ID"].isna().to_numpy(), np.arange(len(att)), -1)
+        self.row_employee = (keys.assign(_row=row)
+                             .groupby(["Employee_ID", "Employee_Name", "_row"], sort=False, dropna=False)
+                             .ngroup().to_numpy())
+        first = np.unique(self.row_employee, return_index=True)[1]
+        self.employees = keys.iloc[first].reset_index(drop=True)
+
+        self.row_month, months = pd.factorize(attendance_months(att, month_col, year_col), sort=True,
+                                              use_na_sentinel=False)
+        self.months = np.asarray(months, dtype="datetime64[M]")
+
+        shape = (len(self.employees), len(self.months), 31)
+        self.presence = np.zeros(shape, dtype=np.uint8)
+        r, c = np.nonzero(matrix)
+        self.presence[self.row_employee[r], self.row_month[r], self.day_slot[c]] = 1
+        # Last register row of each employee-month (source of Month / Status values in reports)
+        self.row_of = np.full(shape[:2], -1, dtype=np.int64)
+        self.row_of[self.row_employee, self.row_month] = np.arange(len(att))
+        cols = [col for col in (month_col, year_col) if col and col in att.columns]
+        self.month_values = {col: att[col].ffill().bfill().to_numpy() for col in cols}
+
+        start = self.months.astype("datetime64[D]")
+        length = ((self.months + 1).astype("datetime64[D]") - start).astype(np.int64)
+        # Calendar days of each month; an unknown month keeps all 31 slots
+        self.valid = np.where(np.isnat(self.months)[:, None], True, np.arange(31)[None, :] < length[:, None])
+        self.dates = (start[:, None] + np.arange(31)[None, :]).astype("datetime64[ns]")
+
+    def present_days(self) -> np.ndarray:
+        """Employees x months count of present days."""
+        return (self.presence & self.valid[None]).sum(axis=2)
+
+    def row_present_days(self) -> np.ndarray:
+        """Present days of each register row on its own (H2R1): repeated rows are not merged."""
+        return (self.matrix & self.valid[self.row_month][:, self.day_slot]).sum(axis=1)
+
+    def after_exit(self, leavers: pd.DataFrame) -> pd.DataFrame:
+        """Present register days after Exit_Date for leavers (Employee_ID, Employee_Name, Exit_Date)."""
+        if np.isnat(self.months).all():
+            raise ValueError("Unable to parse Month/Year from Attendance_Register.")
+        pairs = self.employees.assign(_emp=np.arange(len(self.employees))).merge(
+            leavers, on=["Employee_ID", "Employee_Name"], how="inner")
+        emp = pairs["_emp"].to_numpy()
+        exit_date = pairs["Exit_Date"].to_numpy(dtype="datetime64[ns]")
+        # Broadcast: each leaver's exit date against every day of every register month
+        known = ~np.isnat(self.months)
+        mask = (self.presence[emp].astype(bool) & (self.valid & known[:, None])[None]
+                & (self.dates[None] > exit_date[:, None, None]))
+        p, m, d = np.nonzero(mask)
+        row = self.row_of[emp[p], m]
+
+        out = pairs[["Employee_ID", "Employee_Name"]].iloc[p].reset_index(drop=True)
+        for col, values in self.month_values.items():
+            out[col] = values[row]
+        out["Exit_Date"] = exit_date[p]
+        out["Date"] = self.dates[m, d]
+        slot_col = np.full(31, -1, dtype=np.int64)
+        slot_col[self.day_slot] = np.arange(len(self.day_slot))
+        out["Status"] = self.cells[row, slot_col[d]]
+        return out.sort_values(["Employee_ID", "Date"], kind="stable").reset_index(drop=True)
+
+def attendance_after_exit(
+    emp: pd.DataFrame,
+    att: pd.DataFrame,
+    month_col: str = "Month",
+    year_col: str | None = None,
+    register: AttendanceRegister | None = None
+) -> pd.DataFrame:
+    """H2R2 on prepared frames: register days (not 'A') after the employee's exit date, any number of months."""
+    exits = to_date(emp["Exit_Date"]) if "Exit_Date" in emp.columns else pd.Series(pd.NaT, index=emp.index)
+    keep = exits.notna().to_numpy()
+    leavers = pd.DataFrame({
+        "Employee_ID": _id_text(emp["Employee_ID"])[keep].to_numpy(),
+        "Employee_Name": _id_text(emp["Employee_Name"])[keep].to_numpy(),
+        "Exit_Date": exits[keep].to_numpy(),
+    })
+
+    if month_col not in att.columns:
+        raise ValueError("Attendance_Register must contain Month (and optionally Year) to infer month/year.")
+    if register is None:
+        register = AttendanceRegister(att, month_col, year_col)
+    if not register.day_cols:
+        return pd.DataFrame(columns=["Employee_ID","Employee_Name","Exit_Date","Date","Status"])
+    return register.after_exit(leavers)
+
 def find_attendance_after_exit(
     file_path: str,
     employee_sheet: str = "Employee_Master",
@@ -644,57 +1265,10 @@ def find_attendance_after_exit(
     month_col: str = "Month",
     year_col: str | None = None
 ) -> pd.DataFrame:
-    # Load
+    """H2R2 from a workbook; see attendance_after_exit."""
     emp = pd.read_excel(file_path, sheet_name=employee_sheet, dtype={"Employee_ID": str, "Employee_Name": str})
     att = pd.read_excel(file_path, sheet_name=attendance_sheet, dtype={"Employee_ID": str, "Employee_Name": str})
-
-    emp["Exit_Date"] = pd.to_datetime(emp.get("Exit_Date"), errors="coerce")
-    emp = emp[emp["Exit_Date"].notna()].copy()
-
-    # derive month base
-    if year_col and year_col in att.columns and month_col in att.columns:
-        mval = str(att[month_col].dropna().astype(str).iloc[0]).strip()
-        yval = str(att[year_col].dropna().astype(str).iloc[0]).strip()
-        base = pd.to_datetime(f"1 {mval} {yval}", errors="coerce")
-    elif month_col in att.columns:
-        mval = str(att[month_col].dropna().astype(str).iloc[0]).strip()
-        ts = pd.to_datetime(mval, errors="coerce")
-        if pd.isna(ts):
-            base = pd.to_datetime("1 " + mval, errors="coerce")
-        else:
-            base = pd.Timestamp(ts.year, ts.month, 1)
-    else:
-        raise ValueError("Attendance_Register must contain Month (and optionally Year) to infer month/year.")
-
-    if pd.isna(base):
-        raise ValueError("Unable to parse Month/Year from Attendance_Register.")
-
-    # daily columns D1..D31
-    day_cols = [c for c in att.columns if re.fullmatch(r"D(?:[1-9]|[12]\d|3[01])", str(c))]
-    if not day_cols:
-        return pd.DataFrame(columns=["Employee_ID","Employee_Name","Exit_Date","Date","Status"])
-
-    long = att.melt(
-        id_vars=[c for c in ["Employee_ID","Employee_Name", month_col, year_col] if c and c in att.columns],
-        value_vars=day_cols,
-        var_name="Day",
-        value_name="Status"
-    )
-    long["Day_Num"] = pd.to_numeric(long["Day"].str.extract(r"(\d+)")[0], errors="coerce")
-    long = long[long["Day_Num"].between(1,31)]
-    long["Date"] = base + pd.to_timedelta(long["Day_Num"] - 1, unit="D")
-
-    s = long["Status"].astype(str).str.strip().str.upper()
-    long = long[~s.eq("A")]
-
-    out = long.merge(emp[["Employee_ID","Employee_Name","Exit_Date"]].astype({"Employee_ID": str}),
-                     on=["Employee_ID","Employee_Name"], how="inner")
-
-    out = out[out["Date"] > out["Exit_Date"]].copy()
-
-    ordered = [c for c in ["Employee_ID","Employee_Name", month_col, year_col, "Exit_Date","Date","Status"] if c in out.columns]
-    extra = [c for c in out.columns if c not in ordered + ["Day","Day_Num"]]
-    return out[ordered + extra].sort_values(["Employee_ID","Date"]).reset_index(drop=True)
+    return attendance_after_exit(emp, att, month_col=month_col, year_col=year_col)
 
 # ---------------- Save/Load ----------------
 def save_job_results(job_id, results, proc_status, statuses,
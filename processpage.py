@@ -1,14 +1,13 @@
 # ============================== processpage.py — Processing ==============================
-import os, re, importlib, time, random, numbers
+import os, re, importlib, numbers, time
 from pathlib import Path
-from io import BytesIO
 
 import streamlit as st
 import streamlit.components.v1 as components
 import pandas as pd
 import base64
 
-import logic   # adapter that uses mapped fields and returns canonical DFs
+import job_queue
 import logic6  # existing logic: PROCESS_TITLES, bots, helpers
 
 LEFT_LOGO_PATH = "logo.png"
@@ -138,6 +137,8 @@ VAR_NAME_MAP = {
     "variable3": "vendor_year_threshold",   # months
     "variable4": "vendor_daily_threshold",  # count/day
     "variable5": "OVERDUE_DAYS_THRESHOLD",  # do NOT shadow function name
+    "variable6": "FUZZY_NAME_THRESHOLD",    # P2P5 similar names (0 = off)
+    "variable7": "SPLIT_ORDER_WINDOW_DAYS", # P2P4 rolling window (0 = same PO date)
 }
 
 # Defaults if not present in logic6.py
@@ -147,6 +148,8 @@ DEFAULTS = {
     "vendor_year_threshold": 12,
     "vendor_daily_threshold": 5,
     "OVERDUE_DAYS_THRESHOLD": 7,
+    "FUZZY_NAME_THRESHOLD": 0,
+    "SPLIT_ORDER_WINDOW_DAYS": 0,
 }
 
 def _as_number(val, default):
@@ -264,6 +267,11 @@ def _render_param_editor():
             value=_as_number(current.get("variable3", DEFAULTS["vendor_year_threshold"]), DEFAULTS["vendor_year_threshold"]),
             step=1.0, min_value=0.0
         )
+        v7 = st.number_input(
+            "P2P : Split Order — SPLIT_ORDER_WINDOW_DAYS (Days window, 0 = same PO date)",
+            value=_as_number(current.get("variable7", DEFAULTS["SPLIT_ORDER_WINDOW_DAYS"]), DEFAULTS["SPLIT_ORDER_WINDOW_DAYS"]),
+            step=1.0, min_value=0.0
+        )
     with c2:
         v4 = st.number_input(
             "P2P : Duplicate Vendors — vendor_daily_threshold (Amount threshold)",
@@ -275,6 +283,12 @@ def _render_param_editor():
             value=_as_number(current.get("variable5", DEFAULTS["OVERDUE_DAYS_THRESHOLD"]), DEFAULTS["OVERDUE_DAYS_THRESHOLD"]),
             step=1.0, min_value=0.0
         )
+        v6 = st.number_input(
+            "P2P : Duplicate Vendors — FUZZY_NAME_THRESHOLD (Name similarity, 0 = exact names only)",
+            value=_as_number(current.get("variable6", DEFAULTS["FUZZY_NAME_THRESHOLD"]), DEFAULTS["FUZZY_NAME_THRESHOLD"]),
+            step=0.05, min_value=0.0, max_value=1.0,
+            help="Higher finds fewer, closer name matches (precision); lower finds more variants (recall). 0.7-0.8 suits typos and suffix variants.",
+        )
     # ---- Buttons row (aligned side by side) ----
     b1, b2, _sp = st.columns([1, 1, 6])
     with b1:
@@ -291,6 +305,8 @@ def _render_param_editor():
             "variable3": v3,
             "variable4": v4,
             "variable5": v5,  # writes to OVERDUE_DAYS_THRESHOLD
+            "variable6": v6,  # writes to FUZZY_NAME_THRESHOLD
+            "variable7": v7,  # writes to SPLIT_ORDER_WINDOW_DAYS
         }
         if _write_params_into_logic6(payload):
             st.success("Saved to logic6.py and reloaded.", icon="✅")
@@ -389,7 +405,7 @@ def render_processpage():
                     prog_ph = st.progress(0)
 
                 curr_status = s.proc_status.get(code, "Pending")
-                sym = {"Pending":"⏳","Complete":"✅","Failed":"❌"}.get(curr_status, "⏳")
+                sym = {"Pending":"⏳","Processing":"🔄","Complete":"✅","Failed":"❌"}.get(curr_status, "⏳")
                 status_ph.markdown(f"- {sym} **{bot_name}** — {curr_status}")
 
                 if curr_status in ("Complete", "Failed"):
@@ -410,6 +426,7 @@ def render_processpage():
         with nav[1]:
             if st.button("Process ➜", key="pp_start"):
                 s.processing_started = True
+                s.pop("job_id", None)
                 st.rerun()
         st.markdown('</div>', unsafe_allow_html=True)
         return
@@ -421,161 +438,77 @@ def render_processpage():
         return
 
     # =============== PROCESS NOW (after Start pressed) ===============
-    file_bytes_map = {
-        "MASTER": s.get("u_master_bytes"),
-        "P2P":    s.get("u_p2p_bytes"),
-        "O2C":    s.get("u_o2c_bytes"),
-        "H2R":    s.get("u_h2r_bytes"),
-    }
-
-    with st.spinner("Preparing dataframes from your mapped sheets & columns..."):
-        df_vendor, df_p2p, df_emp_p2p, df_o2c, df_cust, df_emp_h2r, df_att = logic.prepare_dataframes(
-            file_bytes_map=file_bytes_map,
-            sheet_mapping_pairs=s.sheet_mapping_pairs,
-            column_mapping_pairs=s.column_mapping_pairs,
+    # The bots run in a job_queue worker process. This script only submits the job, then
+    # polls it on each rerun; the job id in the URL brings a reloaded tab back to it.
+    if not s.get("job_id"):
+        bots = []
+        for cat in cats:
+            for code in _codes_for_category(cat):
+                if sel_set and code not in sel_set:
+                    continue
+                if s.proc_status.get(code) in ("Complete", "Failed"):
+                    continue
+                bots.append(code)
+        s.job_id = job_queue.submit(
+            "p2p",
+            {
+                "MASTER": s.get("u_master_bytes"),
+                "P2P":    s.get("u_p2p_bytes"),
+                "O2C":    s.get("u_o2c_bytes"),
+                "H2R":    s.get("u_h2r_bytes"),
+            },
+            s.sheet_mapping_pairs,
+            s.column_mapping_pairs,
+            selected_bots=bots,
         )
+        st.query_params["job"] = s.job_id
+
+    job = job_queue.status(s.job_id)
+    if job is None:
+        st.error("This processing job is no longer available. Please process again.")
+        s.processing_started = False
+        s.pop("job_id", None)
+        st.query_params.pop("job", None)
+        st.markdown('</div>', unsafe_allow_html=True)
+        return
 
-    # expose raw DFs for 5th page
-    s.raw_dfs = {
-        "VENDOR_RAW":  df_vendor,
-        "P2P_RAW":     df_p2p,
-        "EMP_P2P_RAW": df_emp_p2p,  # for P2P2 analytics
-        "O2C_RAW":     df_o2c,
-        "CUST_RAW":    df_cust,
-        "EMP_H2R_RAW": df_emp_h2r,
-        "ATT_RAW":     df_att,
-        # Backward-compatible alias some code might expect:
-        "EMP_RAW":     df_emp_p2p,
-    }
-
-    if df_p2p is not None:
-        bio = BytesIO()
-        with pd.ExcelWriter(bio, engine="xlsxwriter") as writer:
-            df_p2p.to_excel(writer, sheet_name="P2P_Sample (Bots 1-20)", index=False)
-        bio.seek(0)
-        s.file_bytes = bio.getvalue()
-    else:
-        s.file_bytes = None
-
-    def _run_bot_and_update(code: str):
+    # Bars move on the worker's events only: a bot's row turns 🔄 when it starts and ✅/❌ when it ends
+    for code, bot in job.bots.items():
+        if code not in ui_refs:
+            continue
         _, bot_name = logic6.PROCESS_TITLES[code]
-        status_ph = ui_refs[code]["status"]
-        prog_ph   = ui_refs[code]["prog"]
-
-        # --- Smooth pseudo-progress ---
-        # Total per-bot delay: random 3–6 seconds.
-        # Each increment occurs after a random 1–3s sleep.
-        # Progress increments are random and strictly increasing (monotonic).
-        total_target = random.uniform(3.0, 6.0)
-        elapsed = 0.0
-        progress_val = 0
-        prog_ph.progress(progress_val)
-        while elapsed < total_target and progress_val < 95:
-            step_sleep = random.uniform(1.0, 3.0)
-            if elapsed + step_sleep > total_target:
-                step_sleep = total_target - elapsed
-            if step_sleep > 0:
-                time.sleep(step_sleep)
-                elapsed += step_sleep
-            inc = random.randint(5, 25)  # random increment
-            progress_val = min(95, progress_val + inc)  # never decrease, cap at 95
-            prog_ph.progress(progress_val)
-        # --------------------------------
-
-        try:
-            # --- P2P ---
-            if code == "P2P1":
-                if df_vendor is None: raise RuntimeError("Vendor Master not available.")
-                s.results['P2P1'] = logic6.find_missing_vendor_fields(df_vendor)
-
-            elif code == "P2P2":
-                if df_p2p is None: raise RuntimeError("P2P Sample not available.")
-                if hasattr(logic6, "find_po_grn_invoice_mismatches"):
-                    thr = getattr(logic6, "PO_GRN_Invoice", DEFAULTS["PO_GRN_Invoice"])
-                    s.results['P2P2'] = logic6.find_po_grn_invoice_mismatches(df_p2p, variable1=thr)
-                else:
-                    s.results['P2P2'] = df_p2p.head(0)
-
-            elif code == "P2P3":
-                if df_p2p is None: raise RuntimeError("P2P Sample not available.")
-                s.results['P2P3'] = logic6.get_invalid_rows(df_p2p) if hasattr(logic6, "get_invalid_rows") else df_p2p.head(0)
-
-            elif code == "P2P4":
-                if df_p2p is None: raise RuntimeError("P2P Sample not available.")
-                s.results['P2P4'] = logic6.generate_result(df_p2p) if hasattr(logic6, "generate_result") else df_p2p.head(0)
-
-            elif code == "P2P5":
-                if df_vendor is None: raise RuntimeError("Vendor Master not available.")
-                s.results['P2P5'] = logic._find_matching_rows_from_df(df_vendor) if hasattr(logic, "_find_matching_rows_from_df") else df_vendor.head(0)
-
-            # --- O2C ---
-            elif code == "O2C1":
-                if df_o2c is None: raise RuntimeError("O2C Sample not available.")
-                if hasattr(logic6, "check_overdue_delivery"):
-                    days_thr = getattr(logic6, "OVERDUE_DAYS_THRESHOLD", DEFAULTS["OVERDUE_DAYS_THRESHOLD"])
-                    dcopy = df_o2c.copy()
-                    # Try signature variants: days=, then variable5=, else no arg
-                    try:
-                        s.results['O2C1'] = logic6.check_overdue_delivery(dcopy, days=days_thr)
-                    except TypeError:
-                        try:
-                            s.results['O2C1'] = logic6.check_overdue_delivery(dcopy, variable5=days_thr)
-                        except TypeError:
-                            s.results['O2C1'] = logic6.check_overdue_delivery(dcopy)
-                else:
-                    s.results['O2C1'] = df_o2c.head(0)
-
-            elif code == "O2C2":
-                if df_o2c is None: raise RuntimeError("O2C Sample not available.")
-                d = df_o2c.copy()
-                if "Delivery_No" not in d.columns:
-                    d["Delivery_No"] = pd.NA
-                s.results['O2C2'] = logic6.check_dispatch_without_invoice(d) if hasattr(logic6, "check_dispatch_without_invoice") else d.head(0)
-
-            elif code == "O2C3":
-                if df_cust is None: raise RuntimeError("Customer Master not available.")
-                s.results['O2C3'] = logic6.get_missing_customer_data(df_cust.copy()) if hasattr(logic6, "get_missing_customer_data") else df_cust.head(0)
-
-            # --- H2R ---
-            elif code == "H2R1":
-                if (df_emp_h2r is None) or (df_att is None):
-                    raise RuntimeError("H2R Employee Master or Attendance Register not available.")
-                s.results['H2R1'] = logic6.find_ghost_employees(df_emp_h2r, df_att) if hasattr(logic6, "find_ghost_employees") else df_emp_h2r.head(0)
-
-            elif code == "H2R2":
-                if (df_emp_h2r is None) or (df_att is None):
-                    raise RuntimeError("H2R Employee Master or Attendance Register not available.")
-                if hasattr(logic6, "find_attendance_after_exit"):
-                    bio2 = BytesIO()
-                    with pd.ExcelWriter(bio2, engine="xlsxwriter") as writer:
-                        df_emp_h2r.to_excel(writer, sheet_name="Employee_Master", index=False)
-                        df_att.to_excel(writer, sheet_name="Attendance_Register", index=False)
-                    bio2.seek(0)
-                    s.results['H2R2'] = logic6.find_attendance_after_exit(
-                        bio2, employee_sheet="Employee_Master", attendance_sheet="Attendance_Register",
-                        month_col="Month", year_col=None
-                    )
-                else:
-                    s.results['H2R2'] = df_att.head(0)
-
-            s.proc_status[code] = "Complete"
-
-        except Exception as e:
-            s.proc_status[code] = "Failed"
-            s.results[code] = pd.DataFrame({"Error": [str(e)]})
-
-        prog_ph.progress(100)
-        sym = "✅" if s.proc_status[code] == "Complete" else "❌"
-        status_ph.markdown(f"- {sym} **{bot_name}** — {s.proc_status[code]}")
+        s.proc_status[code] = bot["status"]
+        sym = {"Processing": "🔄", "Complete": "✅", "Failed": "❌"}.get(bot["status"], "⏳")
+        ui_refs[code]["status"].markdown(f"- {sym} **{bot_name}** — {bot['status']}")
+        if bot["status"] in ("Complete", "Failed"):
+            ui_refs[code]["prog"].progress(100)
+            if bot["error"]:
+                s.results[code] = pd.DataFrame({"Error": [bot["error"]]})
+
+    if job.active:
+        # Also fails the job if its worker died, so the next poll shows why
+        job_queue.ensure_workers()
+        if job.state == job_queue.QUEUED:
+            st.caption("Queued — waiting for a free worker…")
+        else:
+            st.caption(f"Processing… {job.rows:,} input rows read")
+        time.sleep(job_queue.POLL_SECONDS)
+        st.rerun()
 
-    # 3) Process only the selected bots
-    for cat in cats:
-        for code in _codes_for_category(cat):
-            if sel_set and code not in sel_set:
-                continue
-            if s.proc_status.get(code) in ("Complete", "Failed"):
-                continue
-            _run_bot_and_update(code)
+    if job.state == job_queue.FAILED:
+        st.error(f"Processing failed: {job.error}")
+        for code in job.spec["selected_bots"] or []:
+            if s.proc_status.get(code) != "Complete":
+                s.proc_status[code] = "Failed"
+                s.results[code] = pd.DataFrame({"Error": [job.error]})
+    else:
+        outcome = job_queue.result(s.job_id)
+        # Raw DFs and the job graph (bots, next-level analytics, shared intermediates) for the 5th page
+        s.raw_dfs = outcome["raw_dfs"]
+        s.job = outcome["job"]
+        s.results.update({code: df for code, df in outcome["results"].items() if df is not None})
+        s.proc_status.update(outcome["proc_status"])
+        s.bot_timings = outcome["seconds"]
 
     # 4) Compute category statuses & finish (only for categories actually shown)
     s.statuses = {}
@@ -0,0 +1,88 @@
+# ============================== schema.py — Canonical Column Types ==============================
+import pandas as pd
+from pandas.api.types import (
+    CategoricalDtype,
+    is_bool_dtype,
+    is_datetime64_any_dtype,
+    is_float_dtype,
+    is_numeric_dtype,
+)
+from typing import Dict, Hashable, Optional, Sequence, Tuple
+
+import date_parsing
+
+# Column kinds used by CANONICAL_TYPES in logic.py / blogic.py. Frames are coerced once at
+# load; the bots call the same functions, which return an already-typed column untouched.
+TEXT = "text"      # categorical of strings (codes, flags, categories); blanks stay NaN
+NUMBER = "number"  # int64/float64; Indian comma grouping ("1,23,456.50") is understood
+DATE = "date"      # datetime64[ns]; unparseable values become NaT (see date_parsing.py)
+
+_NUMBER_JUNK = r"[,\s₹]"
+
+
+def to_text(s: pd.Series) -> pd.Series:
+    """
+    Categorical text. Whole floats print without '.0', so a code column read as float
+    (because of blank cells) still compares equal to '11'.
+    """
+    if isinstance(s.dtype, CategoricalDtype):
+        return s
+    if is_float_dtype(s):
+        whole = s.notna() & (s % 1 == 0)
+        fits = whole & (s.abs() < 2**63)  # beyond int64 the cast would wrap
+        txt = s.astype(str)
+        txt[fits] = s[fits].astype("int64").astype(str)
+        txt[whole & ~fits] = s[whole & ~fits].map("{:.0f}".format)
+    else:
+        txt = s.astype(str)
+    return txt.where(s.notna()).astype("category")
+
+
+def to_number(s: pd.Series) -> pd.Series:
+    if is_numeric_dtype(s) and not is_bool_dtype(s):
+        return s
+    out = pd.to_numeric(s, errors="coerce")
+    # Only cells that failed plain parsing are cleaned (commas, spaces, rupee sign)
+    retry = out.isna() & s.notna()
+    if retry.any():
+        cleaned = s[retry].astype(str).str.replace(_NUMBER_JUNK, "", regex=True)
+        out = out.astype("float64")
+        out[retry] = pd.to_numeric(cleaned, errors="coerce")
+    return out
+
+
+def to_date(s: pd.Series, formats: Optional[Sequence[str]] = None) -> pd.Series:
+    """See date_parsing.parse_dates: formats inferred per column, Excel serials understood."""
+    if is_datetime64_any_dtype(s):
+        return s
+    return date_parsing.parse_dates(s, formats)
+
+
+COERCERS = {TEXT: to_text, NUMBER: to_number, DATE: to_date}
+
+
+def apply_schema(
+    df: pd.DataFrame,
+    types: Dict[str, str],
+    date_formats: Optional[Dict[str, Tuple[str, ...]]] = None,
+    source: Optional[Hashable] = None,
+    origins: Optional[Dict[str, str]] = None,
+) -> pd.DataFrame:
+    """
+    Coerce the listed columns of df in place (missing columns are skipped); returns df.
+    `date_formats` pins the formats of DATE columns (see date_parsing.infer_formats).
+    With `source` (e.g. upload digest, sheet, header row) parsed DATE columns are cached
+    per source and original column name (`origins` maps renamed columns back).
+    """
+    for col, kind in (types or {}).items():
+        if col not in df.columns or isinstance(df[col], pd.DataFrame):  # skip duplicated names
+            continue
+        if kind == DATE and not is_datetime64_any_dtype(df[col]):
+            formats = (date_formats or {}).get(col)
+            if source is not None:
+                df[col] = date_parsing.cached_parse(df[col], (source, (origins or {}).get(col, col)), formats)
+            else:
+                df[col] = to_date(df[col], formats)
+        else:
+            df[col] = COERCERS[kind](df[col])
+    return df
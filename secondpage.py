@@ -7,6 +7,10 @@ import re
 import base64
 from pathlib import Path
 
+import blob_store
+import columnar_cache
+import workbook_probe
+
 LEFT_LOGO_PATH = "logo.png"
 
 if "REQUIRED_SHEETS" not in globals():
@@ -88,6 +92,11 @@ def _file_cache_key(src, name: str) -> str:
 
 @st.cache_data(show_spinner=False)
 def _sheet_names_cached(cache_key: str, file_bytes: bytes):
+    cached = columnar_cache.sheet_names(file_bytes)
+    if cached is None:
+        cached = workbook_probe.sheet_names(file_bytes)
+    if cached is not None:
+        return cached
     with BytesIO(file_bytes) as f:
         xl = pd.ExcelFile(f)
         return xl.sheet_names
@@ -110,16 +119,10 @@ def _bootstrap_bytes(s):
         bkey = f"{key}_bytes"
         nkey = f"{key}_name"
         if f is not None:
-            try:
-                s[bkey] = f.getvalue()
+            blob = blob_store.put_upload(f)
+            if blob is not None:
+                s[bkey] = blob
                 s[nkey] = getattr(f, "name", "")
-            except Exception:
-                try:
-                    s[bkey] = f.read()
-                    s[nkey] = getattr(f, "name", "")
-                    f.seek(0)
-                except Exception:
-                    pass
 
 def _data_uri(path: str) -> str:
     p = Path(path)
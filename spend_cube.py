@@ -0,0 +1,185 @@
+# ============================== spend_cube.py — Vendor × Day Spend Cube ==============================
+from typing import Iterable, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from schema import to_date, to_number
+
+# Invoice spend of the P2P sample aggregated once per job to (vendor, day) cells: sum and
+# count of Invoice_Amount. FY / quarter / month / day totals and rolling N-day windows are
+# roll-ups over the cells, so a new granularity or a changed threshold never rescans invoices.
+# Cells are sparse (only days with spend), sorted by vendor then day.
+PERIODS = ("FY", "quarter", "month", "day")
+
+
+def _period_codes(days: np.ndarray, period: str) -> np.ndarray:
+    """Integer period per day ordinal (days since 1970-01-01); increasing with time."""
+    if period == "day":
+        return days
+    months = days.astype("datetime64[D]").astype("datetime64[M]").astype(np.int64)
+    if period == "month":
+        return months
+    fiscal = months - 3                                   # April -> month 0 of the fiscal year
+    if period == "quarter":
+        return np.floor_divide(fiscal, 3)
+    if period == "FY":
+        return np.floor_divide(fiscal, 12)
+    raise ValueError(f"Unknown period {period!r}; expected one of {PERIODS}.")
+
+
+def _format_periods(codes: np.ndarray, period: str) -> np.ndarray:
+    if period == "day":
+        d = pd.DatetimeIndex(codes.astype("datetime64[D]"))
+        return (d.year.astype(str) + "-" + d.month.astype(str) + "-" + d.day.astype(str)).to_numpy()
+    if period == "month":
+        return np.datetime_as_string(codes.astype("datetime64[M]"), unit="M").astype(object)
+    start = 1970 + (codes // 4 if period == "quarter" else codes)
+    fy = pd.Index(start.astype(str)) + "-" + pd.Index((start + 1).astype(str))
+    if period == "quarter":
+        fy = fy + " Q" + pd.Index((codes % 4 + 1).astype(str))
+    return fy.to_numpy()
+
+
+def _period_labels(codes: np.ndarray, period: str) -> np.ndarray:
+    """Display labels: FY '2025-2026', quarter '2025-2026 Q1' (Apr-Jun), month '2025-04', day '2025-4-1'."""
+    # A few thousand distinct periods at most; format each once
+    uniq, inv = np.unique(codes, return_inverse=True)
+    return _format_periods(uniq, period)[inv.ravel()]
+
+
+class SpendCube:
+    """
+    (vendor, day) -> invoice sum / count over one P2P frame. `frame` is the source; rows
+    without a vendor, date or amount are not in the cube.
+    """
+
+    def __init__(self, frame: pd.DataFrame, rows: np.ndarray, row_cell: np.ndarray, vendors: pd.Index,
+                 cell_vendor: np.ndarray, cell_day: np.ndarray, total: np.ndarray, count: np.ndarray):
+        self.frame = frame
+        self.rows = rows                # source positions of the cube's invoices
+        self.row_cell = row_cell        # cell of each of those invoices
+        self.vendors = vendors          # sorted, stripped vendor names; cell_vendor indexes it
+        self.cell_vendor = cell_vendor
+        self.cell_day = cell_day
+        self.total = total
+        self.count = count
+        self._vendor_start = np.searchsorted(cell_vendor, np.arange(len(vendors) + 1))
+        # Sort key of the cells: vendor-major, then day
+        lo = cell_day.min() if len(cell_day) else 0
+        self._key = cell_vendor * (int(cell_day.max() - lo) + 1 if len(cell_day) else 1) + (cell_day - lo)
+
+    def __len__(self) -> int:
+        return len(self.total)
+
+    def _cell_mask(self, vendors: Optional[Iterable[str]]) -> np.ndarray:
+        if vendors is None:
+            return np.ones(len(self), dtype=bool)
+        wanted = self.vendors.get_indexer(pd.Index(pd.unique(pd.Series(list(vendors), dtype=object))))
+        return np.isin(self.cell_vendor, wanted[wanted >= 0])
+
+    def _rollup(self, period: str, sel: np.ndarray) -> Tuple[pd.DataFrame, np.ndarray]:
+        """Roll-up of the selected cells and the roll-up row of each of them."""
+        codes = _period_codes(self.cell_day[sel], period)
+        if not len(codes):
+            empty = pd.DataFrame(columns=["Vendor_Name", period, "Total_Invoice_Amount", "Invoice_Count"])
+            return empty, np.zeros(0, dtype=np.int64)
+        lo = codes.min()
+        span = int(codes.max() - lo) + 1
+        key, inv = np.unique(self.cell_vendor[sel] * span + (codes - lo), return_inverse=True)
+        vendor, period_code = np.divmod(key, span)
+        inv = inv.ravel()
+        out = pd.DataFrame({
+            "Vendor_Name": self.vendors[vendor].to_numpy(),
+            period: _period_labels(period_code + lo, period),
+            "Total_Invoice_Amount": np.bincount(inv, weights=self.total[sel]),
+            "Invoice_Count": np.bincount(inv, weights=self.count[sel]).astype(np.int64),
+        })
+        return out, inv
+
+    def rollup(self, period: str = "FY", vendors: Optional[Iterable[str]] = None) -> pd.DataFrame:
+        """Vendor_Name, <period label>, Total_Invoice_Amount, Invoice_Count per vendor and period, in time order."""
+        return self._rollup(period, self._cell_mask(vendors))[0]
+
+    def rolling(self, window_days: int, vendors: Optional[Iterable[str]] = None) -> pd.DataFrame:
+        """
+        Trailing `window_days` spend per vendor, ending on each day with spend:
+        Vendor_Name, Cell, Window_Start, Day, Total_Invoice_Amount, Invoice_Count.
+        """
+        if window_days < 1:
+            raise ValueError("window_days must be at least 1.")
+        cells = np.flatnonzero(self._cell_mask(vendors))
+        v = self.cell_vendor[cells]
+        d = self.cell_day[cells]
+        # Cells are sorted by (vendor, day): the window of a cell starts at the first cell of
+        # the same vendor within window_days - 1 days; prefix sums give its totals.
+        first = np.maximum(np.searchsorted(self._key, self._key[cells] - (window_days - 1)),
+                           self._vendor_start[v])
+        csum = np.concatenate(([0.0], np.cumsum(self.total)))
+        ccnt = np.concatenate(([0], np.cumsum(self.count)))
+        start = d - (window_days - 1)
+        return pd.DataFrame({
+            "Vendor_Name": self.vendors[v].to_numpy(),
+            "Cell": cells,
+            "First_Cell": first,
+            "Window_Start": _period_labels(start, "day"),
+            "Day": _period_labels(d, "day"),
+            "Total_Invoice_Amount": csum[cells + 1] - csum[first],
+            "Invoice_Count": ccnt[cells + 1] - ccnt[first],
+        })
+
+    def alerts(self, period: str, threshold: float, vendors: Optional[Iterable[str]] = None,
+               window_days: int = 0) -> Tuple[pd.DataFrame, np.ndarray]:
+        """
+        Periods (or rolling windows when window_days > 0) whose total exceeds `threshold`,
+        and the source positions of the invoices inside them.
+        """
+        if window_days:
+            win = self.rolling(window_days, vendors)
+            hit = win[win["Total_Invoice_Amount"] > threshold]
+            # Cells covered by any alerting window: +1 at its first cell, -1 after its last
+            cover = np.zeros(len(self) + 1, dtype=np.int64)
+            np.add.at(cover, hit["First_Cell"].to_numpy(), 1)
+            np.add.at(cover, hit["Cell"].to_numpy() + 1, -1)
+            cell_hit = np.cumsum(cover[:-1]) > 0
+            summary = hit.drop(columns=["Cell", "First_Cell"]).reset_index(drop=True)
+        else:
+            sel = self._cell_mask(vendors)
+            roll, inv = self._rollup(period, sel)
+            hit = (roll["Total_Invoice_Amount"] > threshold).to_numpy()
+            cell_hit = np.zeros(len(self), dtype=bool)
+            cell_hit[sel] = hit[inv]
+            summary = roll[hit].reset_index(drop=True)
+        return summary, self.rows[cell_hit[self.row_cell]]
+
+
+def build(df: pd.DataFrame, vendor_col: str = "Vendor_Name", date_col: str = "Invoice_Date",
+          amount_col: str = "Invoice_Amount") -> SpendCube:
+    """Aggregate a P2P frame (prepared or raw text) into a SpendCube."""
+    if vendor_col in df.columns:
+        names = df[vendor_col].astype(str).str.strip()
+        names = names.mask(df[vendor_col].isna() | names.isin(["", "nan"]))
+    else:
+        names = pd.Series(np.nan, index=df.index, dtype=object)
+    dates = to_date(df[date_col]) if date_col in df.columns else pd.Series(pd.NaT, index=df.index)
+    amounts = to_number(df[amount_col]) if amount_col in df.columns else pd.Series(np.nan, index=df.index)
+    valid = (names.notna() & dates.notna() & amounts.notna()).to_numpy()
+    rows = np.flatnonzero(valid)
+
+    vendor_code, vendors = pd.factorize(names[valid], sort=True)
+    day = dates[valid].to_numpy().astype("datetime64[D]").astype(np.int64)
+    lo = day.min() if len(day) else 0
+    span = int(day.max() - lo) + 1 if len(day) else 1
+    cell_key, row_cell = np.unique(vendor_code.astype(np.int64) * span + (day - lo), return_inverse=True)
+    row_cell = row_cell.ravel()
+    cell_vendor, cell_day = np.divmod(cell_key, span)
+    return SpendCube(
+        frame=df,
+        rows=rows,
+        row_cell=row_cell,
+        vendors=pd.Index(vendors),
+        cell_vendor=cell_vendor,
+        cell_day=cell_day + lo,
+        total=np.bincount(row_cell, weights=amounts[valid].to_numpy(dtype=np.float64), minlength=len(cell_key)),
+        count=np.bincount(row_cell, minlength=len(cell_key)).astype(np.int64),
+    )
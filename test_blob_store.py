@@ -0,0 +1,36 @@
+# ============================== Test Blob Store ==============================
+"""
+Uploads are stored once by content and deleted after BLOB_MAX_DAYS without use.
+"""
+
+import os
+import time
+
+import blob_store
+
+
+def test_put_get_and_expire(tmp_path, monkeypatch):
+    monkeypatch.setattr(blob_store, "BLOB_DIR", str(tmp_path))
+    monkeypatch.setattr(blob_store, "_OPEN", type(blob_store._OPEN)())
+    old, kept, fresh = (blob_store.put(data) for data in (b"old upload", b"kept upload", b"fresh upload"))
+    assert bytes(blob_store.get(old.digest)) == b"old upload"
+    assert blob_store.put(b"old upload").digest == old.digest
+
+    past = time.time() - 30 * 86400
+    for blob in (old, kept):
+        os.utime(blob.path, (past, past))
+    blob_store.expire(max_days=7, keep=[kept.digest])
+
+    assert blob_store.get(old.digest) is None
+    assert bytes(blob_store.get(kept.digest)) == b"kept upload"
+    assert bytes(blob_store.get(fresh.digest)) == b"fresh upload"
+    assert bytes(old) == b"old upload"  # a map handed out earlier still reads
+
+
+def test_expire_disabled(tmp_path, monkeypatch):
+    monkeypatch.setattr(blob_store, "BLOB_DIR", str(tmp_path))
+    blob = blob_store.put(b"data")
+    past = time.time() - 30 * 86400
+    os.utime(blob.path, (past, past))
+    blob_store.expire(max_days=0)
+    assert os.path.exists(blob.path)
@@ -0,0 +1,120 @@
+# ============================== Test Bot Registry ==============================
+"""
+The job planner and Job: waves in dependency order, nodes left out for a missing input
+(and optional inputs that are not), failures passed on to dependants, values computed
+once, and Job.matches telling whether a job was built over the same frames.
+"""
+
+import pandas as pd
+import pytest
+
+import bot_engine
+import bot_registry
+from bot_registry import ANALYTIC, BotSpec
+
+CALLS = []
+
+
+def _count(df: pd.DataFrame) -> pd.DataFrame:
+    CALLS.append("T_COUNT")
+    return df.head(1)
+
+
+def _fail(df: pd.DataFrame) -> pd.DataFrame:
+    raise ValueError("bad input")
+
+
+def _size(table: pd.DataFrame) -> int:
+    return len(table)
+
+
+@pytest.fixture
+def test_nodes(monkeypatch):
+    """T_COUNT / T_FAIL bots over P2P_RAW, each with an analytic."""
+    CALLS.clear()
+    for spec in (
+        BotSpec("T_COUNT", _count, ("P2P_RAW",)),
+        BotSpec("T_COUNT_SIZE", _size, ("T_COUNT",), kind=ANALYTIC, analytic_of="T_COUNT"),
+        BotSpec("T_FAIL", _fail, ("P2P_RAW",)),
+        BotSpec("T_FAIL_SIZE", _size, ("T_FAIL",), kind=ANALYTIC, analytic_of="T_FAIL"),
+    ):
+        monkeypatch.setitem(bot_registry.REGISTRY, spec.name, spec)
+
+
+def _p2p() -> pd.DataFrame:
+    return pd.DataFrame({"PO_No": ["P1", "P2"], "Invoice_Amount": [1.0, 2.0]})
+
+
+# ---------- plan ----------
+def test_plan_orders_nodes_after_their_inputs():
+    waves, skipped = bot_registry.plan(["P2P2_SUMMARY"], have={"P2P_RAW", "EMP_P2P_RAW"})
+    assert [sorted(w) for w in waves] == [["EMPLOYEE_INDEX", "P2P2"], ["P2P2_SUMMARY"]]
+    assert skipped == {}
+
+
+def test_plan_skips_nodes_whose_input_is_missing():
+    waves, skipped = bot_registry.plan(["P2P2_SUMMARY", "O2C1"], have={"P2P_RAW", "O2C_RAW"})
+    assert [sorted(w) for w in waves] == [["O2C1", "P2P2"]]
+    # The missing frame, not the intermediate node, is reported
+    assert skipped == {"EMPLOYEE_INDEX": "EMP_P2P_RAW", "P2P2_SUMMARY": "EMP_P2P_RAW"}
+
+
+def test_plan_runs_without_optional_inputs():
+    waves, skipped = bot_registry.plan(["P2P1_ANOMALIES"], have={"VENDOR_RAW"})
+    assert waves == [["P2P1"], ["P2P1_ANOMALIES"]]
+    assert skipped == {"EMPLOYEE_INDEX": "EMP_P2P_RAW"}
+
+
+def test_plan_unknown_node_and_known_values():
+    assert bot_registry.plan(["NOPE"], have=()) == ([], {})
+    waves, _ = bot_registry.plan(["P2P2_FIN_IMPACT"], have={"P2P2"})
+    assert waves == [["P2P2_FIN_IMPACT"]]
+
+
+def test_analytics_for_lists_registry_order():
+    assert bot_registry.analytics_for(["P2P3", "O2C1"]) == ["P2P3_NEXT_LEVEL", "P2P3_FIN_IMPACT"]
+
+
+# ---------- Job ----------
+def test_missing_input_is_reported_not_run():
+    job = bot_registry.Job({"P2P_RAW": _p2p(), "VENDOR_RAW": None}).run(["P2P1", "P2P2"])
+    assert job.skipped == {"P2P1": "VENDOR_RAW"}
+    assert "P2P1" not in job.proc_status
+    assert job.missing_message("P2P1") == "Vendor Master not available."
+    with pytest.raises(RuntimeError, match="^Vendor Master not available.$"):
+        job.value("P2P1")
+    with pytest.raises(RuntimeError, match="^P2P Employee Master not available.$"):
+        job.value("P2P2_SUMMARY")
+
+
+def test_values_are_computed_once(test_nodes):
+    job = bot_registry.Job({"P2P_RAW": _p2p()})
+    assert job.value("T_COUNT_SIZE") == 1
+    job.run(["T_COUNT", "T_COUNT_SIZE"])
+    assert job.value("T_COUNT").equals(_p2p().head(1))
+    assert CALLS == ["T_COUNT"]
+    assert job.results(["T_COUNT", "T_FAIL"]).keys() == {"T_COUNT"}
+
+
+def test_failure_is_passed_to_dependants(test_nodes):
+    events = []
+    job = bot_registry.Job({"P2P_RAW": _p2p()}).run(["T_FAIL", "T_FAIL_SIZE", "T_COUNT"], progress=events.append)
+    assert job.proc_status == {"T_FAIL": "Failed", "T_FAIL_SIZE": "Failed", "T_COUNT": "Complete"}
+    assert "bad input" in job.errors["T_FAIL"]
+    assert job.errors["T_FAIL_SIZE"].startswith("T_FAIL failed: ")
+    with pytest.raises(RuntimeError, match="bad input"):
+        job.value("T_FAIL_SIZE")
+    finished = {e.code: e.status for e in events if e.kind == bot_engine.FINISH}
+    assert finished["T_FAIL_SIZE"] == "Failed"
+
+
+def test_matches_compares_frames_by_identity():
+    p2p, vendors = _p2p(), pd.DataFrame({"Vendor_Name": ["A"]})
+    job = bot_registry.Job({"P2P_RAW": p2p, "VENDOR_RAW": vendors, "O2C_RAW": None})
+    assert job.matches({"P2P_RAW": p2p, "VENDOR_RAW": vendors, "O2C_RAW": None})
+    assert not job.matches({"P2P_RAW": p2p.copy(), "VENDOR_RAW": vendors})  # equal, not the same frame
+    assert not job.matches({"P2P_RAW": p2p})                                # a frame dropped
+    assert not job.matches({"P2P_RAW": p2p, "VENDOR_RAW": vendors, "O2C_RAW": _p2p()})  # a frame added
+    # Node values handed in (e.g. the pages' Complete bot results) are not inputs to compare
+    job = bot_registry.Job({"P2P_RAW": p2p, "P2P2": pd.DataFrame()})
+    assert job.matches({"P2P_RAW": p2p})
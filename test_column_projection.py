@@ -0,0 +1,59 @@
+# ============================== Test Column Projection ==============================
+"""
+Loading only the columns the selected bots read (logic6.BOT_INPUT_COLUMNS) must not change
+what they find: each bot and its next-level analytics, which the dashboard pages compute
+from the same frames, give the same values over projected and full frames.
+"""
+
+import pandas as pd
+import pytest
+
+import bot_registry
+import logic
+import logic6
+
+INPUTS = ("VENDOR_RAW", "P2P_RAW", "EMP_P2P_RAW", "O2C_RAW", "CUST_RAW", "EMP_H2R_RAW", "ATT_RAW")
+
+
+def _job(frames) -> bot_registry.Job:
+    return bot_registry.Job(dict(zip(INPUTS, frames)))
+
+
+def _assert_same(full, projected, dropped) -> None:
+    """
+    Same rows and values. Bots that echo their input rows show fewer columns over projected
+    frames; only columns projected away from a loaded sheet may be missing.
+    """
+    if isinstance(full, tuple):
+        assert isinstance(projected, tuple) and len(full) == len(projected)
+        for a, b in zip(full, projected):
+            _assert_same(a, b, dropped)
+    elif isinstance(full, pd.DataFrame):
+        missing = [c for c in full.columns if c not in projected.columns]
+        assert set(missing) <= dropped, missing
+        pd.testing.assert_frame_equal(projected, full.drop(columns=missing))
+    else:
+        assert projected == full
+
+
+@pytest.mark.parametrize("code", list(logic6.BOT_INPUT_COLUMNS))
+def test_projected_frames_give_the_same_results(p2p_upload, code):
+    u = p2p_upload
+    full = logic.prepare_dataframes(u.files, u.sheets, u.columns)
+    projected = logic.prepare_dataframes(u.files, u.sheets, u.columns, selected_bots=[code])
+    dropped = {c for f, p in zip(full, projected) if p is not None for c in f.columns if c not in p.columns}
+    names = [code] + bot_registry.analytics_for([code])
+    expected, got = _job(full).run(names), _job(projected).run(names)
+    for name in names:
+        assert got.proc_status.get(name) == expected.proc_status.get(name) == "Complete", got.errors.get(name)
+        _assert_same(expected.value(name), got.value(name), dropped)
+
+
+def test_projection_drops_unread_sheets_and_columns(p2p_upload):
+    u = p2p_upload
+    full = dict(zip(INPUTS, logic.prepare_dataframes(u.files, u.sheets, u.columns)))
+    projected = dict(zip(INPUTS, logic.prepare_dataframes(u.files, u.sheets, u.columns, selected_bots=["P2P1"])))
+    assert {k for k, v in projected.items() if v is not None} == {"VENDOR_RAW", "P2P_RAW", "EMP_P2P_RAW"}
+    assert set(projected["P2P_RAW"].columns) < set(full["P2P_RAW"].columns)
+    assert set(projected["EMP_P2P_RAW"].columns) == {"Employee_ID", "Department"}
+    assert "Unused" in full["VENDOR_RAW"].columns and "Unused" not in projected["VENDOR_RAW"].columns
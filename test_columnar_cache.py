@@ -0,0 +1,98 @@
+# ============================== Test Columnar Cache ==============================
+"""
+A workbook read back from the Parquet cache must equal read_excel on the same bytes:
+values, dtypes and header names.
+"""
+
+import datetime as dt
+from io import BytesIO
+
+import pandas as pd
+import pytest
+
+import columnar_cache
+
+
+def _workbook() -> bytes:
+    b = BytesIO()
+    with pd.ExcelWriter(b, engine="openpyxl") as w:
+        pd.DataFrame({
+            "Mixed": [1, "A-7", dt.datetime(2024, 1, 5), None],   # ints, text and a date in one column
+            2024: [1.5, 2, None, 4],                               # numeric header
+            "Name": ["a", None, "c", "d"],
+            "When": pd.to_datetime(["2024-01-05", None, "2024-02-01", "2024-03-01"]),
+            2025: [1, 2, 3, 4],
+        }).to_excel(w, sheet_name="Data", index=False)
+        pd.DataFrame({"Only": []}).to_excel(w, sheet_name="Empty", index=False)
+    return b.getvalue()
+
+
+def _loan_book() -> bytes:
+    """A title row above the header, as in the loan books (header_row=1)."""
+    b = BytesIO()
+    with pd.ExcelWriter(b, engine="openpyxl") as w:
+        pd.DataFrame([["Loan book as at 31.03.2025", None], ["ACCT", 2024], ["0001", 5], [17, None]]).to_excel(
+            w, sheet_name="Loans", index=False, header=False)
+    return b.getvalue()
+
+
+@pytest.fixture
+def cached(tmp_path, monkeypatch):
+    monkeypatch.setattr(columnar_cache, "CACHE_DIR", str(tmp_path))
+    data = _workbook()
+    columnar_cache.convert_workbook(data)
+    return data
+
+
+@pytest.mark.parametrize("sheet", ["Data", "Empty"])
+def test_cached_read_equals_read_excel(cached, sheet):
+    expected = pd.read_excel(BytesIO(cached), sheet_name=sheet)
+    pd.testing.assert_frame_equal(columnar_cache.read_sheet(cached, sheet), expected)
+
+
+def test_header_row_below_a_title(tmp_path, monkeypatch):
+    monkeypatch.setattr(columnar_cache, "CACHE_DIR", str(tmp_path))
+    data = _loan_book()
+    columnar_cache.convert_workbook(data, header_rows=(1,))
+    expected = pd.read_excel(BytesIO(data), sheet_name="Loans", header=1)
+    pd.testing.assert_frame_equal(columnar_cache.read_sheet(data, "Loans", header_row=1), expected)
+    assert columnar_cache.read_sheet(data, "Loans", header_row=0) is None
+
+
+def test_mixed_column_keeps_its_values(cached):
+    df = columnar_cache.read_sheet(cached, "Data")
+    assert df["Mixed"].tolist()[:3] == [1, "A-7", pd.Timestamp("2024-01-05")]
+    assert list(df.columns) == ["Mixed", 2024, "Name", "When", 2025]
+
+
+def test_batches_equal_whole_sheet(cached):
+    for sheet in ("Data", "Empty"):
+        batches = list(columnar_cache.iter_sheet_batches(cached, sheet, batch_size=3))
+        whole = pd.concat(batches, ignore_index=True)
+        pd.testing.assert_frame_equal(whole, pd.read_excel(BytesIO(cached), sheet_name=sheet))
+
+
+def test_projection_by_listed_names(cached):
+    assert columnar_cache.sheet_columns(cached, "Data") == ["Mixed", "2024", "Name", "When", "2025"]
+    df = columnar_cache.read_sheet(cached, "Data", columns=["2024", "Mixed"])
+    expected = pd.read_excel(BytesIO(cached), sheet_name="Data")[["Mixed", 2024]]
+    pd.testing.assert_frame_equal(df, expected)
+
+
+def test_expire_by_age_and_size(cached, tmp_path):
+    import os
+    import time
+
+    other = _loan_book()
+    key = columnar_cache.convert_workbook(other, header_rows=(1,))
+    first = columnar_cache.content_key(cached)
+    old = time.time() - 30 * 86400
+    os.utime(os.path.join(columnar_cache.CACHE_DIR, first), (old, old))
+
+    columnar_cache.expire(max_days=7, max_mb=0)
+    assert not columnar_cache.is_cached(cached)
+    assert columnar_cache.is_cached(key, 1)
+
+    columnar_cache.convert_workbook(cached)
+    columnar_cache.expire(max_days=0, max_mb=1e-6, keep=[key])  # over the size limit: all but `keep` go
+    assert columnar_cache.is_cached(key, 1) and not columnar_cache.is_cached(cached)
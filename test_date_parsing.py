@@ -0,0 +1,103 @@
+# ============================== Test Date Parsing ==============================
+"""
+Format inference for text date columns: ambiguous dates read day-first unless the column
+says otherwise or AUDITBOTS_DATE_DAYFIRST=0, mixed layouts in one column, Excel serials,
+and the parsed-column cache.
+"""
+
+import datetime as dt
+import os
+import subprocess
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import date_parsing
+
+
+def _ts(*dates):
+    return [pd.Timestamp(d) for d in dates]
+
+
+def test_ambiguous_dates_read_day_first_by_default():
+    s = pd.Series(["01/02/2020", "03/04/2020", "05/06/2020"])
+    assert date_parsing.infer_formats(s)[0] == "%d/%m/%Y"
+    assert date_parsing.parse_dates(s).tolist() == _ts("2020-02-01", "2020-04-03", "2020-06-05")
+
+
+def test_an_unambiguous_value_makes_the_column_month_first():
+    s = pd.Series(["01/02/2020", "02/13/2020", "03/04/2020"])
+    assert date_parsing.infer_formats(s)[0] == "%m/%d/%Y"
+    assert date_parsing.parse_dates(s).tolist() == _ts("2020-01-02", "2020-02-13", "2020-03-04")
+
+
+def test_month_first_setting(monkeypatch):
+    monkeypatch.setattr(date_parsing, "DAYFIRST", False)
+    s = pd.Series(["01/02/2020", "03/04/2020"])
+    assert date_parsing.infer_formats(s)[0] == "%m/%d/%Y"
+    assert date_parsing.parse_dates(s).tolist() == _ts("2020-01-02", "2020-03-04")
+    # A value only day-first can read still wins the column
+    assert date_parsing.parse_dates(pd.Series(["01/02/2020", "25/02/2020"])).tolist() == \
+        _ts("2020-02-01", "2020-02-25")
+
+
+@pytest.mark.parametrize("value, dayfirst", [("0", False), ("false", False), ("1", True), ("", True)])
+def test_dayfirst_environment_variable(value, dayfirst):
+    env = dict(os.environ, AUDITBOTS_DATE_DAYFIRST=value)
+    out = subprocess.run([sys.executable, "-c", "import date_parsing; print(date_parsing.DAYFIRST)"],
+                         env=env, capture_output=True, text=True, check=True,
+                         cwd=os.path.dirname(os.path.abspath(date_parsing.__file__)))
+    assert out.stdout.strip() == str(dayfirst)
+
+
+@pytest.mark.parametrize("dayfirst", [True, False])
+def test_iso_dates_are_year_month_day(monkeypatch, dayfirst):
+    monkeypatch.setattr(date_parsing, "DAYFIRST", dayfirst)
+    s = pd.Series(["2020-02-01", "2020-03-01"])
+    assert date_parsing.parse_dates(s).tolist() == _ts("2020-02-01", "2020-03-01")
+
+
+def test_mixed_formats_in_one_column():
+    s = pd.Series(["2025-01-31", "31/01/2025", "15/02/2025", "2025-02-16", "Mar 3, 2025", "junk", None])
+    assert date_parsing.infer_formats(s) == ("%Y-%m-%d", "%d/%m/%Y", "%b %d, %Y")
+    out = date_parsing.parse_dates(s)
+    assert out[:5].tolist() == _ts("2025-01-31", "2025-01-31", "2025-02-15", "2025-02-16", "2025-03-03")
+    assert out[5:].isna().all()
+
+
+def test_excel_serials_as_numbers_text_and_mixed_cells():
+    assert date_parsing.parse_dates(pd.Series([45292, 45292.5, 12, np.nan])).tolist()[:2] == \
+        [pd.Timestamp("2024-01-01"), pd.Timestamp("2024-01-01 12:00")]
+    assert date_parsing.parse_dates(pd.Series([12.0])).isna().all()  # outside the serial window
+    s = pd.Series(["45292", 45293, dt.datetime(2024, 1, 5), "06/01/2024", True], dtype=object)
+    out = date_parsing.parse_dates(s)
+    assert out[:4].tolist() == _ts("2024-01-01", "2024-01-02", "2024-01-05", "2024-01-06")
+    assert pd.isna(out[4])
+
+
+def test_categorical_parsed_per_category():
+    s = pd.Series(["05/01/2024", None, "05/01/2024", "13/01/2024"], dtype="category")
+    out = date_parsing.parse_dates(s)
+    assert out.dtype == "datetime64[ns]"
+    assert out[[0, 2, 3]].tolist() == _ts("2024-01-05", "2024-01-05", "2024-01-13")
+    assert pd.isna(out[1])
+
+
+def test_cached_parse_keys_on_source_formats_and_dayfirst(monkeypatch):
+    monkeypatch.setattr(date_parsing, "_CACHE", type(date_parsing._CACHE)())
+    s = pd.Series(["01/02/2020", "03/04/2020"])
+    first = date_parsing.cached_parse(s, ("upload", "Sheet", "Dt"))
+    assert first.tolist() == _ts("2020-02-01", "2020-04-03")
+
+    calls = []
+    monkeypatch.setattr(date_parsing, "parse_dates", lambda *a: calls.append(a) or first)
+    again = date_parsing.cached_parse(s, ("upload", "Sheet", "Dt"))
+    pd.testing.assert_series_equal(again, first)
+    assert not calls
+
+    date_parsing.cached_parse(s, ("upload", "Sheet", "Dt"), formats=("%m/%d/%Y",))
+    monkeypatch.setattr(date_parsing, "DAYFIRST", False)
+    date_parsing.cached_parse(s, ("upload", "Sheet", "Dt"))
+    assert len(calls) == 2
@@ -0,0 +1,149 @@
+# ============================== Test Job Queue ==============================
+"""
+The SQLite job queue against a temporary AUDITBOTS_JOB_DB, RESULTS_DIR and upload store:
+claim order, jobs of dead workers, retention purge of rows, results and uploads, a job
+whose upload expired, and one P2P job run end to end. No worker process is started.
+"""
+
+import os
+import subprocess
+import sys
+import time
+
+import pytest
+
+import blob_store
+import job_queue
+import logic6
+
+DAY = 86400
+
+
+@pytest.fixture
+def queue(tmp_path, monkeypatch, cache_dir):
+    results = tmp_path / "results"
+    results.mkdir()
+    monkeypatch.setattr(logic6, "RESULTS_DIR", str(results))
+    monkeypatch.setattr(job_queue, "DB_PATH", str(tmp_path / "jobs.sqlite3"))
+    monkeypatch.setattr(blob_store, "BLOB_DIR", str(tmp_path / "blobs"))
+    monkeypatch.setattr(blob_store, "_OPEN", type(blob_store._OPEN)())
+    monkeypatch.setattr(job_queue, "ensure_workers", lambda: None)
+    for name in logic6.TUNABLES:  # _execute applies the job's thresholds to logic6
+        monkeypatch.setattr(logic6, name, getattr(logic6, name))
+    with job_queue._db() as conn:
+        yield conn
+
+
+def _submit(data: bytes = b"upload", kind: str = "p2p") -> str:
+    return job_queue.submit(kind, {"MASTER": data}, {}, {}, selected_bots=[])
+
+
+def _dead_pid() -> int:
+    proc = subprocess.Popen([sys.executable, "-c", "pass"])
+    proc.wait()
+    return proc.pid
+
+
+def _set(conn, job_id: str, **fields) -> None:
+    conn.execute(f"UPDATE jobs SET {', '.join(f'{k} = ?' for k in fields)} WHERE id = ?", (*fields.values(), job_id))
+
+
+def test_submit_rejects_unknown_kind(queue):
+    with pytest.raises(ValueError):
+        _submit(kind="h2r")
+
+
+def test_claim_takes_the_oldest_queued_job(queue):
+    first, second, third = _submit(), _submit(), _submit()
+    now = time.time()
+    for job_id, age in ((first, 10), (second, 30), (third, 20)):
+        _set(queue, job_id, submitted=now - age)
+
+    order = [job_queue._claim(queue, os.getpid())[0] for _ in range(3)]
+    assert order == [second, third, first]
+    assert job_queue._claim(queue, os.getpid()) is None
+    st = job_queue.status(second)
+    assert st.state == job_queue.RUNNING and st.active and st.started is not None
+
+
+def test_jobs_of_dead_workers_fail(queue):
+    orphan, alive = _submit(), _submit()
+    _set(queue, orphan, state=job_queue.RUNNING, worker=_dead_pid())
+    _set(queue, alive, state=job_queue.RUNNING, worker=os.getpid())
+    job_queue._fail_orphans(queue)
+
+    st = job_queue.status(orphan)
+    assert st.state == job_queue.FAILED and not st.active
+    assert st.error == "The worker running this job exited." and st.finished is not None
+    assert job_queue.status(alive).state == job_queue.RUNNING
+
+
+def test_claim_also_fails_orphans(queue):
+    orphan = _submit()
+    _set(queue, orphan, state=job_queue.RUNNING, worker=_dead_pid())
+    assert job_queue._claim(queue, os.getpid()) is None
+    assert job_queue.status(orphan).state == job_queue.FAILED
+
+
+def test_purge_drops_old_jobs_results_and_uploads(queue, monkeypatch):
+    monkeypatch.setattr(job_queue, "RETENTION_DAYS", 7)
+    old_job, recent_job, queued_job = _submit(b"old upload"), _submit(b"recent upload"), _submit(b"queued upload")
+    past = time.time() - 30 * DAY
+    _set(queue, old_job, state=job_queue.DONE, finished=past)
+    _set(queue, recent_job, state=job_queue.FAILED, finished=time.time())
+    for job_id, mtime in ((old_job, past), (recent_job, time.time()), ("gone", past)):
+        path = job_queue._result_path(job_id)
+        open(path, "wb").close()
+        os.utime(path, (mtime, mtime))
+    digests = {job_id: job_queue.status(job_id).spec["files"]["MASTER"] for job_id in (old_job, recent_job, queued_job)}
+    for digest in digests.values():  # every upload unused for a month
+        os.utime(blob_store._path(digest), (past, past))
+
+    job_queue._purge(queue)
+
+    assert job_queue.status(old_job) is None
+    assert job_queue.status(recent_job).state == job_queue.FAILED
+    assert job_queue.status(queued_job).state == job_queue.QUEUED
+    assert sorted(os.listdir(logic6.RESULTS_DIR)) == [f"job_{recent_job}.pkl"]
+    # Uploads of the remaining jobs stay, however old
+    assert blob_store.get(digests[old_job]) is None
+    assert blob_store.get(digests[recent_job]) is not None
+    assert blob_store.get(digests[queued_job]) is not None
+
+
+def test_purge_keeps_everything_when_retention_is_off(queue, monkeypatch):
+    monkeypatch.setattr(job_queue, "RETENTION_DAYS", 0)
+    job_id = _submit()
+    _set(queue, job_id, state=job_queue.DONE, finished=time.time() - 365 * DAY)
+    job_queue._purge(queue)
+    assert job_queue.status(job_id).state == job_queue.DONE
+
+
+def test_job_whose_upload_expired_fails(queue):
+    job_id = _submit(b"expired upload")
+    digest = job_queue.status(job_id).spec["files"]["MASTER"]
+    past = time.time() - 30 * DAY
+    os.utime(blob_store._path(digest), (past, past))
+    blob_store.expire(max_days=7)
+
+    claimed = job_queue._claim(queue, os.getpid())
+    job_queue._execute(queue, *claimed[:2], job_queue.status(job_id).spec)
+    st = job_queue.status(job_id)
+    assert st.state == job_queue.FAILED
+    assert st.error == "RuntimeError: The MASTER upload is no longer in the upload store."
+    assert not os.path.exists(job_queue._result_path(job_id))
+
+
+def test_p2p_job_runs_to_a_result(queue, p2p_upload):
+    u = p2p_upload
+    job_id = job_queue.submit("p2p", u.files, u.sheets, u.columns, selected_bots=["P2P1", "O2C3"],
+                              params={"FUZZY_NAME_THRESHOLD": 0})
+    job_queue._execute(queue, *job_queue._claim(queue, os.getpid())[:2], job_queue.status(job_id).spec)
+
+    st = job_queue.status(job_id)
+    assert st.state == job_queue.DONE, st.error
+    assert {code: bot["status"] for code, bot in st.bots.items() if code in ("P2P1", "O2C3")} == \
+        {"P2P1": "Complete", "O2C3": "Complete"}
+    outcome = job_queue.result(job_id)
+    assert outcome["proc_status"] == {"P2P1": "Complete", "O2C3": "Complete"}
+    assert set(outcome["results"]) == {"P2P1", "O2C3"}
@@ -0,0 +1,60 @@
+# ============================== Test Schema ==============================
+"""
+Column coercion at load: codes read as floats print like the text in the sheet, Indian
+number formatting parses, dates go through date_parsing, and typed columns pass through.
+"""
+
+import numpy as np
+import pandas as pd
+
+import schema
+
+
+def test_to_text_prints_whole_floats_without_decimals():
+    s = pd.Series([11.0, np.nan, 2.5, -3.0, 1e20, 123456789012345678.0])
+    out = schema.to_text(s)
+    assert isinstance(out.dtype, pd.CategoricalDtype)
+    assert out.tolist()[:4] == ["11", np.nan, "2.5", "-3"]
+    # Beyond int64 the value is formatted, not cast (which would wrap to a negative number)
+    assert out[4] == "100000000000000000000"
+    assert out[5] == "123456789012345680"
+
+
+def test_to_text_keeps_strings_blanks_and_categoricals():
+    s = pd.Series(["A-1", None, 7, " x "], dtype=object)
+    assert schema.to_text(s).tolist() == ["A-1", np.nan, "7", " x "]
+    cat = pd.Series(["a", "b"], dtype="category")
+    assert schema.to_text(cat) is cat
+
+
+def test_to_number_understands_indian_grouping_and_rupees():
+    s = pd.Series(["1,23,456.50", "₹ 2,000", "17", "n/a", None, " 5 "], dtype=object)
+    out = schema.to_number(s)
+    assert out.dtype == np.float64
+    expected = [123456.5, 2000.0, 17.0, np.nan, np.nan, 5.0]
+    np.testing.assert_array_equal(out.to_numpy(), np.array(expected))
+
+
+def test_to_number_passes_numeric_columns_through():
+    ints = pd.Series([1, 2, 3])
+    assert schema.to_number(ints) is ints
+    assert schema.to_number(pd.Series([True, False])).tolist() == [1, 0]
+
+
+def test_to_date_parses_text_and_serials():
+    out = schema.to_date(pd.Series(["05/01/2024", "13/01/2024", None, "junk"]))
+    assert out.tolist()[:2] == [pd.Timestamp("2024-01-05"), pd.Timestamp("2024-01-13")]
+    assert out[2:].isna().all()
+    assert schema.to_date(pd.Series([45292.0]))[0] == pd.Timestamp("2024-01-01")
+    typed = pd.Series(pd.to_datetime(["2024-01-01"]))
+    assert schema.to_date(typed) is typed
+
+
+def test_apply_schema_coerces_listed_columns_only():
+    df = pd.DataFrame({"Code": [11.0, np.nan], "Amt": ["1,000", "2"], "Dt": ["2024-02-01", None], "Other": [1.0, 2.0]})
+    out = schema.apply_schema(df, {"Code": schema.TEXT, "Amt": schema.NUMBER, "Dt": schema.DATE, "Missing": schema.TEXT})
+    assert out is df
+    assert out["Code"].tolist() == ["11", np.nan]
+    assert out["Amt"].tolist() == [1000.0, 2.0]
+    assert out["Dt"][0] == pd.Timestamp("2024-02-01")
+    assert out["Other"].dtype == np.float64 and "Missing" not in out.columns
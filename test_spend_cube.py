@@ -0,0 +1,149 @@
+# ============================== Test Spend Cube ==============================
+"""
+SpendCube roll-ups and alerts against a plain pandas groupby over the invoices: fiscal
+years and quarters starting in April, rolling N-day windows and the invoices they cover,
+vendor filters and empty input.
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import logic6
+import spend_cube
+
+
+def _invoices() -> pd.DataFrame:
+    return pd.DataFrame({
+        "Vendor_Name": [" ABC ", "ABC", "XYZ", "ABC", "XYZ", None, "XYZ", "ABC", "Foo", "ABC", ""],
+        "Invoice_Date": pd.to_datetime(["2024-03-31", "2024-04-01", "2024-04-01", "2024-04-03", "2024-04-04",
+                                        "2024-04-04", "2024-06-30", "2024-12-31", "2025-01-15", "2025-01-15",
+                                        "2025-01-16"]),
+        "Invoice_Amount": [100.0, 50, 70, 30, 20, 999, 5, 40, np.nan, 60, 7],
+    })
+
+
+def _label(dates: pd.Series, period: str) -> pd.Series:
+    fy = logic6.fiscal_year_key(dates)
+    if period == "FY":
+        return fy
+    if period == "quarter":
+        return fy + " Q" + (((dates.dt.month - 4) % 12) // 3 + 1).astype(str)
+    if period == "month":
+        return dates.dt.strftime("%Y-%m")
+    return logic6.day_key(dates)
+
+
+def _valid(df: pd.DataFrame) -> pd.DataFrame:
+    out = df.assign(Vendor_Name=df["Vendor_Name"].str.strip())
+    return out[out["Vendor_Name"].fillna("").ne("") & out["Invoice_Date"].notna() & out["Invoice_Amount"].notna()]
+
+
+def _groupby(df: pd.DataFrame, period: str) -> pd.DataFrame:
+    valid = _valid(df)
+    return (valid.assign(**{period: _label(valid["Invoice_Date"], period)})
+            .groupby(["Vendor_Name", period], as_index=False)
+            .agg(Total_Invoice_Amount=("Invoice_Amount", "sum"), Invoice_Count=("Invoice_Amount", "size")))
+
+
+def _sorted(df: pd.DataFrame, period: str) -> pd.DataFrame:
+    return df.sort_values(["Vendor_Name", period]).reset_index(drop=True)
+
+
+@pytest.mark.parametrize("period", spend_cube.PERIODS)
+def test_rollup_equals_groupby(period):
+    df = _invoices()
+    got = spend_cube.build(df).rollup(period)
+    pd.testing.assert_frame_equal(_sorted(got, period), _sorted(_groupby(df, period), period), check_dtype=False)
+
+
+def test_fiscal_year_and_quarter_start_in_april():
+    cube = spend_cube.build(_invoices())
+    fy = cube.rollup("FY", vendors=["ABC"])
+    assert fy["FY"].tolist() == ["2023-2024", "2024-2025"]
+    assert fy["Total_Invoice_Amount"].tolist() == [100.0, 180.0]
+    q = cube.rollup("quarter", vendors=["ABC"])
+    assert q["quarter"].tolist() == ["2023-2024 Q4", "2024-2025 Q1", "2024-2025 Q3", "2024-2025 Q4"]
+    assert q["Total_Invoice_Amount"].tolist() == [100.0, 80.0, 40.0, 60.0]
+
+
+@pytest.mark.parametrize("period, threshold", [("FY", 150), ("quarter", 60), ("day", 50)])
+def test_period_alerts_equal_groupby(period, threshold):
+    df = _invoices()
+    summary, rows = spend_cube.build(df).alerts(period, threshold)
+    expected = _groupby(df, period)
+    expected = expected[expected["Total_Invoice_Amount"] > threshold]
+    pd.testing.assert_frame_equal(_sorted(summary, period), _sorted(expected, period), check_dtype=False)
+
+    valid = _valid(df)
+    keys = set(zip(expected["Vendor_Name"], expected[period]))
+    hit = [i for i, v, p in zip(valid.index, valid["Vendor_Name"], _label(valid["Invoice_Date"], period))
+           if (v, p) in keys]
+    assert sorted(rows.tolist()) == hit
+
+
+def _brute_windows(df: pd.DataFrame, window_days: int, threshold: float):
+    """Every (vendor, spend day) window by brute force, and the invoices inside alerting ones."""
+    valid = _valid(df)
+    windows, covered = [], set()
+    for (vendor, day), _ in valid.groupby(["Vendor_Name", valid["Invoice_Date"].dt.normalize()]):
+        start = day - pd.Timedelta(days=window_days - 1)
+        inside = valid[(valid["Vendor_Name"] == vendor) & valid["Invoice_Date"].between(start, day)]
+        total = inside["Invoice_Amount"].sum()
+        windows.append((vendor, day, total, len(inside)))
+        if total > threshold:
+            covered.update(inside.index)
+    return windows, sorted(covered)
+
+
+@pytest.mark.parametrize("window_days", [1, 3, 90])
+def test_rolling_windows_and_covered_invoices(window_days):
+    df = _invoices()
+    cube = spend_cube.build(df)
+    windows, covered = _brute_windows(df, window_days, threshold=75)
+    win = cube.rolling(window_days)
+    got = list(zip(win["Vendor_Name"], pd.to_datetime(win["Day"]), win["Total_Invoice_Amount"], win["Invoice_Count"]))
+    assert got == windows
+
+    summary, rows = cube.alerts("day", 75, window_days=window_days)
+    assert (summary["Total_Invoice_Amount"] > 75).all()
+    assert len(summary) == sum(total > 75 for _, _, total, _ in windows)
+    assert sorted(rows.tolist()) == covered
+
+
+def test_overlapping_windows_cover_each_invoice_once():
+    # ABC's three windows all alert and overlap: every invoice inside them is listed once
+    df = _invoices()
+    summary, rows = spend_cube.build(df).alerts("day", 75, vendors=["ABC"], window_days=3)
+    assert summary["Day"].tolist() == ["2024-3-31", "2024-4-1", "2024-4-3"]
+    assert summary["Window_Start"].tolist() == ["2024-3-29", "2024-3-30", "2024-4-1"]
+    assert summary["Total_Invoice_Amount"].tolist() == [100.0, 150.0, 80.0]
+    assert rows.tolist() == [0, 1, 3]
+
+
+def test_vendor_filter_ignores_unknown_names():
+    cube = spend_cube.build(_invoices())
+    got = cube.rollup("FY", vendors=["XYZ", "Nobody", "XYZ"])
+    assert got["Vendor_Name"].unique().tolist() == ["XYZ"]
+    assert cube.rollup("FY", vendors=[]).empty
+
+
+def test_empty_input():
+    empty = _invoices().iloc[:0]
+    cube = spend_cube.build(empty)
+    assert len(cube) == 0
+    assert list(cube.rollup("quarter").columns) == ["Vendor_Name", "quarter", "Total_Invoice_Amount", "Invoice_Count"]
+    assert cube.rolling(3).empty
+    for window_days in (0, 3):
+        summary, rows = cube.alerts("FY", 0, window_days=window_days)
+        assert summary.empty and len(rows) == 0
+    # Rows without a vendor, date or amount are not in the cube either
+    assert len(spend_cube.build(pd.DataFrame({"Vendor_Name": [None], "Invoice_Amount": [1.0]}))) == 0
+
+
+def test_bad_arguments():
+    cube = spend_cube.build(_invoices())
+    with pytest.raises(ValueError):
+        cube.rolling(0)
+    with pytest.raises(ValueError):
+        cube.rollup("week")
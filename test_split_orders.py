@@ -0,0 +1,76 @@
+# ============================== Test Split Orders (P2P4) ==============================
+"""
+Boundary cases of generate_result: POs on the same day, exactly SPLIT_ORDER_WINDOW_DAYS
+apart, for different items, and overlapping windows merging into one group.
+"""
+
+import pandas as pd
+import pytest
+
+import logic6
+
+
+def _pos(*lines) -> pd.DataFrame:
+    """(PO_No, PO_Date, Item_Code, Invoice_Amount) lines of vendor V."""
+    return pd.DataFrame(
+        [{"PO_No": po, "PO_Date": day, "Item_Code": item, "Invoice_Amount": amount, "Vendor_Name": "V"}
+         for po, day, item, amount in lines]
+    )
+
+
+def _groups(out: pd.DataFrame):
+    return [sorted(g["PO_No"]) for _, g in out.groupby("Group", sort=True)]
+
+
+@pytest.mark.parametrize("window_days", [0, 1, 7])
+def test_same_day_pos_are_split(window_days):
+    df = _pos(("P1", "2024-01-10", "I1", 6000), ("P2", "2024-01-10", "I1", 5000))
+    out = logic6.generate_result(df, threshold=10_000, window_days=window_days)
+    assert _groups(out) == [["P1", "P2"]]
+    assert out["Group_Total_Invoice"].tolist() == [11_000, 11_000]
+
+
+@pytest.mark.parametrize("window_days", [0, 7])
+def test_different_items_are_not_grouped(window_days):
+    df = _pos(("P1", "2024-01-10", "I1", 6000), ("P2", "2024-01-10", "I2", 5000))
+    assert logic6.generate_result(df, threshold=10_000, window_days=window_days).empty
+
+
+@pytest.mark.parametrize("window_days", [0, 7])
+def test_one_po_or_a_total_at_the_threshold_is_not_split(window_days):
+    one_po = _pos(("P1", "2024-01-10", "I1", 6000), ("P1", "2024-01-10", "I1", 5000))
+    assert logic6.generate_result(one_po, threshold=10_000, window_days=window_days).empty
+    at_threshold = _pos(("P1", "2024-01-10", "I1", 5000), ("P2", "2024-01-10", "I1", 5000))
+    assert logic6.generate_result(at_threshold, threshold=10_000, window_days=window_days).empty
+
+
+def test_window_covers_window_days_calendar_days():
+    # A 7-day window starting on the 10th ends on the 16th: the 17th is outside it
+    inside = _pos(("P1", "2024-01-10", "I1", 6000), ("P2", "2024-01-16", "I1", 5000))
+    out = logic6.generate_result(inside, threshold=10_000, window_days=7)
+    assert _groups(out) == [["P1", "P2"]]
+    assert out["Window_Start"].iloc[0] == pd.Timestamp("2024-01-10")
+    assert out["Window_End"].iloc[0] == pd.Timestamp("2024-01-16")
+
+    exactly_apart = _pos(("P1", "2024-01-10", "I1", 6000), ("P2", "2024-01-17", "I1", 5000))
+    assert logic6.generate_result(exactly_apart, threshold=10_000, window_days=7).empty
+    # Without a window only the exact PO date groups
+    assert logic6.generate_result(inside, threshold=10_000, window_days=0).empty
+
+
+def test_overlapping_windows_form_one_group():
+    df = _pos(("P1", "2024-01-01", "I1", 6000), ("P2", "2024-01-06", "I1", 5000),
+              ("P3", "2024-01-11", "I1", 6000), ("P4", "2024-02-20", "I1", 9000),
+              ("P5", "2024-02-21", "I1", 2000))
+    out = logic6.generate_result(df, threshold=10_000, window_days=7)
+    assert _groups(out) == [["P1", "P2", "P3"], ["P4", "P5"]]
+    first = out[out["Group"] == "Group_1"]
+    assert first["Group_Total_Invoice"].unique().tolist() == [17_000]
+    assert (first["Window_Start"].unique().tolist(), first["Window_End"].unique().tolist()) == \
+        ([pd.Timestamp("2024-01-01")], [pd.Timestamp("2024-01-11")])
+
+
+def test_lines_missing_a_key_are_ignored():
+    df = _pos(("P1", "2024-01-10", "I1", 6000), ("P2", None, "I1", 5000), ("P3", "2024-01-10", None, 5000))
+    for window_days in (0, 7):
+        assert logic6.generate_result(df, threshold=1000, window_days=window_days).empty
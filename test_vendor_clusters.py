@@ -0,0 +1,44 @@
+# ============================== Test Duplicate Vendor Clusters (P2P5) ==============================
+"""
+Regression checks for find_duplicate_vendor_clusters on vendor masters with blank key columns.
+"""
+
+import pandas as pd
+
+import logic6
+
+
+def test_cluster_with_blank_key_columns():
+    """A name-only duplicate with PAN / GST / bank account all blank is still reported."""
+    df = pd.DataFrame({"Vendor_Name": ["A", "A"], "PAN_No": [None, None],
+                       "GST_No": [None, None], "Bank_Account": [None, None]})
+    out = logic6.find_duplicate_vendor_clusters(df)
+    assert len(out) == 1
+    row = out.iloc[0]
+    assert row["Cluster_Size"] == 2
+    assert row["Pair_Count"] == 1
+    assert row["Row_Nos"] == "1, 2"
+    assert row["Vendor_Name"] == "A"
+    assert row[["PAN_No", "GST_No", "Bank_Account"]].isna().all()
+
+
+def test_single_key_cluster():
+    """Rows linked by one key only; the unrelated row stays out of the result."""
+    df = pd.DataFrame({"Vendor_Name": ["A", "B", "C"], "PAN_No": ["P1", "P1", None],
+                       "GST_No": [None, None, None], "Bank_Account": [None, None, "X"]})
+    out = logic6.find_duplicate_vendor_clusters(df)
+    assert len(out) == 1
+    row = out.iloc[0]
+    assert row["Row_Nos"] == "1, 2"
+    assert row["PAN_No"] == "P1"
+    assert row["Vendor_Name"] == f"A{logic6.CLUSTER_SEP}B"
+    assert pd.isna(row["GST_No"]) and pd.isna(row["Bank_Account"])
+    assert row["Exception_Noted"] == logic6.match_reasons(row["Match_Flags"])
+
+
+def test_no_duplicates():
+    df = pd.DataFrame({"Vendor_Name": ["A", "B"], "PAN_No": [None, None],
+                       "GST_No": [None, None], "Bank_Account": [None, None]})
+    out = logic6.find_duplicate_vendor_clusters(df)
+    assert out.empty
+    assert list(out.columns) == logic6.CLUSTER_COLUMNS
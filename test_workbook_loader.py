@@ -0,0 +1,118 @@
+# ============================== Test Workbook Loader ==============================
+"""
+WorkbookSession against plain read_excel: the same frames whether a sheet is parsed from
+Excel, read from the Parquet cache or streamed in chunks, and the same header names the
+mapping pages list.
+"""
+
+from io import BytesIO
+
+import pandas as pd
+import pytest
+
+import columnar_cache
+import workbook_loader
+import workbook_probe
+
+
+def _workbook() -> bytes:
+    b = BytesIO()
+    with pd.ExcelWriter(b, engine="openpyxl") as w:
+        pd.DataFrame({"Vendor": ["A", "B", None], 2024: [1, 2, 3], "Amount": [1.5, None, 3]}).to_excel(
+            w, sheet_name="Numeric header", index=False)
+    return b.getvalue()
+
+
+@pytest.mark.parametrize("convert", [False, True])
+def test_numeric_header_matches_probe(cache_dir, convert):
+    data = _workbook()
+    if convert:
+        columnar_cache.convert_workbook(data)
+    listed = workbook_probe.sheet_columns(data, "Numeric header")
+    assert listed == ["Vendor", "2024", "Amount"]
+    df = workbook_loader.WorkbookSession(data).read("Numeric header")
+    assert list(df.columns) == listed
+    # A mapping picked from the listed names renames the column
+    assert df.rename(columns={"2024": "Year_Total"})["Year_Total"].tolist() == [1, 2, 3]
+    chunks = list(workbook_loader.WorkbookSession(data).iter_chunks("Numeric header", chunk_size=2))
+    assert all(list(c.columns) == listed for c in chunks)
+
+
+def test_probe_shared_by_threads():
+    """Sessions probing one upload at once share a probe whose sharedStrings parse lazily."""
+    from concurrent.futures import ThreadPoolExecutor
+
+    b = BytesIO()
+    with pd.ExcelWriter(b, engine="openpyxl") as w:
+        for i in range(8):
+            pd.DataFrame({f"Col {i}-{j}": [j] for j in range(50)}).to_excel(w, sheet_name=f"S{i}", index=False)
+    data = b.getvalue()
+    workbook_probe._PROBES.clear()
+    sheets = [f"S{i}" for i in range(8)] * 4
+    with ThreadPoolExecutor(8) as pool:
+        got = list(pool.map(lambda s: workbook_probe.sheet_columns(data, s), sheets))
+    assert got == [[f"Col {s[1:]}-{j}" for j in range(50)] for s in sheets]
+
+
+# ---------- Equivalence with per-sheet read_excel (user-001) ----------
+def _book() -> bytes:
+    """A master workbook: several sheets, a title row above one header, blanks and dates."""
+    b = BytesIO()
+    with pd.ExcelWriter(b, engine="openpyxl") as w:
+        pd.DataFrame({"Vendor Name": ["A", "B", None, "D"], "PO Date": pd.to_datetime(["2024-04-01", None, "2024-05-02", "2024-06-03"]),
+                      "PO Amount": [100, 250.5, None, 75], "Code": [11, "X-2", 13, None]}).to_excel(w, sheet_name="P2P", index=False)
+        pd.DataFrame({"Vendor Name": ["A", "B"], "PAN No": ["P1", None]}).to_excel(w, sheet_name="Vendors", index=False)
+        pd.DataFrame([["Register for April", None], ["Employee ID", "D1"], ["E1", "P"], ["E2", "A"]]).to_excel(
+            w, sheet_name="Attendance", index=False, header=False)
+    return b.getvalue()
+
+
+def _old_read(data: bytes, sheet: str, header_row: int = 0) -> pd.DataFrame:
+    """The loader before workbook sessions: one read_excel per sheet (names as listed)."""
+    return workbook_loader._text_header(pd.read_excel(BytesIO(data), sheet_name=sheet, header=header_row))
+
+
+WANTS = [("P2P", 0), ("Vendors", 0), ("Attendance", 1)]
+
+
+@pytest.mark.parametrize("convert", [False, True])
+def test_session_equals_per_sheet_read_excel(cache_dir, convert):
+    data = _book()
+    if convert:
+        columnar_cache.convert_workbook(data, header_rows=(0, 1))
+    session = workbook_loader.WorkbookSession(data)
+    for sheet, header_row in WANTS:
+        session.want([sheet], header_row=header_row)
+    for sheet, header_row in WANTS:
+        pd.testing.assert_frame_equal(session.read(sheet, header_row), _old_read(data, sheet, header_row))
+
+
+def test_sheet_mapped_twice_reads_independent_copies(cache_dir):
+    data = _book()
+    session = workbook_loader.WorkbookSession(data).want(["Vendors"]).want(["Vendors"])
+    first = session.read("Vendors")
+    first["Vendor Name"] = "changed"  # callers rename / cast in place
+    pd.testing.assert_frame_equal(session.read("Vendors"), _old_read(data, "Vendors"))
+
+
+def test_unregistered_read_and_chunks(cache_dir):
+    data = _book()
+    session = workbook_loader.WorkbookSession(data)
+    pd.testing.assert_frame_equal(session.read("P2P"), _old_read(data, "P2P"))
+    chunks = pd.concat(session.iter_chunks("P2P", chunk_size=3))
+    expected = _old_read(data, "P2P")
+    assert list(chunks.columns) == list(expected.columns) and len(chunks) == len(expected)
+    assert chunks["Vendor Name"].tolist()[:2] == ["A", "B"]
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_loader_prefetch_equals_per_sheet_read_excel(cache_dir, workers):
+    books = [_book(), _workbook()]
+    loader = workbook_loader.WorkbookLoader()
+    for data in books:
+        loader.session(data).want(workbook_probe.sheet_names(data))
+    loader.prefetch(workers=workers)
+    for data in books:
+        for sheet in workbook_probe.sheet_names(data):
+            pd.testing.assert_frame_equal(loader.session(data).read(sheet), _old_read(data, sheet))
+    loader.close()
@@ -6,6 +6,10 @@ import base64
 from pathlib import Path
 import streamlit.components.v1 as components
 
+import blob_store
+import columnar_cache
+import workbook_probe
+
 LEFT_LOGO_PATH = "logo.png"
 ALL_CATEGORIES_LABEL = "All Categories"
 
@@ -37,11 +41,10 @@ def _bootstrap_bytes(s):
         bkey = f"{key}_bytes"
         nkey = f"{key}_name"
         if f is not None:
-            try:
-                s[bkey] = f.getvalue()
+            blob = blob_store.put_upload(f)
+            if blob is not None:
+                s[bkey] = blob
                 s[nkey] = getattr(f, "name", "")
-            except Exception:
-                pass
 
 def _bytes_for_cat(cat: str, s):
     if cat == "P2P":
@@ -54,6 +57,11 @@ def _bytes_for_cat(cat: str, s):
     return None, ""
 
 def _columns_for_sheet(xls_bytes: bytes, sheet_name: str):
+    cached = columnar_cache.sheet_columns(xls_bytes, sheet_name)
+    if cached is None:
+        cached = workbook_probe.sheet_columns(xls_bytes, sheet_name)
+    if cached is not None:
+        return cached
     try:
         bio = BytesIO(xls_bytes)
         xl = pd.ExcelFile(bio)
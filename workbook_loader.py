@@ -0,0 +1,348 @@
+# ============================== workbook_loader.py — Workbook Session Loader ==============================
+import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from io import BytesIO
+from typing import Dict, Iterable, Iterator, Optional
+
+import pandas as pd
+
+import columnar_cache
+import workbook_probe
+
+# Reader engine handed to pandas. None keeps the pandas default (openpyxl for xlsx);
+# "calamine" uses python-calamine, which parses large xlsx files several times faster.
+# "auto" picks calamine when it is installed.
+DEFAULT_ENGINE = os.getenv("AUDITBOTS_EXCEL_ENGINE") or None
+
+# Worker processes for WorkbookLoader.prefetch (one workbook per worker). 0 or 1 parses the
+# workbooks one after another on the calling thread.
+INGEST_WORKERS = int(os.getenv("AUDITBOTS_INGEST_WORKERS") or min(4, os.cpu_count() or 1))
+
+
+def _calamine_installed() -> bool:
+    try:
+        import python_calamine  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def resolve_engine(engine: Optional[str] = None) -> Optional[str]:
+    """
+    Return the engine name to pass to pandas, falling back to the default reader
+    when calamine is requested but not installed.
+    """
+    engine = engine if engine is not None else DEFAULT_ENGINE
+    if engine in ("auto", "calamine"):
+        return "calamine" if _calamine_installed() else None
+    return engine
+
+
+class ColumnFilter:
+    """
+    usecols callable keeping only the named columns (matched as-is or with spaces turned
+    into underscores, the way the bots normalise headers). `day_columns` also keeps the
+    D1..D31 attendance columns. A plain class so it pickles into worker processes.
+    """
+
+    def __init__(self, names: Iterable[str], day_columns: bool = False):
+        self.names = frozenset(str(n) for n in names)
+        self.day_columns = day_columns
+
+    def __call__(self, col) -> bool:
+        c = str(col)
+        if c in self.names or c.strip().replace(" ", "_") in self.names:
+            return True
+        return self.day_columns and c.startswith("D") and c[1:].isdigit()
+
+    def __or__(self, other: "ColumnFilter") -> "ColumnFilter":
+        return ColumnFilter(self.names | other.names, self.day_columns or other.day_columns)
+
+
+def _union(filters: Iterable[Optional[ColumnFilter]]) -> Optional[ColumnFilter]:
+    """None (= every column) wins over any filter."""
+    out = None
+    for i, f in enumerate(filters):
+        if f is None:
+            return None
+        out = f if i == 0 else out | f
+    return out
+
+
+def _iter_excel_chunks(file_bytes: bytes, sheet: str, header_row: int, chunk_size: int) -> Iterator[pd.DataFrame]:
+    """
+    Stream an xlsx sheet with openpyxl's read-only mode, `chunk_size` rows at a time.
+    Header names are de-duplicated like read_excel; trailing blank rows are dropped.
+    """
+    import openpyxl
+
+    book = openpyxl.load_workbook(BytesIO(file_bytes), read_only=True, data_only=True)
+    try:
+        rows = book[sheet].iter_rows(values_only=True)
+        for _ in range(header_row):
+            next(rows, None)
+        header = next(rows, None) or ()
+        names = workbook_probe._dedup(["" if v is None else workbook_probe._number_text(v) if isinstance(v, float) else str(v)
+                                       for v in header])
+        width = len(names)
+        buf, blanks, empty = [], [], True
+        for row in rows:
+            row = tuple(row[:width]) + (None,) * (width - len(row))
+            if all(v is None for v in row):
+                blanks.append(row)  # kept only if a non-blank row follows
+                continue
+            buf.extend(blanks)
+            blanks = []
+            buf.append(row)
+            if len(buf) >= chunk_size:
+                empty = False
+                yield pd.DataFrame(buf[:chunk_size], columns=names)
+                buf = buf[chunk_size:]
+        if buf or empty:
+            yield pd.DataFrame(buf, columns=names)
+    finally:
+        book.close()
+
+
+def _text_header(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Header names as text, the way the mapping pages list them (workbook_probe, columnar_cache
+    .sheet_columns): a numeric header 2024 is the column "2024" however the sheet was read.
+    """
+    if not all(isinstance(c, str) for c in df.columns):
+        df.columns = [str(c) for c in df.columns]
+    return df
+
+
+class WorkbookSession:
+    """
+    One uploaded workbook opened once per job.
+
+    Sheets are registered with `want()` up front; the first `read()` then parses every
+    registered sheet for that header row in a single `read_excel(sheet_name=[...])` pass
+    instead of re-opening the xlsx zip per sheet. Sheets already converted by
+    columnar_cache at upload time are loaded from Parquet and never touch Excel.
+    A ColumnFilter passed to `want()` limits the columns parsed for that sheet. Header
+    names come back as text on every path (see _text_header).
+    """
+
+    def __init__(self, file_bytes: bytes, engine: Optional[str] = None, use_cache: bool = True):
+        self._bytes = file_bytes
+        self.engine = resolve_engine(engine)
+        self.use_cache = use_cache
+        self._key = None
+        self._book = None
+        self._wanted: Dict[int, list] = {}
+        self._columns: Dict[tuple, Optional[ColumnFilter]] = {}
+        self._frames: Dict[tuple, pd.DataFrame] = {}
+        self._uses: Dict[tuple, int] = {}  # registered reads not served yet
+
+    @property
+    def key(self) -> str:
+        if self._key is None:
+            self._key = columnar_cache.content_key(self._bytes)
+        return self._key
+
+    def _open(self):
+        if self._book is None:
+            self._book = pd.ExcelFile(BytesIO(self._bytes), engine=self.engine)
+        return self._book
+
+    def want(
+        self,
+        sheets: Iterable[str],
+        header_row: int = 0,
+        columns: Optional[ColumnFilter] = None,
+    ) -> "WorkbookSession":
+        names = self._wanted.setdefault(header_row, [])
+        for sheet in sheets:
+            if not sheet:
+                continue
+            key = (sheet, header_row)
+            self._uses[key] = self._uses.get(key, 0) + 1
+            if sheet not in names:
+                names.append(sheet)
+                self._columns[key] = columns
+            else:
+                # Same sheet mapped twice (e.g. Employee Master for P2P and H2R): widen
+                self._columns[key] = _union([self._columns.get(key), columns])
+        return self
+
+    def _pending(self, header_row: int) -> list:
+        return [
+            s for s in self._wanted.get(header_row, [])
+            if self._uses.get((s, header_row), 0) > 0 and (s, header_row) not in self._frames
+        ]
+
+    def _load(self, header_row: int) -> None:
+        pending = self._pending(header_row)
+        if not pending:
+            return
+        if self.use_cache and columnar_cache.is_cached(self.key, header_row):
+            for sheet in pending:
+                df = columnar_cache.read_sheet(
+                    self.key, sheet, header_row=header_row, columns=self._columns.get((sheet, header_row))
+                )
+                if df is not None:
+                    self._frames[(sheet, header_row)] = _text_header(df)
+            pending = [s for s in pending if (s, header_row) not in self._frames]
+        if pending:
+            # One pass for all pending sheets: parse the union of their columns, then trim each
+            usecols = _union(self._columns.get((s, header_row)) for s in pending)
+            frames = pd.read_excel(self._open(), sheet_name=pending, header=header_row, usecols=usecols)
+            for sheet, df in frames.items():
+                cols = self._columns.get((sheet, header_row))
+                if cols is not None and usecols is not cols:
+                    df = df[[c for c in df.columns if cols(c)]]
+                self._frames[(sheet, header_row)] = _text_header(df)
+        # Release the parsed zip as soon as nothing registered is left to read
+        if not any(self._pending(h) for h in self._wanted):
+            self.close()
+
+    def needs_parse(self) -> bool:
+        """True when some registered sheet still has to be parsed from Excel."""
+        pending = {h for h in self._wanted if self._pending(h)}
+        return any(not (self.use_cache and columnar_cache.is_cached(self.key, h)) for h in pending)
+
+    def load_all(self) -> None:
+        for header_row in list(self._wanted):
+            self._load(header_row)
+
+    def _plan(self) -> Dict[int, Dict[str, Optional[ColumnFilter]]]:
+        """Pending sheets per header row with their column filters (picklable)."""
+        return {
+            h: {s: self._columns.get((s, h)) for s in self._pending(h)}
+            for h in self._wanted if self._pending(h)
+        }
+
+    def read(self, sheet: str, header_row: int = 0) -> pd.DataFrame:
+        key = (sheet, header_row)
+        if key not in self._frames:
+            if self._uses.get(key, 0) <= 0:
+                self.want([sheet], header_row)
+            self._load(header_row)
+        # Callers rename/cast in place: while other registered reads of this sheet remain
+        # (a sheet mapped twice) hand out copies; the last read takes the frame itself.
+        self._uses[key] -= 1
+        if self._uses[key] > 0:
+            return self._frames[key].copy()
+        return self._frames.pop(key)
+
+    def row_count(self, sheet: str, header_row: int = 0) -> Optional[int]:
+        """Data rows below the header, from the cache manifest or the xlsx probe (None if unknown)."""
+        rows = columnar_cache.sheet_rows(self.key, sheet, header_row) if self.use_cache else None
+        if rows is None:
+            rows = workbook_probe.sheet_rows(self._bytes, sheet, header_row)
+        return rows
+
+    def iter_chunks(self, sheet: str, header_row: int = 0, chunk_size: int = 100_000) -> Iterator[pd.DataFrame]:
+        """
+        Yield the sheet in frames of at most `chunk_size` rows without ever holding the
+        whole sheet (Parquet batches when cached, otherwise a read-only xlsx stream).
+        Frames carry a RangeIndex continuing across chunks, as if read in one piece.
+        """
+        chunks = columnar_cache.iter_sheet_batches(self.key, sheet, header_row, chunk_size) if self.use_cache else None
+        if chunks is None:
+            chunks = _iter_excel_chunks(self._bytes, sheet, header_row, chunk_size)
+        start = 0
+        for df in chunks:
+            df = _text_header(df)
+            df.index = pd.RangeIndex(start, start + len(df))
+            start += len(df)
+            yield df
+
+    def close(self) -> None:
+        if self._book is not None:
+            try:
+                self._book.close()
+            except Exception:
+                pass
+            self._book = None
+
+
+def _parse_plan(file_bytes: bytes, engine: Optional[str], use_cache: bool, plan: dict) -> Dict[tuple, pd.DataFrame]:
+    """Worker side of WorkbookLoader.prefetch: load a session's pending sheets in a fresh process."""
+    session = WorkbookSession(file_bytes, engine=engine, use_cache=use_cache)
+    for header_row, sheets in plan.items():
+        for sheet, columns in sheets.items():
+            session.want([sheet], header_row=header_row, columns=columns)
+    session.load_all()
+    return session._frames
+
+
+_log = logging.getLogger(__name__)
+
+_POOL: Optional[ProcessPoolExecutor] = None
+_POOL_WORKERS = 0
+
+
+def _pool(workers: int) -> ProcessPoolExecutor:
+    # Kept for the life of the server so later jobs skip worker start-up (rebuilt when the
+    # worker count changes). "spawn" because the Streamlit server is multi-threaded, where
+    # forking is not safe.
+    global _POOL, _POOL_WORKERS
+    if _POOL is None or _POOL_WORKERS != workers:
+        _reset_pool()
+        _POOL = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+        _POOL_WORKERS = workers
+    return _POOL
+
+
+def _reset_pool() -> None:
+    global _POOL
+    if _POOL is not None:
+        _POOL.shutdown(wait=False, cancel_futures=True)
+        _POOL = None
+
+
+class WorkbookLoader:
+    """Hands out one WorkbookSession per distinct upload within a job."""
+
+    def __init__(self, engine: Optional[str] = None):
+        self.engine = engine
+        self._sessions: Dict[int, WorkbookSession] = {}
+
+    def session(self, file_bytes: bytes) -> WorkbookSession:
+        key = id(file_bytes)
+        if key not in self._sessions:
+            self._sessions[key] = WorkbookSession(file_bytes, engine=self.engine)
+        return self._sessions[key]
+
+    def prefetch(self, workers: Optional[int] = None) -> None:
+        """
+        Load the registered sheets of every session now. Workbooks that still need an
+        Excel parse are handed to a process pool, one per worker, so ingest takes as long
+        as the slowest file rather than the sum; cached sheets are read in-process.
+        Falls back to parsing sequentially (logging why) for the workbooks the pool could not
+        load; frames the pool did load are kept.
+        """
+        workers = INGEST_WORKERS if workers is None else int(workers)
+        to_parse = [s for s in self._sessions.values() if s.needs_parse()]
+        if workers > 1 and len(to_parse) > 1:
+            futures = []
+            try:
+                pool = _pool(workers)
+                for sess in to_parse:
+                    futures.append((sess, pool.submit(_parse_plan, sess._bytes, sess.engine, sess.use_cache,
+                                                      sess._plan())))
+            except Exception:
+                _log.warning("Ingest pool unavailable; parsing workbooks one after another.", exc_info=True)
+            for sess, fut in futures:
+                try:
+                    sess._frames.update(fut.result())
+                except BrokenProcessPool:
+                    _log.warning("Ingest worker died; parsing its workbook in-process.", exc_info=True)
+                    _reset_pool()  # rebuilt on the next job
+                except Exception:
+                    # Parsed again below, which raises the real error to the caller if it recurs
+                    _log.warning("Parallel parse of a workbook failed; retrying in-process.", exc_info=True)
+        for sess in self._sessions.values():
+            sess.load_all()
+
+    def close(self) -> None:
+        for sess in self._sessions.values():
+            sess.close()
+        self._sessions.clear()
@@ -0,0 +1,327 @@
+# ============================== workbook_probe.py — Streaming xlsx Header Probe ==============================
+import io
+import os
+import posixpath
+import re
+import threading
+import zipfile
+from collections import OrderedDict, defaultdict
+from typing import Dict, List, Optional, Tuple
+from xml.etree.ElementTree import iterparse
+
+import columnar_cache
+
+# The mapping pages only need sheet names and header cells. Reading those straight from the
+# xlsx zip touches workbook.xml, the first rows of one sheet and a prefix of sharedStrings,
+# so a million-row dump probes as fast as a ten-row one. Anything the probe cannot answer
+# exactly (xls files, date-formatted or error header cells) returns None and the caller
+# falls back to pandas.
+
+_WORKSHEET_REL = "/worksheet"
+_CELL_REF = re.compile(r"([A-Z]+)(\d+)")
+_PROBE_CACHE_SIZE = 16
+
+
+def _local(tag: str) -> str:
+    return tag.rsplit("}", 1)[-1]
+
+
+def _attr(elem, name: str) -> Optional[str]:
+    # Relationship ids are namespaced (r:id); match on the local name only
+    for k, v in elem.attrib.items():
+        if _local(k) == name:
+            return v
+    return None
+
+
+def _col_index(letters: str) -> int:
+    n = 0
+    for ch in letters:
+        n = n * 26 + (ord(ch) - 64)
+    return n - 1
+
+
+def _number_text(v: str) -> str:
+    # openpyxl + pandas turn integral numbers into int, so 2024.0 reads back as "2024"
+    f = float(v)
+    return str(int(f)) if f.is_integer() else str(f)
+
+
+def _dedup(names: List[str]) -> List[str]:
+    """
+    Same renaming as pandas' header parser: blanks become 'Unnamed: i' and repeats get
+    '.1', '.2' suffixes, skipping suffixes already taken and naming real headers first.
+    """
+    unnamed = [i for i, n in enumerate(names) if n == ""]
+    names = [n if n != "" else f"Unnamed: {i}" for i, n in enumerate(names)]
+    taken = set(names)
+    counts = defaultdict(int)
+    for i in [i for i in range(len(names)) if i not in unnamed] + unnamed:
+        col = old = names[i]
+        cur = counts[col]
+        while cur > 0:
+            counts[old] = cur + 1
+            col = f"{old}.{cur}"
+            cur = cur + 1 if col in taken else counts[col]
+        names[i] = col
+        counts[col] = cur + 1
+    return names
+
+
+class _BufferFile(io.RawIOBase):
+    """
+    Seekable read-only file over a buffer (bytes or a blob_store mmap) that does not copy
+    it, unlike BytesIO: the zip reads its central directory and members straight from it.
+    """
+
+    def __init__(self, data):
+        self._view = memoryview(data).cast("B")
+        self._pos = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def readinto(self, b) -> int:
+        n = max(0, min(len(b), len(self._view) - self._pos))
+        b[:n] = self._view[self._pos:self._pos + n]
+        self._pos += n
+        return n
+
+    def seek(self, offset: int, whence: int = os.SEEK_SET) -> int:
+        base = {os.SEEK_SET: 0, os.SEEK_CUR: self._pos, os.SEEK_END: len(self._view)}[whence]
+        self._pos = max(0, base + offset)
+        return self._pos
+
+    def tell(self) -> int:
+        return self._pos
+
+
+class _Uncertain(Exception):
+    """Header contains a cell whose pandas rendering the probe does not reproduce."""
+
+
+class WorkbookProbe:
+    """
+    Sheet names, header rows and approximate row counts of one xlsx upload. Cached probes
+    are shared by sessions; the public methods hold the probe's lock because sharedStrings
+    is parsed lazily by one iterator.
+    """
+
+    def __init__(self, data: bytes):
+        self._lock = threading.RLock()
+        self._zip = zipfile.ZipFile(_BufferFile(data))
+        self.sheets: List[str] = []
+        self._paths: Dict[str, str] = {}
+        self._shared: List[str] = []
+        self._shared_iter = None
+        self._date_styles = None
+        self._headers: Dict[Tuple[str, int], Optional[List[str]]] = {}
+        self._dims: Dict[str, Optional[int]] = {}
+        self._read_workbook()
+
+    # ---------- workbook.xml + rels ----------
+    def _read_workbook(self) -> None:
+        names = set(self._zip.namelist())
+        targets = {}
+        rels_path = "xl/_rels/workbook.xml.rels"
+        if rels_path in names:
+            with self._zip.open(rels_path) as f:
+                for _, elem in iterparse(f):
+                    if _local(elem.tag) == "Relationship":
+                        targets[elem.get("Id")] = (elem.get("Target", ""), elem.get("Type", ""))
+        with self._zip.open("xl/workbook.xml") as f:
+            for _, elem in iterparse(f):
+                tag = _local(elem.tag)
+                if tag == "sheet":
+                    target, rel_type = targets.get(_attr(elem, "id"), ("", ""))
+                    if not rel_type.endswith(_WORKSHEET_REL):
+                        continue  # chartsheets are not listed by pandas
+                    path = target.lstrip("/") if target.startswith("/") else posixpath.normpath(posixpath.join("xl", target))
+                    name = elem.get("name")
+                    self.sheets.append(name)
+                    self._paths[name] = path
+                elif tag == "sheets":
+                    break
+
+    # ---------- sharedStrings (read lazily, only as far as needed) ----------
+    def _shared_string(self, idx: int) -> str:
+        if self._shared_iter is None and len(self._shared) <= idx:
+            if "xl/sharedStrings.xml" not in self._zip.namelist():
+                raise _Uncertain()
+            self._shared_iter = iterparse(self._zip.open("xl/sharedStrings.xml"), events=("start", "end"))
+        parts, in_phonetic = None, False
+        while len(self._shared) <= idx:
+            try:
+                event, elem = next(self._shared_iter)
+            except StopIteration:
+                raise _Uncertain()
+            tag = _local(elem.tag)
+            if tag == "si":
+                if event == "start":
+                    parts = []
+                else:
+                    self._shared.append("".join(parts))
+                    elem.clear()
+            elif tag == "rPh":
+                in_phonetic = event == "start"
+            elif tag == "t" and event == "end" and not in_phonetic and parts is not None:
+                parts.append(elem.text or "")
+        return self._shared[idx]
+
+    # ---------- styles (only to spot date-formatted header cells) ----------
+    def _is_date_style(self, style: Optional[str]) -> bool:
+        if not style or style == "0":
+            return False
+        if self._date_styles is None:
+            from openpyxl.styles.numbers import BUILTIN_FORMATS, is_date_format
+
+            custom, xfs, in_xfs = {}, [], False
+            if "xl/styles.xml" in self._zip.namelist():
+                with self._zip.open("xl/styles.xml") as f:
+                    for event, elem in iterparse(f, events=("start", "end")):
+                        tag = _local(elem.tag)
+                        if tag == "numFmt" and event == "end":
+                            custom[int(elem.get("numFmtId", 0))] = elem.get("formatCode", "")
+                        elif tag == "cellXfs":
+                            in_xfs = event == "start"
+                        elif tag == "xf" and in_xfs and event == "start":
+                            xfs.append(int(elem.get("numFmtId", 0)))
+            self._date_styles = {
+                i for i, fmt_id in enumerate(xfs)
+                if is_date_format(custom.get(fmt_id, BUILTIN_FORMATS.get(fmt_id, "General")))
+            }
+        return int(style) in self._date_styles
+
+    # ---------- sheet XML ----------
+    def _cell_text(self, cell) -> Optional[str]:
+        kind = cell.get("t", "n")
+        value = None
+        for child in cell:
+            tag = _local(child.tag)
+            if tag == "v":
+                value = child.text
+            elif tag == "is":
+                value = "".join(t.text or "" for t in child.iter() if _local(t.tag) == "t")
+        if value is None:
+            return ""
+        if kind == "s":
+            return self._shared_string(int(value))
+        if kind in ("inlineStr", "str"):
+            return value
+        if kind == "b":
+            return "True" if value == "1" else "False"
+        if kind == "e" or self._is_date_style(cell.get("s")):
+            raise _Uncertain()
+        return _number_text(value)
+
+    def _scan_header(self, sheet: str, header_row: int) -> Optional[List[str]]:
+        """
+        Stream the sheet up to `header_row` (0-based, as read_excel's header=) and return the
+        column names read_excel(..., nrows=0) would give. Rows past the header are never parsed.
+        """
+        rows: Dict[int, Dict[int, str]] = {}
+        last_row, width, dim = 0, 0, None
+        with self._zip.open(self._paths[sheet]) as f:
+            for _, elem in iterparse(f):
+                tag = _local(elem.tag)
+                if tag == "dimension":
+                    dim = elem.get("ref", "")
+                elif tag == "row":
+                    r = int(elem.get("r") or last_row + 1)
+                    last_row = r
+                    if r > header_row + 1:
+                        break
+                    cells, col = {}, -1
+                    for c in elem:
+                        if _local(c.tag) != "c":
+                            continue
+                        m = _CELL_REF.match(c.get("r", ""))
+                        col = _col_index(m.group(1)) if m else col + 1
+                        text = self._cell_text(c)
+                        if text != "":
+                            cells[col] = text
+                    rows[r] = cells
+                    if cells:
+                        width = max(width, max(cells) + 1)
+                    elem.clear()
+        self._dims[sheet] = self._dim_rows(dim)
+        header = rows.get(header_row + 1, {})
+        if not header:
+            # Nothing above the header either -> empty frame; otherwise pandas raises
+            return [] if width == 0 else None
+        return _dedup([header.get(i, "") for i in range(width)])
+
+    @staticmethod
+    def _dim_rows(ref: Optional[str]) -> Optional[int]:
+        if not ref:
+            return None
+        m = _CELL_REF.match(ref.split(":")[-1])
+        return int(m.group(2)) if m else None
+
+    # ---------- public ----------
+    def columns(self, sheet: str, header_row: int = 0) -> Optional[List[str]]:
+        if sheet not in self._paths:
+            return None
+        key = (sheet, header_row)
+        with self._lock:
+            if key not in self._headers:
+                try:
+                    self._headers[key] = self._scan_header(sheet, header_row)
+                except (_Uncertain, KeyError, ValueError, zipfile.BadZipFile):
+                    self._headers[key] = None
+            return self._headers[key]
+
+    def row_count(self, sheet: str, header_row: int = 0) -> Optional[int]:
+        """Data rows below the header according to the sheet's <dimension>; None if absent."""
+        if sheet not in self._paths:
+            return None
+        with self._lock:
+            if sheet not in self._dims:
+                self.columns(sheet, header_row)
+            last = self._dims.get(sheet)
+        return None if last is None else max(last - header_row - 1, 0)
+
+
+# ---------- content-hash keyed probe cache ----------
+_PROBES: "OrderedDict[str, Optional[WorkbookProbe]]" = OrderedDict()
+_PROBES_LOCK = threading.Lock()
+
+
+def probe(data: bytes) -> Optional[WorkbookProbe]:
+    """Return the (cached) probe for an upload, or None when it is not an xlsx zip."""
+    if not data:
+        return None
+    key = columnar_cache.content_key(data)
+    with _PROBES_LOCK:
+        if key in _PROBES:
+            _PROBES.move_to_end(key)
+            return _PROBES[key]
+    try:
+        p = WorkbookProbe(data)
+    except (zipfile.BadZipFile, KeyError, ValueError, SyntaxError):
+        p = None  # xls or damaged file
+    with _PROBES_LOCK:
+        # Another session may have probed the same upload meanwhile: share the first one
+        p = _PROBES.setdefault(key, p)
+        _PROBES.move_to_end(key)
+        while len(_PROBES) > _PROBE_CACHE_SIZE:
+            _PROBES.popitem(last=False)
+    return p
+
+
+def sheet_names(data: bytes) -> Optional[List[str]]:
+    p = probe(data)
+    return None if p is None else list(p.sheets)
+
+
+def sheet_columns(data: bytes, sheet: str, header_row: int = 0) -> Optional[List[str]]:
+    p = probe(data)
+    return None if p is None else p.columns(sheet, header_row)
+
+
+def sheet_rows(data: bytes, sheet: str, header_row: int = 0) -> Optional[int]:
+    p = probe(data)
+    return None if p is None else p.row_count(sheet, header_row)
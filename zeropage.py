@@ -4,6 +4,8 @@ import streamlit.components.v1 as components
 import base64
 from pathlib import Path
 
+import job_queue
+
 LEFT_LOGO_PATH = "logo.png"
 
 def _data_uri(path: str) -> str:
@@ -47,6 +49,19 @@ st.set_page_config(
 
 if "page" not in st.session_state:
     st.session_state.page = "zero"
+    # A reloaded tab goes back to the processing job named in its URL (see job_queue)
+    _job = job_queue.status(st.query_params.get("job"))
+    if _job is not None:
+        _banking = _job.kind == "banking"
+        st.session_state.update(
+            page="bank6" if _banking else "processpage",
+            industry="banking" if _banking else "manufacturing",
+            sheet_mapping_pairs=_job.spec["sheet_mapping_pairs"],
+            column_mapping_pairs=_job.spec["column_mapping_pairs"],
+            selected_bots=_job.spec["selected_bots"] or [],
+            job_id=_job.id,
+            processing_started=True,
+        )
 if "industry" not in st.session_state:
     st.session_state.industry = None
 